@@ -38,8 +38,12 @@ def ensure_instance_directory(app):
         app.logger.error(f"Erro ao verificar/criar diretório instance: {e}", exc_info=True)
 
 
-def create_app():
-    """Cria e configura a instância da aplicação Flask."""
+def create_app(conferir_esquema=True):
+    """
+    Cria e configura a instância da aplicação Flask.
+    Com conferir_esquema=False não lê a versão do esquema: usado pelo script de
+    implantação, que aplica as migrações ele mesmo (init_db_production.py).
+    """
     app = Flask(__name__, instance_relative_config=True)
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'uma-chave-secreta-muito-forte-e-dificil-de-adivinhar-padrao')
     app.config['WTF_CSRF_ENABLED'] = True
@@ -71,6 +75,20 @@ def create_app():
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SQLALCHEMY_ECHO'] = False
 
+    # Cache em disco dos PDFs gerados (instance/cache/pdf), limitado em MB
+    app.config['PDF_CACHE_MAX_BYTES'] = int(os.getenv('PDF_CACHE_MAX_MB', '100')) * 1024 * 1024
+    # Processos usados para converter PDFs em paralelo no fechamento do mês (padrão: nº de CPUs)
+    app.config['PDF_PROCESSOS'] = int(os.getenv('PDF_PROCESSOS', '0')) or None
+    # Itens (fragmentos HTML) mantidos em memória por worker para as telas mensais
+    app.config['FRAGMENT_CACHE_MAX_ITENS'] = int(os.getenv('FRAGMENT_CACHE_MAX_ITENS', '512'))
+    # Aplica migrações pendentes na inicialização só se AUTO_MIGRAR=1 (run.py e testes). Por padrão
+    # o script de implantação (init_db_production.py) migra e os workers apenas conferem a versão do esquema.
+    app.config['AUTO_MIGRAR'] = os.getenv('AUTO_MIGRAR', '0') not in ('0', 'false', 'False')
+
+    # Perfil de produção do SQLite (WAL, busy_timeout, pool); ignorado para outros bancos
+    from app.utils.banco_sqlite import configurar_engine_sqlite, registrar_pragmas, verificar_sqlite
+    configurar_engine_sqlite(app)
+
     # Inicializar extensões com o app
     db.init_app(app)
     login_manager.init_app(app)
@@ -81,10 +99,22 @@ def create_app():
     login_manager.login_message_category = "warning"
 
     # Importar modelos AQUI, APÓS db.init_app(app)
-    from app.models.user import User
+    from app.models.user import User, SufixoNomeUsuario
     from app.models.ponto import Ponto, Atividade
     from app.models.feriado import Feriado
     from app.models.relatorio_completo import RelatorioMensalCompleto
+    from app.models.resumo_mensal import ResumoMensal
+    from app.models.tarefa_exportacao import TarefaExportacao
+    from app.models.chave_idempotencia import ChaveIdempotencia
+    from app.models.terminal_quiosque import TerminalQuiosque
+    # Registra os eventos de sessão que mantêm os resumos mensais atualizados
+    from app.utils import resumo_mensal
+    # Cache de fragmentos das telas mensais (função disponível nos templates)
+    from app.utils.cache_paginas import fragmento_em_cache
+    app.jinja_env.globals['fragmento_em_cache'] = fragmento_em_cache
+    # Relatórios mensais memoizados valem só para a requisição corrente
+    from app.utils.helpers import descartar_relatorios_da_requisicao
+    app.teardown_request(descartar_relatorios_da_requisicao)
 
     # Configura o user_loader ANTES de registrar blueprints
     @login_manager.user_loader
@@ -108,21 +138,30 @@ def create_app():
     with app.app_context():
         # Garante diretório instance antes de criar tabelas
         ensure_instance_directory(app)
-        try:
-            # Cria tabelas se não existirem
-            db.create_all()
-            app.logger.info("db.create_all() chamado.")
-        except Exception as e:
-            app.logger.error(f"Erro durante db.create_all(): {e}", exc_info=True)
-            # Considerar se deve levantar a exceção ou apenas logar
-
-        # Importar e registrar blueprints AQUI, dentro do contexto e após db.create_all
+        if 'SQLITE_PERFIL' in app.config:
+            # Antes da primeira conexão: os pragmas valem para todas as conexões do pool
+            registrar_pragmas(db.engine, app.config['SQLITE_PERFIL'])
+            try:
+                verificar_sqlite(db.engine, app.config['SQLITE_PERFIL'])
+            except Exception as e:
+                app.logger.error(f"Erro na verificação do SQLite: {e}", exc_info=True)
+        # Só confere a versão do esquema (uma consulta); as migrações rodam na implantação
+        if conferir_esquema:
+            from app.utils.migracoes import verificar_esquema
+            versao = verificar_esquema(app)
+            app.logger.info(f"Esquema do banco na versão {versao}.")
+
+        # Importar e registrar blueprints AQUI, dentro do contexto e após a verificação do esquema
         from app.controllers.auth import auth as auth_blueprint
         app.register_blueprint(auth_blueprint)
         from app.controllers.main import main as main_blueprint
         app.register_blueprint(main_blueprint)
         from app.controllers.admin import admin as admin_blueprint
         app.register_blueprint(admin_blueprint)
+        from app.controllers.api import api as api_blueprint
+        app.register_blueprint(api_blueprint)
+        from app.controllers.quiosque import quiosque as quiosque_blueprint
+        app.register_blueprint(quiosque_blueprint)
         app.logger.info("Blueprints registrados.")
 
     app.logger.info("Aplicação Flask criada e configurada.")
@@ -2,14 +2,24 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 from functools import wraps
-from app.models.user import User
+from app.models.user import User, SufixoNomeUsuario
 from app.models.ponto import Ponto, Atividade
 from app.models.feriado import Feriado
 from app.forms.admin import NovoFeriadoForm, EditarFeriadoForm, NovoUsuarioForm, EditarUsuarioForm, DeleteForm
-from app.forms.ponto import EditarPontoForm as EditarPontoFormUsuario
+from app.forms.ponto import EditarPontoForm as EditarPontoFormUsuario, ImportacaoPontosForm
 # --- Importa save_picture ---
 from app.controllers.auth import save_picture
 # ---------------------------
+from app.utils.feriados_cache import invalidar_feriados
+from app.utils.pdf_cache import pdf_cache
+from app.utils.diretorio_usuarios import diretorio_usuarios
+from app.utils.texto import normalizar_texto
+from sqlalchemy import and_, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+from app.utils.orcamento_consultas import orcamento_consultas
+from app.utils.importacao import importar_pontos, ler_linhas
+from app.utils.helpers import calcular_minutos, relatorio_mensal_da_requisicao, gerar_relatorio_equipe, NOMES_MESES
 from app import db, csrf
 from datetime import datetime, date, timedelta
 from calendar import monthrange
@@ -19,6 +29,17 @@ import os
 admin = Blueprint('admin', __name__)
 logger = logging.getLogger(__name__)
 
+USUARIOS_POR_PAGINA = 50
+
+# Colunas aceitas em ?ordenar= (o nome usa a coluna normalizada indexada)
+_ORDENACAO_USUARIOS = {
+    'nome': User.nome_normalizado,
+    'matricula': User.matricula,
+    'uf': User.uf,
+    'unidade_setor': User.unidade_setor,
+    'ultimo_ponto': User.ultimo_ponto,
+}
+
 # Decorator admin_required (mantido)
 def admin_required(func):
     @wraps(func)
@@ -87,6 +108,7 @@ def novo_feriado():
                 novo_feriado_obj = Feriado(data=data_feriado, descricao=descricao)
                 db.session.add(novo_feriado_obj)
                 db.session.commit()
+                invalidar_feriados()
                 flash('Feriado criado com sucesso!', 'success')
                 return redirect(url_for('admin.listar_feriados', ano=data_feriado.year))
         except Exception as e:
@@ -120,6 +142,7 @@ def editar_feriado(feriado_id):
                 feriado.data = nova_data
                 feriado.descricao = nova_descricao # Atualiza a coluna física
                 db.session.commit()
+                invalidar_feriados()
                 flash('Feriado atualizado com sucesso!', 'success')
                 return redirect(url_for('admin.listar_feriados', ano=nova_data.year))
         except Exception as e:
@@ -141,6 +164,7 @@ def excluir_feriado(feriado_id):
         try:
             db.session.delete(feriado)
             db.session.commit()
+            invalidar_feriados()
             flash('Feriado excluído com sucesso!', 'success')
         except Exception as e:
             db.session.rollback()
@@ -156,12 +180,57 @@ def excluir_feriado(feriado_id):
 @admin.route('/admin/usuarios')
 @login_required
 @admin_required
+@orcamento_consultas(4)
 def listar_usuarios():
-    # ... (código mantido) ...
+    """Lista paginada de usuários, com busca, filtros e ordenação feitos no banco."""
     delete_form = DeleteForm()
-    try: usuarios = User.query.order_by(User.name).all()
-    except Exception as e: logger.error(f"Erro buscar usuários: {e}", exc_info=True); flash('Erro ao carregar usuários.', 'danger'); usuarios = []
-    return render_template('admin/usuarios.html', usuarios=usuarios, delete_form=delete_form)
+    filtros = {
+        'q': request.args.get('q', '').strip(),
+        'uf': request.args.get('uf', '').strip().upper(),
+        'unidade_setor': request.args.get('unidade_setor', '').strip(),
+        'status': request.args.get('status', 'todos'),
+        'ordenar': request.args.get('ordenar', 'nome'),
+        'direcao': request.args.get('direcao', 'asc'),
+    }
+    pagina = request.args.get('pagina', default=1, type=int)
+    por_pagina = min(max(request.args.get('por_pagina', default=USUARIOS_POR_PAGINA, type=int), 10), 200)
+    try:
+        paginacao = _consulta_usuarios(filtros).paginate(page=pagina, per_page=por_pagina, error_out=False)
+        unidades = [u for (u,) in db.session.query(User.unidade_setor).filter(User.unidade_setor != '')
+                    .distinct().order_by(User.unidade_setor)]
+        ufs = [uf for (uf,) in db.session.query(User.uf).filter(User.uf.isnot(None), User.uf != '')
+               .distinct().order_by(User.uf)]
+    except Exception as e:
+        logger.error(f"Erro buscar usuários: {e}", exc_info=True)
+        flash('Erro ao carregar usuários.', 'danger')
+        paginacao, unidades, ufs = None, [], []
+    return render_template('admin/usuarios.html', paginacao=paginacao, usuarios=paginacao.items if paginacao else [],
+                           filtros=filtros, unidades=unidades, ufs=ufs, delete_form=delete_form)
+
+
+def _consulta_usuarios(filtros):
+    """Monta a consulta da lista de usuários a partir dos filtros da tela."""
+    consulta = User.query
+    termo = normalizar_texto(filtros['q'])
+    if termo:
+        # Início do nome ou de um sobrenome por faixa na chave de sufixos_nome_usuario, ou prefixo
+        # da matrícula (índice único de matricula). Sem LIKE: % e _ digitados são literais.
+        por_nome = select(SufixoNomeUsuario.user_id).where(SufixoNomeUsuario.sufixo >= termo,
+                                                           SufixoNomeUsuario.sufixo < termo + '\uffff')
+        consulta = consulta.filter(or_(
+            User.id.in_(por_nome),
+            and_(User.matricula >= filtros['q'], User.matricula < filtros['q'] + '\uffff'),
+        ))
+    if filtros['uf']:
+        consulta = consulta.filter(User.uf == filtros['uf'])
+    if filtros['unidade_setor']:
+        consulta = consulta.filter(User.unidade_setor == filtros['unidade_setor'])
+    if filtros['status'] in ('ativos', 'inativos'):
+        consulta = consulta.filter(User.is_active_db == (filtros['status'] == 'ativos'))
+
+    coluna = _ORDENACAO_USUARIOS.get(filtros['ordenar'], User.nome_normalizado)
+    ordem = coluna.desc() if filtros['direcao'] == 'desc' else coluna.asc()
+    return consulta.order_by(ordem, User.id)
 
 
 @admin.route('/admin/usuarios/novo', methods=['GET', 'POST'])
@@ -265,16 +334,34 @@ def editar_usuario(usuario_id):
     foto_atual = usuario.foto_path
     return render_template('admin/editar_usuario.html', form=form, usuario=usuario, foto_atual=foto_atual, title="Editar Usuário")
 
+# Busca de usuários para os seletores (digitação com autocompletar)
+@admin.route('/admin/usuarios/busca')
+@login_required
+@admin_required
+def buscar_usuarios():
+    """Retorna até `limite` usuários cujo nome ou matrícula contém o termo `q`."""
+    termo = request.args.get('q', '')
+    limite = min(max(request.args.get('limite', default=20, type=int), 1), 100)
+    apenas_ativos = request.args.get('ativos') == '1'
+    usuarios = diretorio_usuarios().buscar(termo, limite=limite, apenas_ativos=apenas_ativos)
+    return jsonify([u._asdict() for u in usuarios])
+
 # Rota visualizar_usuario (mantida, já exibe os novos campos se presentes no objeto usuario)
 @admin.route('/admin/usuarios/visualizar/<int:usuario_id>')
 @login_required
 @admin_required
+@orcamento_consultas(2)
 def visualizar_usuario(usuario_id):
-    # ... (código mantido) ...
+    """Cadastro do usuário e os 10 registros mais recentes."""
     delete_form = DeleteForm()
     usuario = User.query.get_or_404(usuario_id)
-    try: registros = Ponto.query.filter_by(user_id=usuario.id).order_by(Ponto.data.desc()).limit(10).all()
-    except Exception as e: logger.error(f"Erro buscar registros {usuario_id}: {e}", exc_info=True); flash('Erro ao carregar registros.', 'danger'); registros = []
+    # Os 10 últimos dias saem de uma leitura invertida de ix_ponto_user_data (LIMIT 10, sem ordenar
+    # a tabela); quem nunca bateu o ponto (users.ultimo_ponto vazio) não consulta `pontos`
+    if usuario.ultimo_ponto is None:
+        registros = []
+    else:
+        try: registros = Ponto.query.filter_by(user_id=usuario.id).order_by(Ponto.data.desc()).limit(10).all()
+        except Exception as e: logger.error(f"Erro buscar registros {usuario_id}: {e}", exc_info=True); flash('Erro ao carregar registros.', 'danger'); registros = []
     return render_template('admin/visualizar_usuario.html', usuario=usuario, registros=registros, delete_form=delete_form)
 
 # Rota excluir_usuario (mantida)
@@ -313,55 +400,103 @@ def excluir_usuario(usuario_id):
 @admin_required
 def relatorios():
     # ... (código mantido) ...
-    try: usuarios = User.query.filter_by(is_active_db=True).order_by(User.name).all()
+    try: usuarios = diretorio_usuarios().ativos() # Tuplas leves do diretório em memória
     except Exception as e: logger.error(f"Erro buscar usuários relatórios: {e}", exc_info=True); flash('Erro carregar usuários.', 'danger'); usuarios = []
     return render_template('admin/relatorios.html', usuarios=usuarios)
 
 @admin.route('/admin/relatorio/<int:usuario_id>')
 @login_required
 @admin_required
+@orcamento_consultas(9) # Inclui a materialização do resumo na primeira visita ao mês
 def relatorio_usuario(usuario_id):
-    # ... (código mantido) ...
     delete_form = DeleteForm()
     usuario = User.query.get_or_404(usuario_id); hoje = date.today(); mes = request.args.get('mes', default=hoje.month, type=int); ano = request.args.get('ano', default=hoje.year, type=int)
     try:
         if not (1 <= mes <= 12): mes = hoje.month; flash('Mês inválido.', 'warning')
-        primeiro_dia = date(ano, mes, 1); ultimo_dia = date(ano, mes, monthrange(ano, mes)[1])
-        registros = Ponto.query.filter(Ponto.user_id == usuario.id, Ponto.data >= primeiro_dia, Ponto.data <= ultimo_dia).order_by(Ponto.data).all()
-        feriados = Feriado.query.filter(Feriado.data >= primeiro_dia, Feriado.data <= ultimo_dia).all(); feriados_dict = {f.data: f.descricao for f in feriados}; feriados_datas = set(feriados_dict.keys())
-        registros_por_data = {r.data: r for r in registros}; ponto_ids = [r.id for r in registros]; atividades = Atividade.query.filter(Atividade.ponto_id.in_(ponto_ids)).all(); atividades_por_ponto = {}
-        for atv in atividades:
-            if atv.ponto_id not in atividades_por_ponto: atividades_por_ponto[atv.ponto_id] = []
-            atividades_por_ponto[atv.ponto_id].append(atv.descricao)
-        dias_uteis_potenciais = 0
-        dias_afastamento = 0
-        dias_trabalhados = 0
-        horas_trabalhadas = 0.0
-        for dia_num in range(1, ultimo_dia.day + 1):
-            data_atual = date(ano, mes, dia_num)
-            if data_atual.weekday() < 5 and data_atual not in feriados_datas:
-                dias_uteis_potenciais += 1
-                registro_dia = registros_por_data.get(data_atual)
-                if registro_dia and registro_dia.afastamento:
-                    dias_afastamento += 1
-        for r_data, r_obj in registros_por_data.items():
-            if not r_obj.afastamento and r_obj.horas_trabalhadas is not None:
-                 if r_data.weekday() < 5 and r_data not in feriados_datas:
-                     dias_trabalhados += 1
-                     horas_trabalhadas += r_obj.horas_trabalhadas
-        carga_horaria_devida = (dias_uteis_potenciais - dias_afastamento) * 8.0
-        saldo_horas = horas_trabalhadas - carga_horaria_devida
-        media_diaria = horas_trabalhadas / dias_trabalhados if dias_trabalhados > 0 else 0.0
-        nomes_meses = ['', 'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']; nome_mes = nomes_meses[mes]
-        mes_anterior, ano_anterior = (12, ano - 1) if mes == 1 else (mes - 1, ano); proximo_mes, proximo_ano = (1, ano + 1) if mes == 12 else (mes + 1, ano)
-        return render_template('admin/relatorio_usuario.html', usuario=usuario, registros=registros, registros_por_data=registros_por_data, mes_atual=mes, ano_atual=ano, nome_mes=nome_mes,
-                               dias_uteis=dias_uteis_potenciais, dias_trabalhados=dias_trabalhados, dias_afastamento=dias_afastamento, horas_trabalhadas=horas_trabalhadas,
-                               carga_horaria_devida=carga_horaria_devida, saldo_horas=saldo_horas, media_diaria=media_diaria, feriados_dict=feriados_dict,
-                               feriados_datas=feriados_datas, atividades_por_ponto=atividades_por_ponto, ultimo_dia=ultimo_dia, mes_anterior=mes_anterior,
-                               ano_anterior=ano_anterior, proximo_mes=proximo_mes, proximo_ano=proximo_ano, date=date, delete_form=delete_form)
+        # Usa o mesmo motor de relatório das telas do usuário (resumo materializado + feriados em cache)
+        relatorio = relatorio_mensal_da_requisicao(usuario.id, mes, ano, order_desc=False)
+        return render_template('admin/relatorio_usuario.html', **relatorio.como_contexto(), date=date, delete_form=delete_form)
     except ValueError: flash('Data inválida.', 'danger'); return redirect(url_for('admin.relatorios'))
     except Exception as e: logger.error(f"Erro relatório usuário {usuario_id} ({mes}/{ano}): {e}", exc_info=True); flash('Erro ao gerar relatório.', 'danger'); return redirect(url_for('admin.relatorios'))
 
+def _parametros_relatorio_equipe():
+    hoje = date.today()
+    mes = request.args.get('mes', default=hoje.month, type=int)
+    ano = request.args.get('ano', default=hoje.year, type=int)
+    unidade_setor = request.args.get('unidade_setor', '').strip() or None
+    chefia_imediata = request.args.get('chefia_imediata', '').strip() or None
+    return mes, ano, unidade_setor, chefia_imediata
+
+@admin.route('/admin/relatorios/equipe')
+@login_required
+@admin_required
+def relatorio_equipe():
+    """Relatório consolidado do mês para todos os usuários ativos (com filtros de unidade e chefia)."""
+    mes, ano, unidade_setor, chefia_imediata = _parametros_relatorio_equipe()
+    if not (1 <= mes <= 12):
+        flash('Mês inválido.', 'warning'); mes = date.today().month
+    try:
+        linhas = gerar_relatorio_equipe(mes, ano, unidade_setor, chefia_imediata)
+    except ValueError:
+        flash('Data inválida.', 'danger'); return redirect(url_for('admin.relatorios'))
+    except Exception as e:
+        logger.error(f"Erro relatório da equipe ({mes}/{ano}): {e}", exc_info=True)
+        flash('Erro ao gerar relatório da equipe.', 'danger'); return redirect(url_for('admin.relatorios'))
+    # Opções dos filtros
+    unidades = [u for (u,) in db.session.query(User.unidade_setor).filter(User.is_active_db == True, User.unidade_setor != '').distinct().order_by(User.unidade_setor)]
+    chefias = [c for (c,) in db.session.query(User.chefia_imediata).filter(User.is_active_db == True, User.chefia_imediata != '').distinct().order_by(User.chefia_imediata)]
+    totais = {
+        'horas_trabalhadas': round(sum(l['horas_trabalhadas'] for l in linhas), 2),
+        'carga_horaria_devida': sum(l['carga_horaria_devida'] for l in linhas),
+        'saldo_horas': round(sum(l['saldo_horas'] for l in linhas), 2),
+        'dias_afastamento': sum(l['dias_afastamento'] for l in linhas),
+    }
+    return render_template('admin/relatorio_equipe.html', linhas=linhas, totais=totais, mes=mes, ano=ano, nome_mes=NOMES_MESES[mes],
+                           unidades=unidades, chefias=chefias, unidade_setor=unidade_setor, chefia_imediata=chefia_imediata,
+                           title="Relatório da Equipe")
+
+@admin.route('/admin/relatorios/equipe.json')
+@login_required
+@admin_required
+def relatorio_equipe_json():
+    """Versão JSON do relatório consolidado da equipe."""
+    mes, ano, unidade_setor, chefia_imediata = _parametros_relatorio_equipe()
+    if not (1 <= mes <= 12):
+        return jsonify({'error': 'Mês inválido.'}), 400
+    try:
+        linhas = gerar_relatorio_equipe(mes, ano, unidade_setor, chefia_imediata)
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        logger.error(f"Erro relatório da equipe JSON ({mes}/{ano}): {e}", exc_info=True)
+        return jsonify({'error': 'Erro inesperado no servidor.'}), 500
+    return jsonify({'mes': mes, 'ano': ano, 'unidade_setor': unidade_setor, 'chefia_imediata': chefia_imediata, 'usuarios': linhas})
+
+# Importação de registros de vários usuários (coluna 'matricula' identifica cada linha)
+@admin.route('/admin/importar-pontos', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def importar_pontos_admin():
+    form = ImportacaoPontosForm()
+    relatorio = None
+    if form.validate_on_submit():
+        try:
+            relatorio = importar_pontos(ler_linhas(form.arquivo.data), simulacao=form.simulacao.data)
+        except (ValueError, UnicodeDecodeError) as ve:
+            flash(f'Não foi possível ler o arquivo: {ve}', 'danger')
+        except Exception as e:
+            logger.error(f"Erro ao importar planilha (admin): {e}", exc_info=True)
+            flash('Ocorreu um erro inesperado ao importar a planilha.', 'danger')
+    return render_template('main/importar_pontos.html', form=form, relatorio=relatorio, modo_admin=True,
+                           title="Importar Registros (Administração)")
+
+# Estatísticas do cache de PDFs (contadores do worker atual)
+@admin.route('/admin/cache/pdf.json')
+@login_required
+@admin_required
+def estatisticas_cache_pdf():
+    return jsonify(pdf_cache().estatisticas())
+
 # Rota admin_registrar_ponto (mantida como não implementada)
 @admin.route('/admin/registrar-ponto/<int:user_id>', methods=['GET', 'POST'])
 @login_required
@@ -375,15 +510,16 @@ def admin_registrar_ponto(user_id):
 @admin.route('/admin/editar-ponto/<int:ponto_id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@orcamento_consultas(2)
 def admin_editar_ponto(ponto_id):
-    # ... (código mantido) ...
-    registro = Ponto.query.get_or_404(ponto_id)
-    usuario_do_ponto = User.query.get(registro.user_id)
+    # Registro, dono (join) e atividades (selectin) em duas consultas
+    registro = Ponto.query.options(joinedload(Ponto.user), selectinload(Ponto.atividades)).get_or_404(ponto_id)
+    usuario_do_ponto = registro.user
     if not usuario_do_ponto:
          flash("Usuário associado a este ponto não encontrado.", "danger")
          return redirect(url_for('admin.listar_usuarios'))
     form = EditarPontoFormUsuario(obj=registro)
-    atividade_existente = Atividade.query.filter_by(ponto_id=ponto_id).first()
+    atividade_existente = registro.atividades[0] if registro.atividades else None
     if request.method == 'GET':
         if atividade_existente and not form.atividades.data:
             form.atividades.data = atividade_existente.descricao
@@ -398,13 +534,13 @@ def admin_editar_ponto(ponto_id):
             registro.observacoes = form.observacoes.data
             registro.resultados_produtos = form.resultados_produtos.data
             if is_afastamento:
-                registro.entrada, registro.saida_almoco, registro.retorno_almoco, registro.saida, registro.horas_trabalhadas = None, None, None, None, None
+                registro.entrada, registro.saida_almoco, registro.retorno_almoco, registro.saida, registro.minutos_trabalhados = None, None, None, None, None
             else:
                 registro.entrada=form.entrada.data
                 registro.saida_almoco=form.saida_almoco.data
                 registro.retorno_almoco=form.retorno_almoco.data
                 registro.saida=form.saida.data
-                registro.horas_trabalhadas = calcular_horas(
+                registro.minutos_trabalhados = calcular_minutos(
                     data_selecionada, form.entrada.data, form.saida.data,
                     form.saida_almoco.data, form.retorno_almoco.data
                 )
@@ -417,6 +553,9 @@ def admin_editar_ponto(ponto_id):
             db.session.commit()
             flash(f'Registro de {usuario_do_ponto.name} atualizado com sucesso!', 'success')
             return redirect(url_for('admin.relatorio_usuario', usuario_id=registro.user_id, mes=registro.data.month, ano=registro.data.year))
+        except IntegrityError:
+            db.session.rollback()
+            flash(f'Já existe um registro para {data_selecionada.strftime("%d/%m/%Y")}.', 'warning')
         except Exception as e:
             db.session.rollback()
             logger.error(f"Admin - Erro ao editar ponto {ponto_id}: {e}", exc_info=True)
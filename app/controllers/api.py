@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+API JSON (versão 1) para integrações: registros de ponto, atividades e resumos mensais.
+
+Autenticação pela mesma sessão do site (login em /login); requisições que
+alteram dados enviam o token CSRF no cabeçalho X-CSRFToken (obtido em
+GET /api/v1/sessao). As listagens usam paginação por chave (user_id, data),
+que percorre o índice ix_ponto_user_data sem OFFSET, e todas as respostas de
+leitura trazem ETag para que clientes que consultam periodicamente recebam 304.
+"""
+import base64
+import hashlib
+import logging
+from datetime import date
+from flask import Blueprint, jsonify, make_response, request, url_for
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import selectinload
+from app import db
+from app.models.ponto import Ponto, Atividade
+from app.models.resumo_mensal import ResumoMensal
+from app.utils.importacao import converter_linha
+from app.utils.resumo_mensal import obter_resumo_mensal, banco_de_horas
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+logger = logging.getLogger(__name__)
+
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 500
+ANOS_VALIDOS = range(1900, 2101)
+
+# Campos do registro aceitos no corpo (POST/PUT/PATCH)
+CAMPOS_EDITAVEIS = ('data', 'entrada', 'saida_almoco', 'retorno_almoco', 'saida',
+                    'observacoes', 'resultados_produtos', 'tipo_afastamento')
+
+
+@api.before_request
+def _exigir_login():
+    # Sem redirecionar para a página de login: clientes da API recebem 401
+    if not current_user.is_authenticated:
+        return _erro('Autenticação necessária.', 401)
+
+
+def _erro(mensagem, status):
+    return jsonify({'error': mensagem}), status
+
+
+def _resposta_com_etag(dados, status=200):
+    resposta = jsonify(dados)
+    resposta.status_code = status
+    resposta.add_etag()
+    return resposta
+
+
+def _resposta_condicional(dados, status=200):
+    """Resposta JSON com ETag; devolve 304 se o cliente já tiver a mesma versão (If-None-Match)."""
+    return _resposta_com_etag(dados, status).make_conditional(request)
+
+
+def _etag_resumo(user_id, ano, mes):
+    """
+    ETag do resumo mensal a partir das versões em resumos_mensais, sem calcular nada
+    (None se o mês ainda não foi materializado). Do mês corrente em diante o banco de
+    horas depende também do resumo do mês corrente e do dia de hoje.
+    """
+    hoje = date.today()
+    meses = {(ano, mes), (hoje.year, hoje.month)}
+    versoes = {(a, m): versao for a, m, versao in db.session.query(
+        ResumoMensal.ano, ResumoMensal.mes, ResumoMensal.versao).filter(
+        ResumoMensal.user_id == user_id, or_(*[and_(ResumoMensal.ano == a, ResumoMensal.mes == m) for a, m in meses]))}
+    if (ano, mes) not in versoes:
+        return None
+    partes = [user_id, ano, mes, versoes[(ano, mes)]]
+    if (ano, mes) >= (hoje.year, hoje.month):
+        partes += [versoes.get((hoje.year, hoje.month)), hoje.isoformat()]
+    return hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()
+
+
+def _hora(valor):
+    return valor.strftime('%H:%M') if valor else None
+
+
+def ponto_json(ponto):
+    return {
+        'id': ponto.id,
+        'user_id': ponto.user_id,
+        'data': ponto.data.isoformat(),
+        'entrada': _hora(ponto.entrada),
+        'saida_almoco': _hora(ponto.saida_almoco),
+        'retorno_almoco': _hora(ponto.retorno_almoco),
+        'saida': _hora(ponto.saida),
+        'horas_trabalhadas': ponto.horas_trabalhadas,
+        'afastamento': ponto.afastamento,
+        'tipo_afastamento': ponto.tipo_afastamento,
+        'observacoes': ponto.observacoes,
+        'resultados_produtos': ponto.resultados_produtos,
+        'atividades': [{'id': a.id, 'descricao': a.descricao} for a in ponto.atividades],
+    }
+
+
+def _codificar_cursor(ponto):
+    return base64.urlsafe_b64encode(f"{ponto.user_id}:{ponto.data.isoformat()}".encode()).decode().rstrip('=')
+
+
+def _decodificar_cursor(cursor):
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        user_id, data_iso = texto.split(':', 1)
+        return int(user_id), date.fromisoformat(data_iso)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor inválido.")
+
+
+def _data_parametro(nome):
+    valor = request.args.get(nome)
+    if not valor:
+        return None
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ValueError(f"Parâmetro '{nome}' inválido (use AAAA-MM-DD).")
+
+
+def _user_id_permitido(user_id):
+    """Usuário comum só acessa os próprios dados; admin acessa qualquer usuário."""
+    return user_id == current_user.id or current_user.is_admin
+
+
+def _obter_ponto(ponto_id):
+    ponto = db.session.get(Ponto, ponto_id)
+    if ponto is None or not _user_id_permitido(ponto.user_id):
+        return None
+    return ponto
+
+
+def _ler_json():
+    dados = request.get_json(silent=True)
+    if not isinstance(dados, dict):
+        raise ValueError("Corpo da requisição deve ser um objeto JSON.")
+    return dados
+
+
+def _aplicar_dados(ponto, dados):
+    """Valida o registro completo (estado atual + campos enviados) e o aplica ao Ponto."""
+    atual = {campo: getattr(ponto, campo) for campo in CAMPOS_EDITAVEIS}
+    if 'afastamento' in dados and not dados['afastamento']:
+        atual['tipo_afastamento'] = None
+    atual.update({campo: dados[campo] for campo in CAMPOS_EDITAVEIS if campo in dados})
+    if atual['data'] is None:
+        raise ValueError("data ausente")
+    if dados.get('afastamento') and not atual['tipo_afastamento']:
+        raise ValueError("informe o tipo_afastamento")
+    linha = converter_linha(atual)
+    if linha is None:
+        raise ValueError("informe os horários ou o tipo de afastamento")
+    for campo in ('data', 'entrada', 'saida_almoco', 'retorno_almoco', 'saida', 'minutos_trabalhados',
+                  'observacoes', 'resultados_produtos', 'afastamento', 'tipo_afastamento'):
+        setattr(ponto, campo, linha[campo])
+    if ponto.afastamento:
+        ponto.atividades = [] # Afastamento não tem atividades (mesma regra da edição pelo site)
+
+
+def _data_em_uso(ponto):
+    consulta = db.session.query(Ponto.id).filter(Ponto.user_id == ponto.user_id, Ponto.data == ponto.data)
+    if ponto.id is not None:
+        consulta = consulta.filter(Ponto.id != ponto.id)
+    return consulta.first() is not None
+
+
+def _gravar(ponto, status):
+    with db.session.no_autoflush:
+        data_em_uso = _data_em_uso(ponto)
+    if data_em_uso:
+        db.session.rollback()
+        return _erro(f"Já existe um registro em {ponto.data.strftime('%d/%m/%Y')}.", 409)
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao gravar ponto via API: {e}", exc_info=True)
+        return _erro('Erro inesperado no servidor.', 500)
+    resposta = _resposta_condicional(ponto_json(ponto), status)
+    if status == 201:
+        resposta.headers['Location'] = url_for('api.obter_ponto', ponto_id=ponto.id)
+    return resposta
+
+
+def _precondicao_falhou(ponto):
+    """Verifica If-Match (controle de concorrência otimista em PUT/PATCH/DELETE)."""
+    if not request.if_match or request.if_match.star_tag:
+        return False
+    etag_atual = _resposta_com_etag(ponto_json(ponto)).get_etag()[0]
+    return not request.if_match.contains(etag_atual)
+
+
+# --- SESSÃO ---
+@api.route('/sessao')
+def sessao():
+    """Usuário autenticado e token CSRF para as requisições de escrita."""
+    return jsonify({'user_id': current_user.id, 'nome': current_user.name,
+                    'is_admin': current_user.is_admin, 'csrf_token': generate_csrf()})
+
+
+# --- REGISTROS DE PONTO ---
+@api.route('/pontos')
+def listar_pontos():
+    """
+    Lista registros ordenados por (user_id, data). Parâmetros: user_id (admin
+    pode omitir para listar todos), inicio/fim (AAAA-MM-DD), limite e cursor
+    (valor de 'proximo' da página anterior).
+    """
+    user_id = request.args.get('user_id', type=int)
+    if user_id is None and not current_user.is_admin:
+        user_id = current_user.id
+    if user_id is not None and not _user_id_permitido(user_id):
+        return _erro('Permissão negada.', 403)
+    limite = min(max(request.args.get('limite', default=LIMITE_PADRAO, type=int), 1), LIMITE_MAXIMO)
+
+    try:
+        inicio = _data_parametro('inicio')
+        fim = _data_parametro('fim')
+        cursor = _decodificar_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as ve:
+        return _erro(str(ve), 400)
+
+    consulta = Ponto.query.options(selectinload(Ponto.atividades))
+    if user_id is not None:
+        consulta = consulta.filter(Ponto.user_id == user_id)
+    if inicio:
+        consulta = consulta.filter(Ponto.data >= inicio)
+    if fim:
+        consulta = consulta.filter(Ponto.data <= fim)
+    if cursor:
+        ultimo_user, ultima_data = cursor
+        consulta = consulta.filter(or_(Ponto.user_id > ultimo_user,
+                                       and_(Ponto.user_id == ultimo_user, Ponto.data > ultima_data)))
+
+    pontos = consulta.order_by(Ponto.user_id, Ponto.data).limit(limite + 1).all()
+    proximo = _codificar_cursor(pontos[limite - 1]) if len(pontos) > limite else None
+    return _resposta_condicional({'itens': [ponto_json(p) for p in pontos[:limite]], 'proximo': proximo})
+
+
+@api.route('/pontos', methods=['POST'])
+def criar_ponto():
+    """Cria um registro (horários ou afastamento) e, opcionalmente, suas atividades."""
+    try:
+        dados = _ler_json()
+    except ValueError as ve:
+        return _erro(str(ve), 400)
+    try:
+        user_id = int(dados.get('user_id', current_user.id))
+    except (ValueError, TypeError):
+        return _erro('user_id inválido.', 400)
+    if not _user_id_permitido(user_id):
+        return _erro('Permissão negada.', 403)
+
+    ponto = Ponto(user_id=user_id, afastamento=False)
+    try:
+        _aplicar_dados(ponto, dados)
+    except ValueError as ve:
+        return _erro(str(ve), 422)
+    atividades = dados.get('atividades') or []
+    if not isinstance(atividades, list) or not all(isinstance(texto, str) for texto in atividades):
+        return _erro("atividades deve ser uma lista de textos.", 422)
+    if not ponto.afastamento:
+        ponto.atividades = [Atividade(descricao=texto.strip()) for texto in atividades if texto.strip()]
+    db.session.add(ponto)
+    return _gravar(ponto, 201)
+
+
+@api.route('/pontos/<int:ponto_id>')
+def obter_ponto(ponto_id):
+    ponto = _obter_ponto(ponto_id)
+    if ponto is None:
+        return _erro('Registro não encontrado.', 404)
+    return _resposta_condicional(ponto_json(ponto))
+
+
+@api.route('/pontos/<int:ponto_id>', methods=['PUT', 'PATCH'])
+def atualizar_ponto(ponto_id):
+    """Atualiza os campos enviados (os demais são mantidos) e recalcula as horas."""
+    ponto = _obter_ponto(ponto_id)
+    if ponto is None:
+        return _erro('Registro não encontrado.', 404)
+    if _precondicao_falhou(ponto):
+        return _erro('O registro foi alterado por outra requisição.', 412)
+    try:
+        _aplicar_dados(ponto, _ler_json())
+    except ValueError as ve:
+        db.session.rollback()
+        return _erro(str(ve), 422)
+    return _gravar(ponto, 200)
+
+
+@api.route('/pontos/<int:ponto_id>', methods=['DELETE'])
+def excluir_ponto(ponto_id):
+    ponto = _obter_ponto(ponto_id)
+    if ponto is None:
+        return _erro('Registro não encontrado.', 404)
+    if _precondicao_falhou(ponto):
+        return _erro('O registro foi alterado por outra requisição.', 412)
+    try:
+        db.session.delete(ponto)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao excluir ponto {ponto_id} via API: {e}", exc_info=True)
+        return _erro('Erro inesperado no servidor.', 500)
+    return '', 204
+
+
+# --- ATIVIDADES ---
+@api.route('/pontos/<int:ponto_id>/atividades', methods=['POST'])
+def criar_atividade(ponto_id):
+    ponto = _obter_ponto(ponto_id)
+    if ponto is None:
+        return _erro('Registro não encontrado.', 404)
+    if ponto.afastamento:
+        return _erro('Registros de afastamento não têm atividades.', 422)
+    try:
+        descricao = str(_ler_json().get('descricao') or '').strip()
+    except ValueError as ve:
+        return _erro(str(ve), 400)
+    if not descricao:
+        return _erro('Descrição da atividade é obrigatória.', 422)
+    atividade = Atividade(ponto_id=ponto.id, descricao=descricao)
+    db.session.add(atividade)
+    db.session.commit()
+    return jsonify({'id': atividade.id, 'descricao': atividade.descricao}), 201
+
+
+@api.route('/atividades/<int:atividade_id>', methods=['PUT', 'PATCH', 'DELETE'])
+def alterar_atividade(atividade_id):
+    atividade = db.session.get(Atividade, atividade_id)
+    if atividade is None or _obter_ponto(atividade.ponto_id) is None:
+        return _erro('Atividade não encontrada.', 404)
+    if request.method == 'DELETE':
+        db.session.delete(atividade)
+        db.session.commit()
+        return '', 204
+    try:
+        descricao = str(_ler_json().get('descricao') or '').strip()
+    except ValueError as ve:
+        return _erro(str(ve), 400)
+    if not descricao:
+        return _erro('Descrição da atividade é obrigatória.', 422)
+    atividade.descricao = descricao
+    db.session.commit()
+    return jsonify({'id': atividade.id, 'descricao': atividade.descricao})
+
+
+# --- RESUMOS MENSAIS ---
+@api.route('/resumos/<int:ano>/<int:mes>')
+def resumo_mensal(ano, mes):
+    """Estatísticas do mês e banco de horas acumulado até ele."""
+    user_id = request.args.get('user_id', default=current_user.id, type=int)
+    if not _user_id_permitido(user_id):
+        return _erro('Permissão negada.', 403)
+    if not 1 <= mes <= 12:
+        return _erro('Mês inválido.', 400)
+    if ano not in ANOS_VALIDOS:
+        return _erro('Ano inválido.', 400)
+    # 304 decidido só pela versão do resumo, antes de qualquer cálculo
+    etag = _etag_resumo(user_id, ano, mes)
+    if etag is not None and request.if_none_match.contains(etag):
+        resposta = make_response('', 304)
+        resposta.set_etag(etag)
+        return resposta
+    resumo = obter_resumo_mensal(user_id, mes, ano)
+    resposta = jsonify({
+        'user_id': user_id, 'ano': ano, 'mes': mes,
+        'dias_uteis': resumo.dias_uteis,
+        'dias_trabalhados': resumo.dias_trabalhados,
+        'dias_afastamento': resumo.dias_afastamento,
+        'horas_trabalhadas': resumo.horas_trabalhadas,
+        'carga_horaria_devida': resumo.carga_horaria_devida,
+        'saldo_horas': resumo.saldo_horas,
+        'media_diaria': resumo.media_diaria,
+        **banco_de_horas(user_id, mes, ano),
+    })
+    etag = _etag_resumo(user_id, ano, mes)  # O resumo foi materializado na primeira leitura
+    if etag is not None:
+        resposta.set_etag(etag)
+    return resposta
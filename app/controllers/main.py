@@ -6,6 +6,8 @@ import logging
 import os
 from datetime import datetime, date, timedelta, time
 from io import BytesIO # Para exportação Excel/PDF
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
 
 # --- Definição do Blueprint 'main' ---
 main = Blueprint('main', __name__)
@@ -18,12 +20,25 @@ from app.models.user import User
 from app.models.ponto import Ponto, Atividade
 from app.models.feriado import Feriado
 from app.models.relatorio_completo import RelatorioMensalCompleto
-from app.forms.ponto import RegistroPontoForm, EditarPontoForm, RegistroAfastamentoForm, AtividadeForm, MultiploPontoForm
+from app.models.tarefa_exportacao import TarefaExportacao
+from app.models.tipos import horas_de_minutos
+from app.forms.ponto import RegistroPontoForm, EditarPontoForm, RegistroAfastamentoForm, RegistroFeriasForm, AtividadeForm, MultiploPontoForm, ImportacaoPontosForm
 from app.forms.relatorio import RelatorioCompletoForm
+from app.forms.auth import PinQuiosqueForm
 # Importa funções de exportação
-from app.utils.export import generate_pdf, generate_excel
+from app.utils.export import generate_sei_html, contexto_relatorio_completo
+from app.utils.tarefas import enfileirar_exportacao, MIMETYPES
 # --- Importa funções auxiliares do novo módulo ---
-from app.utils.helpers import calcular_horas, _get_relatorio_mensal_data
+from app.utils.helpers import calcular_minutos, _get_relatorio_mensal_data
+from app.utils.gravacao_lote import inserir_pontos_lote, registrar_afastamento_periodo
+from app.utils.batida_ponto import bater_ponto, BatidaRecusada, DESCRICAO_BATIDAS
+from app.utils.idempotencia import idempotente
+from app.utils.quiosque import gerar_hash_pin
+from app.utils.feriados_cache import calendario_feriados
+from app.utils.resumo_mensal import banco_de_horas
+from app.utils.cache_paginas import pagina_condicional
+from app.utils.orcamento_consultas import orcamento_consultas
+from app.utils.importacao import importar_pontos, ler_linhas
 # -------------------------------------------------
 
 # --- ROTA RAIZ ---
@@ -36,6 +51,8 @@ def index():
 # --- ROTA DASHBOARD ---
 @main.route('/dashboard')
 @login_required
+@pagina_condicional('main/dashboard.html')
+@orcamento_consultas(12) # Inclui a materialização do resumo na primeira visita ao mês
 def dashboard():
     """Exibe o dashboard principal do usuário."""
     try:
@@ -53,17 +70,15 @@ def dashboard():
         # --- Usa a função auxiliar importada ---
         dados_relatorio = _get_relatorio_mensal_data(user_id_para_visualizar, mes, ano)
         # ---------------------------------------
+        # Banco de horas acumulado (lido das somas acumuladas dos resumos mensais)
+        banco_horas = banco_de_horas(user_id_para_visualizar, mes, ano)
 
-        # Lista de usuários para o seletor do admin
-        usuarios_para_seletor = None
-        if current_user.is_admin:
-            usuarios_para_seletor = User.query.order_by(User.name).all()
 
         # Renderiza o template do dashboard passando todos os dados necessários
         return render_template(
             'main/dashboard.html',
             **dados_relatorio, # Desempacota o dicionário de dados
-            usuarios=usuarios_para_seletor # Passa a lista de usuários para o admin
+            banco_horas=banco_horas,
         )
     except ValueError as ve:
         logger.error(f"Erro ao carregar dashboard: {ve}", exc_info=True)
@@ -94,38 +109,26 @@ def registrar_ponto():
 
     if form.validate_on_submit():
         data_selecionada = form.data.data
-        # Verifica se já existe registro para esta data
-        registro_existente = Ponto.query.filter_by(user_id=current_user.id, data=data_selecionada).first()
-        if registro_existente:
-            flash(f'Já existe um registro para {data_selecionada.strftime("%d/%m/%Y")}. Use a opção "Editar" no calendário ou relatório.', 'warning')
-            return render_template('main/registrar_ponto.html', form=form, title="Registrar Ponto")
-
         try:
-            # --- Usa a função auxiliar importada ---
-            horas_calc = calcular_horas(
-                data_selecionada, form.entrada.data, form.saida.data,
-                form.saida_almoco.data, form.retorno_almoco.data
-            )
-            # ---------------------------------------
-            novo_registro = Ponto(
-                user_id=current_user.id,
-                data=data_selecionada,
-                entrada=form.entrada.data,
-                saida_almoco=form.saida_almoco.data,
-                retorno_almoco=form.retorno_almoco.data,
-                saida=form.saida.data,
-                horas_trabalhadas=horas_calc,
-                observacoes=form.observacoes.data,
-                resultados_produtos=form.resultados_produtos.data, # Salva novo campo
-                afastamento=False # Registro normal não é afastamento
-            )
-            db.session.add(novo_registro)
-            db.session.flush() # Garante que o ID seja gerado para a atividade
-
-            # Salva atividade se houver descrição
-            if form.atividades.data and form.atividades.data.strip():
-                nova_atividade = Atividade(ponto_id=novo_registro.id, descricao=form.atividades.data.strip())
-                db.session.add(nova_atividade)
+            # INSERT ... ON CONFLICT DO NOTHING: sem consulta prévia e sem duplicar em cliques duplos
+            inseridas, _ = inserir_pontos_lote(current_user.id, [{
+                'data': data_selecionada,
+                'entrada': form.entrada.data,
+                'saida_almoco': form.saida_almoco.data,
+                'retorno_almoco': form.retorno_almoco.data,
+                'saida': form.saida.data,
+                'minutos_trabalhados': calcular_minutos(
+                    data_selecionada, form.entrada.data, form.saida.data,
+                    form.saida_almoco.data, form.retorno_almoco.data
+                ),
+                'observacoes': form.observacoes.data,
+                'resultados_produtos': form.resultados_produtos.data,
+                'atividade': form.atividades.data.strip() if form.atividades.data else None,
+            }])
+            if not inseridas:
+                db.session.rollback()
+                flash(f'Já existe um registro para {data_selecionada.strftime("%d/%m/%Y")}. Use a opção "Editar" no calendário ou relatório.', 'warning')
+                return render_template('main/registrar_ponto.html', form=form, title="Registrar Ponto")
 
             db.session.commit()
             flash('Ponto registrado com sucesso!', 'success')
@@ -154,8 +157,6 @@ def registrar_multiplo_ponto():
         resultados_list = request.form.getlist('resultados_produtos[]')
         observacoes_list = request.form.getlist('observacoes[]')
 
-        registros_adicionados = 0
-        registros_ignorados = 0
         erros = []
 
         # Garante que todas as listas tenham o mesmo tamanho (preenchendo com None ou string vazia)
@@ -168,64 +169,41 @@ def registrar_multiplo_ponto():
         resultados_list.extend([''] * (max_len - len(resultados_list)))
         observacoes_list.extend([''] * (max_len - len(observacoes_list)))
 
-
+        # Valida todas as linhas antes de gravar: uma linha inválida não descarta as demais
+        linhas_validas = []
         for i, data_str in enumerate(datas):
             if not data_str: continue # Pula linhas sem data
 
             try:
                 data_obj = date.fromisoformat(data_str)
 
-                # Verifica se já existe registro
-                registro_existente = Ponto.query.filter_by(user_id=current_user.id, data=data_obj).first()
-                if registro_existente:
-                    registros_ignorados += 1
-                    logger.warning(f"Registro ignorado para {data_obj.strftime('%d/%m/%Y')}: já existe.")
-                    continue
-
                 # Converte strings de tempo para objetos time ou None
                 entrada_t = time.fromisoformat(entradas[i]) if entradas[i] else None
                 saida_almoco_t = time.fromisoformat(saidas_almoco[i]) if saidas_almoco[i] else None
                 retorno_almoco_t = time.fromisoformat(retornos_almoco[i]) if retornos_almoco[i] else None
                 saida_t = time.fromisoformat(saidas[i]) if saidas[i] else None
 
-                # --- Usa a função auxiliar importada ---
-                horas_calc = calcular_horas(data_obj, entrada_t, saida_t, saida_almoco_t, retorno_almoco_t)
-                # ---------------------------------------
-
-                # --- CORREÇÃO INÍCIO ---
-                # 1. Guarda o texto da atividade em uma variável separada
-                texto_atividade = atividades_list[i].strip() if atividades_list[i] else None
-
-                # 2. Cria o objeto Ponto SEM o argumento atividades_texto
-                novo_registro = Ponto(
-                    user_id=current_user.id, data=data_obj,
-                    entrada=entrada_t, saida_almoco=saida_almoco_t,
-                    retorno_almoco=retorno_almoco_t, saida=saida_t,
-                    horas_trabalhadas=horas_calc,
-                    resultados_produtos=resultados_list[i].strip() if resultados_list[i] else None,
-                    observacoes=observacoes_list[i].strip() if observacoes_list[i] else None,
-                    afastamento=False
-                )
-                db.session.add(novo_registro)
-                db.session.flush() # Para obter o ID do novo_registro
-
-                # 3. Adiciona a Atividade separadamente usando a variável
-                if texto_atividade:
-                    nova_atividade = Atividade(ponto_id=novo_registro.id, descricao=texto_atividade)
-                    db.session.add(nova_atividade)
-                # --- CORREÇÃO FIM ---
-
-                registros_adicionados += 1
-
+                linhas_validas.append({
+                    'data': data_obj,
+                    'entrada': entrada_t, 'saida_almoco': saida_almoco_t,
+                    'retorno_almoco': retorno_almoco_t, 'saida': saida_t,
+                    'minutos_trabalhados': calcular_minutos(data_obj, entrada_t, saida_t, saida_almoco_t, retorno_almoco_t),
+                    'resultados_produtos': resultados_list[i].strip() if resultados_list[i] else None,
+                    'observacoes': observacoes_list[i].strip() if observacoes_list[i] else None,
+                    'atividade': atividades_list[i].strip() if atividades_list[i] else None,
+                })
             except ValueError as ve:
                  erros.append(f"Data ou hora inválida na linha {i+1}: {data_str} / {entradas[i]} / ... ({ve})")
                  logger.error(f"Erro de valor ao processar linha {i+1} do registro múltiplo: {ve}")
-            except Exception as e:
-                erros.append(f"Erro inesperado ao processar linha {i+1} ({data_str}): {e}")
-                logger.error(f"Erro inesperado ao processar linha {i+1} do registro múltiplo: {e}", exc_info=True)
-                db.session.rollback() # Desfaz a transação atual em caso de erro grave
 
         try:
+            # Um INSERT ... ON CONFLICT DO NOTHING para pontos e outro INSERT para atividades
+            inseridas, ignoradas = inserir_pontos_lote(current_user.id, linhas_validas)
+            for data_ignorada in ignoradas:
+                logger.warning(f"Registro ignorado para {data_ignorada.strftime('%d/%m/%Y')}: já existe.")
+            registros_adicionados = len(inseridas)
+            registros_ignorados = len(ignoradas)
+
             db.session.commit()
             if registros_adicionados > 0:
                 flash(f'{registros_adicionados} registro(s) adicionado(s) com sucesso!', 'success')
@@ -246,6 +224,25 @@ def registrar_multiplo_ponto():
     return render_template('main/registrar_multiplo_ponto.html', form=form, title="Registrar Múltiplos Pontos", hoje=hoje)
 
 
+@main.route('/importar-pontos', methods=['GET', 'POST'])
+@login_required
+def importar_pontos_planilha():
+    """Importa os registros do próprio usuário a partir de uma planilha CSV ou XLSX."""
+    form = ImportacaoPontosForm()
+    relatorio = None
+    if form.validate_on_submit():
+        try:
+            relatorio = importar_pontos(ler_linhas(form.arquivo.data), user_id=current_user.id,
+                                        simulacao=form.simulacao.data)
+        except (ValueError, UnicodeDecodeError) as ve:
+            flash(f'Não foi possível ler o arquivo: {ve}', 'danger')
+        except Exception as e:
+            logger.error(f"Erro ao importar planilha do usuário {current_user.id}: {e}", exc_info=True)
+            flash('Ocorreu um erro inesperado ao importar a planilha.', 'danger')
+    return render_template('main/importar_pontos.html', form=form, relatorio=relatorio, modo_admin=False,
+                           title="Importar Registros")
+
+
 @main.route('/registrar-afastamento', methods=['GET', 'POST'])
 @login_required
 def registrar_afastamento():
@@ -267,75 +264,98 @@ def registrar_afastamento():
         data_selecionada = form.data.data
         tipo_afastamento = form.tipo_afastamento.data
 
-        # Verifica se já existe registro para esta data
-        registro_existente = Ponto.query.filter_by(user_id=current_user.id, data=data_selecionada).first()
-        if registro_existente:
-            # Se já existe, ATUALIZA para afastamento
-            try:
-                registro_existente.afastamento = True
-                registro_existente.tipo_afastamento = tipo_afastamento
-                # Limpa horários e horas trabalhadas
-                registro_existente.entrada = None
-                registro_existente.saida_almoco = None
-                registro_existente.retorno_almoco = None
-                registro_existente.saida = None
-                registro_existente.horas_trabalhadas = None
-                # Remove atividades associadas (opcional, mas recomendado para consistência)
-                Atividade.query.filter_by(ponto_id=registro_existente.id).delete()
-                db.session.commit()
-                flash(f'Registro de {data_selecionada.strftime("%d/%m/%Y")} atualizado para {tipo_afastamento} com sucesso!', 'success')
-                return redirect(url_for('main.dashboard', mes=data_selecionada.month, ano=data_selecionada.year))
-            except Exception as e:
-                db.session.rollback()
-                logger.error(f"Erro ao ATUALIZAR registro para afastamento {data_selecionada}: {e}", exc_info=True)
-                flash('Erro ao atualizar registro existente para afastamento.', 'danger')
+        try:
+            # Upsert do dia: cria o registro ou converte o existente, limpando horários e atividades
+            registrar_afastamento_periodo(current_user.id, [data_selecionada], tipo_afastamento, classificar=False)
+            db.session.commit()
+            flash(f'Afastamento ({tipo_afastamento}) registrado para {data_selecionada.strftime("%d/%m/%Y")} com sucesso!', 'success')
+            return redirect(url_for('main.dashboard', mes=data_selecionada.month, ano=data_selecionada.year))
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erro ao registrar afastamento para {data_selecionada}: {e}", exc_info=True)
+            flash('Erro ao registrar o afastamento.', 'danger')
+
+    return render_template('main/registrar_afastamento.html', form=form, title="Registrar Afastamento")
+
+
+@main.route('/registrar-ferias', methods=['GET', 'POST'])
+@login_required
+def registrar_ferias():
+    """Registra um período de afastamento (dias úteis entre as datas, sem fins de semana e feriados)."""
+    form = RegistroFeriasForm()
+
+    if form.validate_on_submit():
+        inicio = form.data_inicio.data
+        fim = form.data_fim.data
+        tipo_afastamento = form.tipo_afastamento.data
+        dias = calendario_feriados().dias_uteis_entre(inicio, fim)
+        if not dias:
+            flash('O período informado não contém dias úteis.', 'warning')
         else:
-            # Se não existe, CRIA um novo registro de afastamento
             try:
-                novo_afastamento = Ponto(
-                    user_id=current_user.id,
-                    data=data_selecionada,
-                    afastamento=True,
-                    tipo_afastamento=tipo_afastamento
-                    # Horários e horas ficam como None por padrão
-                )
-                db.session.add(novo_afastamento)
+                # Upsert de todos os dias e limpeza das atividades em uma única transação
+                inseridas, atualizadas = registrar_afastamento_periodo(current_user.id, dias, tipo_afastamento)
                 db.session.commit()
-                flash(f'Afastamento ({tipo_afastamento}) registrado para {data_selecionada.strftime("%d/%m/%Y")} com sucesso!', 'success')
-                return redirect(url_for('main.dashboard', mes=data_selecionada.month, ano=data_selecionada.year))
+                mensagem = (f'{tipo_afastamento} registrado de {inicio.strftime("%d/%m/%Y")} a {fim.strftime("%d/%m/%Y")}: '
+                            f'{len(dias)} dia(s) útil(eis)')
+                if atualizadas:
+                    mensagem += f' ({len(atualizadas)} registro(s) existente(s) substituído(s))'
+                flash(mensagem + '.', 'success')
+                return redirect(url_for('main.dashboard', mes=inicio.month, ano=inicio.year))
             except Exception as e:
                 db.session.rollback()
-                logger.error(f"Erro ao CRIAR registro de afastamento para {data_selecionada}: {e}", exc_info=True)
-                flash('Erro ao registrar novo afastamento.', 'danger')
+                logger.error(f"Erro ao registrar afastamento de {inicio} a {fim}: {e}", exc_info=True)
+                flash('Erro ao registrar o período de afastamento.', 'danger')
 
-    return render_template('main/registrar_afastamento.html', form=form, title="Registrar Afastamento")
+    return render_template('main/registrar_ferias.html', form=form, title="Registrar Férias")
+
+
+@main.route('/bater-ponto', methods=['POST'])
+@login_required
+@idempotente
+def bater_ponto_agora():
+    """Um clique: grava o horário do servidor no próximo campo vazio de hoje e responde com um JSON curto."""
+    try:
+        batida = bater_ponto(current_user.id)
+    except BatidaRecusada as br:
+        return jsonify({'error': str(br)}), 409
+    horario = batida.horario.strftime('%H:%M')
+    return jsonify({
+        'ponto_id': batida.ponto_id,
+        'data': batida.data.isoformat(),
+        'campo': batida.campo,
+        'horario': horario,
+        'proximo': batida.proximo,
+        'horas_trabalhadas': horas_de_minutos(batida.minutos_trabalhados),
+        'mensagem': f"{DESCRICAO_BATIDAS[batida.campo]} às {horario}.",
+    }), 201 if batida.criado else 200
 
 
 # --- ROTAS DE VISUALIZAÇÃO E EDIÇÃO ---
 @main.route('/visualizar-ponto/<int:ponto_id>')
 @login_required
+@orcamento_consultas(2)
 def visualizar_ponto(ponto_id):
     """Exibe os detalhes de um registro de ponto específico."""
-    registro = Ponto.query.get_or_404(ponto_id)
+    # Registro e dono numa consulta (join), atividades numa segunda (selectin)
+    registro = Ponto.query.options(joinedload(Ponto.user), selectinload(Ponto.atividades)).get_or_404(ponto_id)
     # Verifica permissão
     if registro.user_id != current_user.id and not current_user.is_admin:
         flash('Você não tem permissão para visualizar este registro.', 'danger')
         return redirect(url_for('main.dashboard'))
 
-    atividades = Atividade.query.filter_by(ponto_id=ponto_id).all()
-    usuario = User.query.get(registro.user_id) # Busca o usuário dono do ponto
-
     return render_template('main/visualizar_ponto.html',
                            registro=registro,
-                           atividades=atividades,
-                           usuario=usuario, # Passa o usuário para o template
+                           atividades=registro.atividades,
+                           usuario=registro.user, # Passa o usuário para o template
                            title="Visualizar Registro")
 
 @main.route('/editar-ponto/<int:ponto_id>', methods=['GET', 'POST'])
 @login_required
+@orcamento_consultas(2)
 def editar_ponto(ponto_id):
     """Edita um registro de ponto existente."""
-    registro = Ponto.query.get_or_404(ponto_id)
+    registro = Ponto.query.options(selectinload(Ponto.atividades)).get_or_404(ponto_id)
     # Verifica permissão
     if registro.user_id != current_user.id and not current_user.is_admin:
         flash('Você não tem permissão para editar este registro.', 'danger')
@@ -343,8 +363,8 @@ def editar_ponto(ponto_id):
 
     form = EditarPontoForm(obj=registro) # Preenche o form com dados existentes
 
-    # Busca atividade existente para preencher o campo no GET
-    atividade_existente = Atividade.query.filter_by(ponto_id=ponto_id).first()
+    # Atividade existente (já carregada com o registro) para preencher o campo no GET
+    atividade_existente = registro.atividades[0] if registro.atividades else None
     if request.method == 'GET' and atividade_existente:
         form.atividades.data = atividade_existente.descricao
 
@@ -367,7 +387,7 @@ def editar_ponto(ponto_id):
                 registro.saida_almoco = None
                 registro.retorno_almoco = None
                 registro.saida = None
-                registro.horas_trabalhadas = None
+                registro.minutos_trabalhados = None
                 # Remove atividades se virou afastamento
                 if atividade_existente:
                     db.session.delete(atividade_existente)
@@ -378,7 +398,7 @@ def editar_ponto(ponto_id):
                 registro.retorno_almoco = form.retorno_almoco.data
                 registro.saida = form.saida.data
                 # --- Usa a função auxiliar importada ---
-                registro.horas_trabalhadas = calcular_horas(
+                registro.minutos_trabalhados = calcular_minutos(
                     data_selecionada, form.entrada.data, form.saida.data,
                     form.saida_almoco.data, form.retorno_almoco.data
                 )
@@ -400,6 +420,9 @@ def editar_ponto(ponto_id):
             # Redireciona para visualização ou calendário/dashboard
             return redirect(url_for('main.visualizar_ponto', ponto_id=ponto_id))
 
+        except IntegrityError:
+            db.session.rollback()
+            flash(f'Já existe um registro para {data_selecionada.strftime("%d/%m/%Y")}.', 'warning')
         except Exception as e:
             db.session.rollback()
             logger.error(f"Erro ao editar ponto {ponto_id}: {e}", exc_info=True)
@@ -439,9 +462,10 @@ def excluir_ponto(ponto_id):
 # --- ROTAS DE ATIVIDADES ---
 @main.route('/registrar-atividade/<int:ponto_id>', methods=['GET', 'POST'])
 @login_required
+@orcamento_consultas(2)
 def registrar_atividade(ponto_id):
     """Registra ou edita a atividade de um registro de ponto."""
-    ponto = Ponto.query.get_or_404(ponto_id)
+    ponto = Ponto.query.options(selectinload(Ponto.atividades)).get_or_404(ponto_id)
     # Verifica permissão
     if ponto.user_id != current_user.id and not current_user.is_admin:
         flash('Você não tem permissão para editar atividades deste registro.', 'danger')
@@ -452,7 +476,7 @@ def registrar_atividade(ponto_id):
         flash('Não é possível adicionar atividades a um registro de afastamento.', 'warning')
         return redirect(url_for('main.visualizar_ponto', ponto_id=ponto_id))
 
-    atividade_existente = Atividade.query.filter_by(ponto_id=ponto_id).first()
+    atividade_existente = ponto.atividades[0] if ponto.atividades else None
     form = AtividadeForm(obj=atividade_existente) # Preenche com dados existentes se houver
 
     if form.validate_on_submit():
@@ -476,6 +500,8 @@ def registrar_atividade(ponto_id):
 # --- ROTAS DE CALENDÁRIO E RELATÓRIO ---
 @main.route('/calendario')
 @login_required
+@pagina_condicional('main/calendario.html')
+@orcamento_consultas(10) # Inclui a materialização do resumo na primeira visita ao mês
 def calendario():
     """Exibe o calendário mensal com os registros de ponto."""
     try:
@@ -500,10 +526,6 @@ def calendario():
         dados_relatorio = _get_relatorio_mensal_data(user_id_para_visualizar, mes, ano)
         # ---------------------------------------
 
-        # Lista de usuários para o seletor do admin
-        usuarios_para_seletor = None
-        if current_user.is_admin:
-            usuarios_para_seletor = User.query.order_by(User.name).all()
 
         # --- Lógica para gerar a estrutura do calendário ---
         primeiro_dia_mes = date(ano, mes, 1)
@@ -546,8 +568,7 @@ def calendario():
         return render_template(
             'main/calendario.html',
             **dados_relatorio, # Desempacota o dicionário de dados base
-            calendario_data=calendario_data, # Passa a estrutura do calendário
-            usuarios=usuarios_para_seletor # Passa a lista de usuários para o admin
+            calendario_data=calendario_data # Passa a estrutura do calendário
         )
     except ValueError as ve:
         logger.error(f"Erro ao carregar calendário: {ve}", exc_info=True)
@@ -561,6 +582,8 @@ def calendario():
 
 @main.route('/relatorio-mensal')
 @login_required
+@pagina_condicional('main/relatorio_mensal.html')
+@orcamento_consultas(10) # Inclui a materialização do resumo na primeira visita ao mês
 def relatorio_mensal():
     """Exibe o relatório mensal detalhado."""
     try:
@@ -584,10 +607,6 @@ def relatorio_mensal():
         dados_relatorio = _get_relatorio_mensal_data(user_id_para_visualizar, mes, ano, order_desc=False) # Ordena por data ascendente
         # ---------------------------------------
 
-        # Lista de usuários para o seletor do admin
-        usuarios_para_seletor = None
-        if current_user.is_admin:
-            usuarios_para_seletor = User.query.order_by(User.name).all()
 
         # --- Lógica para o Formulário de Relatório Completo ---
         form_completo = RelatorioCompletoForm()
@@ -611,7 +630,6 @@ def relatorio_mensal():
         return render_template(
             'main/relatorio_mensal.html',
             **dados_relatorio, # Desempacota o dicionário de dados base
-            usuarios=usuarios_para_seletor, # Passa a lista de usuários para o admin
             form_completo=form_completo, # Passa o formulário de autoavaliação
             relatorio_completo_salvo=relatorio_completo_salvo # Indica se já existe relatório salvo
         )
@@ -711,28 +729,13 @@ def visualizar_relatorio_completo():
             flash("Você não tem permissão para visualizar este relatório.", 'danger')
             return redirect(url_for('main.dashboard'))
 
-        # Busca o relatório completo salvo
-        relatorio_salvo = RelatorioMensalCompleto.query.filter_by(user_id=user_id, ano=ano, mes=mes).first()
+        # Dados do mês com a autoavaliação salva (mesmo contexto usado pelo PDF e pelo SEI)
+        contexto_completo = contexto_relatorio_completo(user_id, mes, ano)
 
-        if not relatorio_salvo:
+        if contexto_completo is None:
             flash("Relatório completo ainda não foi salvo para este período.", 'warning')
             return redirect(url_for('main.relatorio_mensal', user_id=user_id, mes=mes, ano=ano))
 
-        # --- Usa a função auxiliar importada ---
-        dados_relatorio_base = _get_relatorio_mensal_data(user_id, mes, ano)
-        # ---------------------------------------
-
-        # Cria o contexto completo para o template
-        contexto_completo = {
-            **dados_relatorio_base,
-            'autoavaliacao_data': relatorio_salvo.autoavaliacao,
-            'dificuldades_data': relatorio_salvo.dificuldades,
-            'sugestoes_data': relatorio_salvo.sugestoes,
-            'declaracao_marcada': relatorio_salvo.declaracao_marcada,
-            'data_geracao': relatorio_salvo.updated_at.strftime('%d/%m/%Y %H:%M:%S'), # Usa data de atualização
-            'date_obj': date # Passa o construtor date
-        }
-
         return render_template('main/visualizar_relatorio_completo.html', **contexto_completo)
 
     except ValueError as ve:
@@ -750,102 +753,42 @@ def visualizar_relatorio_completo():
 
 
 # --- ROTAS DE EXPORTAÇÃO ---
-@main.route('/relatorio-pdf')
-@login_required
-def relatorio_mensal_pdf():
-    """Gera e baixa o relatório mensal em PDF."""
-    try:
-        user_id = request.args.get('user_id', default=current_user.id, type=int)
-        mes = request.args.get('mes', default=date.today().month, type=int)
-        ano = request.args.get('ano', default=date.today().year, type=int)
-
-        # Verifica permissão
-        if user_id != current_user.id and not current_user.is_admin:
-            flash('Você não tem permissão para gerar este relatório.', 'danger')
-            return redirect(url_for('main.dashboard'))
-
-        # Verifica se existe relatório completo salvo para incluir autoavaliação
-        relatorio_salvo = RelatorioMensalCompleto.query.filter_by(user_id=user_id, ano=ano, mes=mes).first()
-        contexto_completo = None
-        if relatorio_salvo:
-             # --- Usa a função auxiliar importada ---
-             dados_base = _get_relatorio_mensal_data(user_id, mes, ano)
-             # ---------------------------------------
-             contexto_completo = {
-                 **dados_base,
-                 'autoavaliacao_data': relatorio_salvo.autoavaliacao,
-                 'dificuldades_data': relatorio_salvo.dificuldades,
-                 'sugestoes_data': relatorio_salvo.sugestoes,
-                 'declaracao_marcada': relatorio_salvo.declaracao_marcada,
-                 'data_geracao': relatorio_salvo.updated_at.strftime('%d/%m/%Y %H:%M:%S'),
-                 'titulo': f'Relatório Completo - {dados_base["nome_mes"]}/{ano}'
-             }
-
-        # Gera o PDF (com ou sem autoavaliação)
-        pdf_path_relativo = generate_pdf(user_id, mes, ano, context_completo=contexto_completo)
-
-        if pdf_path_relativo:
-            # Constrói o caminho absoluto e envia o arquivo
-            pdf_path_abs = os.path.join(current_app.static_folder, pdf_path_relativo)
-            if os.path.exists(pdf_path_abs):
-                 return send_file(pdf_path_abs, as_attachment=True)
-            else:
-                 logger.error(f"Arquivo PDF não encontrado após geração: {pdf_path_abs}")
-                 flash('Erro ao encontrar o arquivo PDF gerado.', 'danger')
-        else:
-            flash('Erro ao gerar o relatório PDF.', 'danger')
+def _enfileirar_pelo_link(tipo):
+    """
+    Alternativa sem JavaScript aos botões de exportação: enfileira a tarefa para o
+    worker e leva à página que acompanha o status e oferece o download.
+    """
+    user_id = request.args.get('user_id', default=current_user.id, type=int)
+    mes = request.args.get('mes', default=date.today().month, type=int)
+    ano = request.args.get('ano', default=date.today().year, type=int)
 
+    # Verifica permissão
+    if user_id != current_user.id and not current_user.is_admin:
+        flash('Você não tem permissão para gerar este relatório.', 'danger')
+        return redirect(url_for('main.dashboard'))
+    try:
+        tarefa = enfileirar_exportacao(tipo, user_id, mes, ano, solicitante_id=current_user.id)
     except ValueError as ve:
-        logger.error(f"Erro de valor ao gerar PDF: {ve}", exc_info=True)
-        flash(f"Erro ao processar dados para PDF: {ve}", 'danger')
+        flash(f"Erro ao processar dados para exportação: {ve}", 'danger')
     except Exception as e:
-        logger.error(f"Erro inesperado ao gerar PDF: {e}", exc_info=True)
-        flash('Ocorreu um erro inesperado ao gerar o PDF.', 'danger')
+        db.session.rollback()
+        logger.error(f"Erro ao enfileirar exportação {tipo} ({user_id}, {mes}/{ano}): {e}", exc_info=True)
+        flash('Ocorreu um erro inesperado ao solicitar a exportação.', 'danger')
+    else:
+        return redirect(url_for('main.acompanhar_exportacao', tarefa_id=tarefa.id))
+    return redirect(url_for('main.relatorio_mensal', user_id=user_id, mes=mes, ano=ano))
 
-    # Redireciona de volta em caso de erro
-    user_id_fb = request.args.get('user_id', default=current_user.id, type=int)
-    mes_fb = request.args.get('mes', default=date.today().month, type=int)
-    ano_fb = request.args.get('ano', default=date.today().year, type=int)
-    return redirect(url_for('main.relatorio_mensal', user_id=user_id_fb, mes=mes_fb, ano=ano_fb))
+@main.route('/relatorio-pdf')
+@login_required
+def relatorio_mensal_pdf():
+    """Enfileira o relatório mensal em PDF (com a autoavaliação, se houver relatório completo salvo)."""
+    return _enfileirar_pelo_link('pdf')
 
 @main.route('/relatorio-excel')
 @login_required
 def relatorio_mensal_excel():
-    """Gera e baixa o relatório mensal em Excel."""
-    try:
-        user_id = request.args.get('user_id', default=current_user.id, type=int)
-        mes = request.args.get('mes', default=date.today().month, type=int)
-        ano = request.args.get('ano', default=date.today().year, type=int)
-
-        # Verifica permissão
-        if user_id != current_user.id and not current_user.is_admin:
-            flash('Você não tem permissão para gerar este relatório.', 'danger')
-            return redirect(url_for('main.dashboard'))
-
-        excel_path_relativo = generate_excel(user_id, mes, ano)
-
-        if excel_path_relativo:
-            excel_path_abs = os.path.join(current_app.static_folder, excel_path_relativo)
-            if os.path.exists(excel_path_abs):
-                 return send_file(excel_path_abs, as_attachment=True)
-            else:
-                 logger.error(f"Arquivo Excel não encontrado após geração: {excel_path_abs}")
-                 flash('Erro ao encontrar o arquivo Excel gerado.', 'danger')
-        else:
-            flash('Erro ao gerar o relatório Excel.', 'danger')
-
-    except ValueError as ve:
-        logger.error(f"Erro de valor ao gerar Excel: {ve}", exc_info=True)
-        flash(f"Erro ao processar dados para Excel: {ve}", 'danger')
-    except Exception as e:
-        logger.error(f"Erro inesperado ao gerar Excel: {e}", exc_info=True)
-        flash('Ocorreu um erro inesperado ao gerar o Excel.', 'danger')
-
-    # Redireciona de volta em caso de erro
-    user_id_fb = request.args.get('user_id', default=current_user.id, type=int)
-    mes_fb = request.args.get('mes', default=date.today().month, type=int)
-    ano_fb = request.args.get('ano', default=date.today().year, type=int)
-    return redirect(url_for('main.relatorio_mensal', user_id=user_id_fb, mes=mes_fb, ano=ano_fb))
+    """Enfileira o relatório mensal em Excel."""
+    return _enfileirar_pelo_link('excel')
 
 
 # --- ROTA DE PERFIL ---
@@ -854,7 +797,33 @@ def relatorio_mensal_excel():
 def perfil():
     """Exibe a página de perfil do usuário logado."""
     # A variável current_user já contém o usuário logado
-    return render_template('main/perfil.html', usuario=current_user, title="Meu Perfil")
+    return render_template('main/perfil.html', usuario=current_user, pin_form=PinQuiosqueForm(), title="Meu Perfil")
+
+@main.route('/perfil/pin', methods=['POST'])
+@login_required
+def definir_pin_quiosque():
+    """Cadastra ou troca o PIN usado nos terminais de quiosque (confirmado com a senha)."""
+    form = PinQuiosqueForm()
+    if not form.validate_on_submit():
+        for erros in form.errors.values():
+            for erro in erros:
+                flash(erro, 'danger')
+        return redirect(url_for('main.perfil'))
+    if not current_user.check_password(form.senha_atual.data):
+        flash('Senha atual incorreta.', 'danger')
+        return redirect(url_for('main.perfil'))
+    try:
+        # Commit de User: o mapa de matrículas do quiosque é recarregado em todos os workers
+        current_user.pin_quiosque_hash = gerar_hash_pin(form.pin.data)
+        current_user.falhas_pin_quiosque, current_user.pin_bloqueado_ate = 0, None # PIN novo: sem bloqueio
+        db.session.commit()
+        flash('PIN do quiosque salvo com sucesso.', 'success')
+        logger.info(f"PIN do quiosque definido pelo usuário {current_user.id}.")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao salvar PIN do quiosque do usuário {current_user.id}: {e}", exc_info=True)
+        flash('Erro ao salvar o PIN. Tente novamente.', 'danger')
+    return redirect(url_for('main.perfil'))
 
 # --- ROTA Gerar HTML SEI (MODIFICADA PARA RETORNAR JSON) ---
 @main.route('/gerar-html-sei') # Mantém o nome da rota
@@ -873,32 +842,11 @@ def gerar_html_sei():
         if user_id != current_user.id and not current_user.is_admin:
              return jsonify({'error': 'Permissão negada.'}), 403
 
-        # Busca o relatório completo salvo no banco
-        relatorio_salvo = RelatorioMensalCompleto.query.filter_by(
-            user_id=user_id, ano=ano, mes=mes
-        ).first()
-
-        if not relatorio_salvo:
+        # Renderiza o template SEI a partir do relatório completo salvo
+        codigo_html_sei_renderizado = generate_sei_html(user_id, mes, ano)
+        if codigo_html_sei_renderizado is None:
             return jsonify({'error': 'Relatório completo não encontrado para este período. Salve-o primeiro.'}), 404
 
-        # --- Usa a função auxiliar importada ---
-        dados_relatorio_base = _get_relatorio_mensal_data(user_id, mes, ano)
-        # ---------------------------------------
-
-        # Cria o contexto completo para o template HTML SEI
-        contexto_completo = {
-            **dados_relatorio_base,
-            'autoavaliacao_data': relatorio_salvo.autoavaliacao,
-            'dificuldades_data': relatorio_salvo.dificuldades,
-            'sugestoes_data': relatorio_salvo.sugestoes,
-            'declaracao_marcada': relatorio_salvo.declaracao_marcada,
-            'data_geracao': relatorio_salvo.updated_at.strftime('%d/%m/%Y'), # Apenas data para SEI
-        }
-
-        # --- Renderiza o template SEI para uma string ---
-        codigo_html_sei_renderizado = render_template('main/relatorio_sei_html.html', **contexto_completo)
-        # ---------------------------------------------
-
         # --- Retorna o HTML como JSON ---
         return jsonify({'html_content': codigo_html_sei_renderizado})
         # --------------------------------
@@ -910,3 +858,80 @@ def gerar_html_sei():
         logger.error(f"Erro inesperado ao gerar HTML SEI (JSON): {e}", exc_info=True)
         return jsonify({'error': 'Erro inesperado no servidor.'}), 500
 # --- FIM DA ROTA MODIFICADA ---
+
+# --- ROTAS DA FILA DE EXPORTAÇÕES (processadas por worker.py) ---
+def _tarefa_json(tarefa):
+    dados = {'id': tarefa.id, 'tipo': tarefa.tipo, 'status': tarefa.status,
+             'status_url': url_for('main.status_exportacao', tarefa_id=tarefa.id)}
+    if tarefa.status == TarefaExportacao.CONCLUIDA:
+        dados['download_url'] = url_for('main.baixar_exportacao', tarefa_id=tarefa.id)
+    elif tarefa.status == TarefaExportacao.ERRO:
+        dados['error'] = tarefa.mensagem_erro
+    return dados
+
+def _obter_tarefa_permitida(tarefa_id):
+    """Retorna a tarefa se ela pertence ao usuário atual (ou se é admin); senão None."""
+    tarefa = db.session.get(TarefaExportacao, tarefa_id)
+    if tarefa is None or (tarefa.solicitante_id != current_user.id and not current_user.is_admin):
+        return None
+    return tarefa
+
+@main.route('/exportacoes', methods=['POST'])
+@login_required
+def solicitar_exportacao():
+    """Enfileira uma exportação (pdf, excel ou sei) e responde imediatamente com o status."""
+    tipo = request.form.get('tipo', '')
+    user_id = request.form.get('user_id', default=current_user.id, type=int)
+    mes = request.form.get('mes', default=date.today().month, type=int)
+    ano = request.form.get('ano', default=date.today().year, type=int)
+
+    # O fechamento do mês (ZIP com todos os usuários) é exclusivo de administradores
+    com_autoavaliacao = request.form.get('com_autoavaliacao', '1') != '0'
+    if tipo == 'zip':
+        if not current_user.is_admin:
+            return jsonify({'error': 'Permissão negada.'}), 403
+        user_id = current_user.id
+
+    # Verifica permissão
+    if user_id != current_user.id and not current_user.is_admin:
+        return jsonify({'error': 'Permissão negada.'}), 403
+    try:
+        tarefa = enfileirar_exportacao(tipo, user_id, mes, ano, solicitante_id=current_user.id,
+                                       com_autoavaliacao=com_autoavaliacao)
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro ao enfileirar exportação {tipo} ({user_id}, {mes}/{ano}): {e}", exc_info=True)
+        return jsonify({'error': 'Erro inesperado no servidor.'}), 500
+    return jsonify(_tarefa_json(tarefa)), 202
+
+@main.route('/exportacoes/<int:tarefa_id>')
+@login_required
+def status_exportacao(tarefa_id):
+    """Status da exportação, consultado periodicamente pela interface."""
+    tarefa = _obter_tarefa_permitida(tarefa_id)
+    if tarefa is None:
+        return jsonify({'error': 'Exportação não encontrada.'}), 404
+    return jsonify(_tarefa_json(tarefa))
+
+@main.route('/exportacoes/<int:tarefa_id>/acompanhar')
+@login_required
+def acompanhar_exportacao(tarefa_id):
+    """Página de status da exportação (recarrega sozinha até o arquivo ficar pronto)."""
+    tarefa = _obter_tarefa_permitida(tarefa_id)
+    if tarefa is None:
+        flash('Exportação não encontrada.', 'warning')
+        return redirect(url_for('main.dashboard'))
+    return render_template('main/acompanhar_exportacao.html', tarefa=tarefa)
+
+@main.route('/exportacoes/<int:tarefa_id>/download')
+@login_required
+def baixar_exportacao(tarefa_id):
+    """Baixa o arquivo de uma exportação concluída."""
+    tarefa = _obter_tarefa_permitida(tarefa_id)
+    if tarefa is None or tarefa.status != TarefaExportacao.CONCLUIDA or not tarefa.arquivo or not os.path.exists(tarefa.arquivo):
+        flash('Arquivo de exportação não encontrado ou expirado.', 'warning')
+        return redirect(url_for('main.dashboard'))
+    return send_file(tarefa.arquivo, as_attachment=tarefa.tipo != 'sei', download_name=tarefa.nome_arquivo,
+                     mimetype=MIMETYPES[tarefa.tipo])
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Rotas do modo quiosque (terminais compartilhados). A tela do terminal fica
+aberta o dia todo; cada batida é um POST curto com matrícula e PIN que devolve
+um JSON, sem login nem redirecionamento. Ver app/utils/quiosque.py.
+"""
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask_login import login_required, logout_user, current_user
+from functools import wraps
+from app import db
+from app.controllers.admin import admin_required
+from app.forms.admin import AtivarTerminalForm, DeleteForm
+from app.models.terminal_quiosque import TerminalQuiosque
+from app.utils.batida_ponto import bater_ponto, BatidaRecusada, DESCRICAO_BATIDAS
+from app.utils.quiosque import (terminal_da_sessao, ativar_terminal, revogar_terminal, autenticar_pin,
+                                MatriculaBloqueada, TerminalBloqueado, INTERVALO_MINIMO_BATIDAS)
+import logging
+
+quiosque = Blueprint('quiosque', __name__, url_prefix='/quiosque')
+logger = logging.getLogger(__name__)
+
+
+def terminal_required(func):
+    """Exige um terminal de quiosque ativo na sessão; passa (id, nome) do terminal para a view."""
+    @wraps(func)
+    def decorated_view(*args, **kwargs):
+        terminal = terminal_da_sessao()
+        if terminal is None:
+            if request.method == 'POST':
+                return jsonify({'error': 'Este navegador não está ativado como terminal de quiosque.'}), 403
+            flash('Este navegador não está ativado como terminal de quiosque.', 'warning')
+            return redirect(url_for('quiosque.terminais'))
+        return func(terminal, *args, **kwargs)
+    return decorated_view
+
+
+@quiosque.route('/')
+@terminal_required
+def index(terminal):
+    """Tela do terminal: matrícula, PIN e relógio; nenhuma consulta ao banco."""
+    return render_template('quiosque/index.html', terminal_nome=terminal[1], title="Quiosque de Ponto")
+
+
+@quiosque.route('/bater', methods=['POST'])
+@terminal_required
+def bater(terminal):
+    """Bate o ponto do servidor identificado por matrícula e PIN e responde com um JSON curto."""
+    dados = request.get_json(silent=True) or request.form
+    matricula, pin = (dados.get('matricula') or '').strip(), (dados.get('pin') or '').strip()
+    if not matricula or not pin:
+        return jsonify({'error': 'Informe a matrícula e o PIN.'}), 400
+    try:
+        credencial = autenticar_pin(matricula, pin, terminal[0])
+    except (MatriculaBloqueada, TerminalBloqueado) as bloqueio:
+        return jsonify({'error': str(bloqueio)}), 429
+    if credencial is None:
+        logger.warning(f"Quiosque {terminal[0]}: matrícula ou PIN inválidos ({matricula}).")
+        return jsonify({'error': 'Matrícula ou PIN inválidos.'}), 401
+
+    try:
+        batida = bater_ponto(credencial.user_id, intervalo_minimo=INTERVALO_MINIMO_BATIDAS)
+        db.session.commit()
+    except BatidaRecusada as br:
+        db.session.rollback()
+        return jsonify({'error': str(br), 'nome': credencial.name}), 409
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro na batida do quiosque {terminal[0]} (user {credencial.user_id}): {e}", exc_info=True)
+        return jsonify({'error': 'Erro ao registrar a batida. Tente novamente.'}), 500
+
+    horario = batida.horario.strftime('%H:%M')
+    logger.info(f"Quiosque {terminal[0]}: {batida.campo} de user {credencial.user_id} às {horario}.")
+    return jsonify({
+        'nome': credencial.name,
+        'campo': batida.campo,
+        'horario': horario,
+        'proximo': batida.proximo,
+        'mensagem': f"{DESCRICAO_BATIDAS[batida.campo]} às {horario}.",
+    }), 201 if batida.criado else 200
+
+
+@quiosque.route('/terminais', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def terminais():
+    """Lista os terminais e ativa o navegador atual como um novo terminal."""
+    form = AtivarTerminalForm()
+    if form.validate_on_submit():
+        terminal = ativar_terminal(form.nome.data.strip(), current_user.id)
+        # O terminal fica autenticado como dispositivo; a sessão do administrador termina aqui
+        logout_user()
+        flash(f'Terminal "{terminal.nome}" ativado.', 'success')
+        return redirect(url_for('quiosque.index'))
+    lista = TerminalQuiosque.query.order_by(TerminalQuiosque.ativo.desc(), TerminalQuiosque.nome).all()
+    return render_template('quiosque/terminais.html', form=form, terminais=lista, delete_form=DeleteForm(),
+                           title="Terminais de Quiosque")
+
+
+@quiosque.route('/terminais/<int:terminal_id>/revogar', methods=['POST'])
+@login_required
+@admin_required
+def revogar(terminal_id):
+    """Desativa um terminal: a tela dele deixa de aceitar batidas."""
+    terminal = TerminalQuiosque.query.get_or_404(terminal_id)
+    if terminal.ativo:
+        revogar_terminal(terminal)
+        flash(f'Terminal "{terminal.nome}" revogado.', 'success')
+    return redirect(url_for('quiosque.terminais'))
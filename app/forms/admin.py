@@ -99,3 +99,8 @@ class DeleteForm(FlaskForm):
        em botões/links de exclusão."""
     pass
 
+
+class AtivarTerminalForm(FlaskForm):
+    """Ativa o navegador atual como terminal de quiosque."""
+    nome = StringField('Nome do Terminal', validators=[DataRequired(), Length(max=100)])
+    submit = SubmitField('Ativar Este Navegador como Quiosque')
@@ -2,7 +2,7 @@
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, ValidationError, SelectField
-from wtforms.validators import DataRequired, Email, EqualTo, Length
+from wtforms.validators import DataRequired, Email, EqualTo, Length, Regexp
 from app.models.user import User
 
 class LoginForm(FlaskForm):
@@ -75,3 +75,16 @@ class RegisterForm(FlaskForm):
         if user:
             raise ValidationError('Esta matrícula já está em uso. Por favor, verifique.')
 
+
+class PinQuiosqueForm(FlaskForm):
+    """PIN usado para bater o ponto nos terminais de quiosque (matrícula + PIN)."""
+    senha_atual = PasswordField('Senha Atual', validators=[DataRequired()])
+    pin = PasswordField('Novo PIN (4 a 8 dígitos)', validators=[
+        DataRequired(),
+        Regexp(r'^\d{4,8}$', message='O PIN deve ter de 4 a 8 dígitos.')
+    ])
+    pin2 = PasswordField('Confirmar PIN', validators=[
+        DataRequired(),
+        EqualTo('pin', message='Os PINs devem ser iguais')
+    ])
+    submit = SubmitField('Salvar PIN')
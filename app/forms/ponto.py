@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, PasswordField, BooleanField, SelectField, TextAreaField, DateField, TimeField, SubmitField
 # --- Adicionado ValidationError e datetime ---
 from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional, ValidationError
@@ -127,6 +128,24 @@ class RegistroAfastamentoForm(FlaskForm):
         validators=[DataRequired(message="Selecione o tipo de afastamento.")]
     )
 
+class RegistroFeriasForm(FlaskForm):
+    """Formulário para registro de afastamento por período (férias, licenças longas)."""
+    data_inicio = DateField('Data Inicial', validators=[DataRequired("O campo Data Inicial é obrigatório.")], default=date.today)
+    data_fim = DateField('Data Final', validators=[DataRequired("O campo Data Final é obrigatório.")], default=date.today)
+    tipo_afastamento = SelectField(
+        'Tipo de Afastamento',
+        choices=TIPO_AFASTAMENTO_CHOICES,
+        default='Férias',
+        validators=[DataRequired(message="Selecione o tipo de afastamento.")]
+    )
+
+    def validate_data_fim(self, field):
+        if self.data_inicio.data and field.data:
+            if field.data < self.data_inicio.data:
+                raise ValidationError('A data final deve ser igual ou posterior à data inicial.')
+            if (field.data - self.data_inicio.data).days > 365:
+                raise ValidationError('O período não pode ultrapassar um ano.')
+
 class AtividadeForm(FlaskForm):
     """Formulário para registrar/editar atividades de um ponto."""
     descricao = TextAreaField(
@@ -140,3 +159,12 @@ class MultiploPontoForm(FlaskForm):
     """Formulário vazio usado apenas para gerar o token CSRF
        na página de registro de múltiplos pontos."""
     pass
+
+class ImportacaoPontosForm(FlaskForm):
+    """Formulário de importação de registros de ponto (planilha CSV ou XLSX)."""
+    arquivo = FileField('Planilha (CSV ou XLSX)', validators=[
+        FileRequired('Selecione o arquivo a importar.'),
+        FileAllowed(['csv', 'xlsx'], 'Apenas arquivos CSV ou XLSX são permitidos.')
+    ])
+    simulacao = BooleanField('Apenas simular (não grava nada, mostra o que seria importado)', default=True)
+    submit = SubmitField('Importar')
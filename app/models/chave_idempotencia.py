@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from app import db
+from datetime import datetime
+
+class ChaveIdempotencia(db.Model):
+    """
+    Resposta já enviada para uma chave Idempotency-Key do usuário: repetições da
+    mesma requisição (retentativas, clique duplo) recebem a resposta gravada em vez
+    de executar a operação de novo. Ver app/utils/idempotencia.py.
+    """
+    __tablename__ = 'chaves_idempotencia'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    chave = db.Column(db.String(100), nullable=False)
+    rota = db.Column(db.String(200), nullable=False) # Caminho da requisição original
+    status = db.Column(db.Integer, nullable=True) # Preenchidos ao fim da requisição original
+    resposta = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (db.Index('ix_idempotencia_user_chave', 'user_id', 'chave', unique=True), )
+
+    def __repr__(self):
+        return f'<ChaveIdempotencia {self.chave} - User {self.user_id}>'
@@ -1,5 +1,7 @@
 from app import db
 from datetime import datetime, date, time
+from sqlalchemy.ext.hybrid import hybrid_property
+from app.models.tipos import Horario, horas_de_minutos, minutos_de_horas
 
 class Ponto(db.Model):
     """Modelo para os registros de ponto."""
@@ -8,11 +10,12 @@ class Ponto(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     data = db.Column(db.Date, nullable=False, index=True)
-    entrada = db.Column(db.Time, nullable=True)
-    saida_almoco = db.Column(db.Time, nullable=True)
-    retorno_almoco = db.Column(db.Time, nullable=True)
-    saida = db.Column(db.Time, nullable=True)
-    horas_trabalhadas = db.Column(db.Float, nullable=True)
+    # Horários em minutos desde a meia-noite; no Python continuam datetime.time
+    entrada = db.Column(Horario, nullable=True)
+    saida_almoco = db.Column(Horario, nullable=True)
+    retorno_almoco = db.Column(Horario, nullable=True)
+    saida = db.Column(Horario, nullable=True)
+    minutos_trabalhados = db.Column(db.Integer, nullable=True)
     observacoes = db.Column(db.Text, nullable=True)
     afastamento = db.Column(db.Boolean, default=False, nullable=False)
     tipo_afastamento = db.Column(db.String(100), nullable=True)
@@ -21,9 +24,25 @@ class Ponto(db.Model):
     # ------------------
 
     # Relacionamento com Atividades
-    atividades = db.relationship('Atividade', backref='ponto', lazy=True, cascade="all, delete-orphan")
+    # lazy='select' (padrão): telas com vários registros devem usar selectinload(Ponto.atividades)
+    atividades = db.relationship('Atividade', backref='ponto', lazy='select', order_by='Atividade.id',
+                                 cascade="all, delete-orphan")
 
-    __table_args__ = (db.Index('ix_ponto_user_data', 'user_id', 'data'), )
+    # Um registro por usuário e dia: alvo do INSERT ... ON CONFLICT (user_id, data) das gravações
+    __table_args__ = (db.Index('ix_ponto_user_data', 'user_id', 'data', unique=True), )
+
+    @hybrid_property
+    def horas_trabalhadas(self):
+        """Horas trabalhadas (2 casas), calculadas dos minutos gravados."""
+        return horas_de_minutos(self.minutos_trabalhados)
+
+    @horas_trabalhadas.setter
+    def horas_trabalhadas(self, horas):
+        self.minutos_trabalhados = minutos_de_horas(horas)
+
+    @horas_trabalhadas.expression
+    def horas_trabalhadas(cls):
+        return cls.minutos_trabalhados / 60.0
 
     def __repr__(self):
         return f'<Ponto {self.id} - User {self.user_id} - Data {self.data}>'
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from app import db
+from datetime import datetime
+
+class ResumoMensal(db.Model):
+    """
+    Resumo materializado das estatísticas do relatório mensal (por usuário/mês/ano).
+    Mantido atualizado pelos eventos de sessão em app/utils/resumo_mensal.py,
+    que também mantém as somas acumuladas (`saldo_acumulado`) do banco de horas.
+    """
+    __tablename__ = 'resumos_mensais'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    ano = db.Column(db.Integer, nullable=False)
+    mes = db.Column(db.Integer, nullable=False)
+
+    # Estatísticas do mês (mesmas chaves usadas pelos templates)
+    dias_uteis = db.Column(db.Integer, nullable=False, default=0)
+    dias_trabalhados = db.Column(db.Integer, nullable=False, default=0)
+    dias_afastamento = db.Column(db.Integer, nullable=False, default=0)
+    horas_trabalhadas = db.Column(db.Float, nullable=False, default=0.0)
+    carga_horaria_devida = db.Column(db.Float, nullable=False, default=0.0)
+    saldo_horas = db.Column(db.Float, nullable=False, default=0.0)
+    # Banco de horas: soma dos saldos de todos os meses do usuário até este (inclusive).
+    # Meses sem nenhum registro em dia útil não entram na soma.
+    saldo_acumulado = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+
+    # Incrementada a cada recálculo do mês (valida o cache HTTP e de fragmentos das telas do mês)
+    versao = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Constraint para garantir um único resumo por usuário/mês/ano
+    __table_args__ = (db.UniqueConstraint('user_id', 'ano', 'mes', name='uq_resumo_user_ano_mes'), )
+
+    # Relacionamento (remove os resumos junto com o usuário)
+    usuario = db.relationship('User', backref=db.backref('resumos_mensais', lazy=True, cascade="all, delete-orphan"))
+
+    @property
+    def media_diaria(self):
+        return self.horas_trabalhadas / self.dias_trabalhados if self.dias_trabalhados > 0 else 0.0
+
+    def __repr__(self):
+        return f'<ResumoMensal User {self.user_id} - {self.mes}/{self.ano}>'
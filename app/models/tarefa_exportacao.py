@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from app import db
+from datetime import datetime
+
+class TarefaExportacao(db.Model):
+    """
+    Exportação (PDF, Excel ou HTML SEI) enfileirada para o worker em segundo plano.
+    Processada por worker.py através de app/utils/tarefas.py.
+    """
+    __tablename__ = 'tarefas_exportacao'
+
+    PENDENTE = 'pendente'
+    PROCESSANDO = 'processando'
+    CONCLUIDA = 'concluida'
+    ERRO = 'erro'
+
+    id = db.Column(db.Integer, primary_key=True)
+    solicitante_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False) # Dono do relatório
+    tipo = db.Column(db.String(10), nullable=False) # 'pdf', 'excel', 'sei' ou 'zip' (fechamento do mês)
+    mes = db.Column(db.Integer, nullable=False)
+    ano = db.Column(db.Integer, nullable=False)
+    com_autoavaliacao = db.Column(db.Boolean, nullable=False, default=True, server_default='1') # Só para 'zip'
+
+    status = db.Column(db.String(20), nullable=False, default=PENDENTE, index=True)
+    arquivo = db.Column(db.String(255), nullable=True) # Caminho do resultado no disco
+    nome_arquivo = db.Column(db.String(255), nullable=True) # Nome sugerido para download
+    mensagem_erro = db.Column(db.Text, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    iniciada_em = db.Column(db.DateTime, nullable=True)
+    concluida_em = db.Column(db.DateTime, nullable=True)
+
+    # Relacionamentos (as tarefas são removidas junto com o usuário)
+    solicitante = db.relationship('User', foreign_keys=[solicitante_id],
+                                  backref=db.backref('tarefas_exportacao', lazy=True, cascade="all, delete-orphan"))
+    usuario = db.relationship('User', foreign_keys=[user_id],
+                              backref=db.backref('exportacoes', lazy=True, cascade="all, delete-orphan"))
+
+    @property
+    def finalizada(self):
+        return self.status in (self.CONCLUIDA, self.ERRO)
+
+    def __repr__(self):
+        return f'<TarefaExportacao {self.id} {self.tipo} User {self.user_id} - {self.mes}/{self.ano} ({self.status})>'
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from app import db
+from datetime import datetime
+
+class TerminalQuiosque(db.Model):
+    """
+    Terminal compartilhado em modo quiosque. Um administrador ativa o navegador
+    do terminal, que passa a guardar na sessão o id e o token do terminal (só o
+    hash SHA-256 do token fica no banco); os servidores batem o ponto ali com
+    matrícula e PIN, sem login. Ver app/utils/quiosque.py.
+    """
+    __tablename__ = 'terminais_quiosque'
+
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(100), nullable=False)
+    token_hash = db.Column(db.String(64), nullable=False)
+    ativo = db.Column(db.Boolean, default=True, nullable=False)
+    criado_por = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # PINs errados digitados no terminal desde `falhas_desde` (limite por terminal)
+    falhas_pin = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    falhas_desde = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<TerminalQuiosque {self.id}: {self.nome}>'
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Tipos de coluna compactos dos registros de ponto.
+
+Horários são gravados como minutos desde a meia-noite (INTEGER) e o tempo
+trabalhado como minutos inteiros: somas no SQL são exatas e as linhas ficam
+menores que com TIME (texto 'HH:MM:SS.ffffff' no SQLite) e FLOAT.
+No Python os horários continuam sendo datetime.time.
+"""
+from datetime import time
+from sqlalchemy.types import TypeDecorator, Integer
+
+MINUTOS_DIA = 24 * 60
+
+
+def minutos_de_horario(horario):
+    """datetime.time -> minutos desde a meia-noite (segundos são descartados)."""
+    return None if horario is None else horario.hour * 60 + horario.minute
+
+
+def horario_de_minutos(minutos):
+    """Minutos desde a meia-noite -> datetime.time."""
+    return None if minutos is None else time(*divmod(int(minutos), 60))
+
+
+def horas_de_minutos(minutos):
+    """Minutos trabalhados -> horas com duas casas decimais (como exibido nos relatórios)."""
+    return None if minutos is None else round(minutos / 60, 2)
+
+
+def minutos_de_horas(horas):
+    """Horas (float) -> minutos inteiros."""
+    return None if horas is None else int(round(horas * 60))
+
+
+class Horario(TypeDecorator):
+    """Horário do dia gravado como INTEGER (minutos desde a meia-noite)."""
+    impl = Integer
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return time
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        return minutos_de_horario(value)
+
+    def process_literal_param(self, value, dialect):
+        return str(self.process_bind_param(value, dialect))
+
+    def process_result_value(self, value, dialect):
+        return horario_de_minutos(value)
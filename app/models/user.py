@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 from app import db, login_manager
 from flask_login import UserMixin
+from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from app.utils.texto import normalizar_texto, sufixos_de_palavras
 
 # Esta função é necessária para o Flask-Login carregar o usuário da sessão
 @login_manager.user_loader
@@ -36,8 +38,32 @@ class User(db.Model, UserMixin):
     chefia_imediata = db.Column(db.String(100), nullable=False, server_default='') # Nome da Chefia Imediata
     # ---------------------------------
 
+    # Nome sem acentos e em minúsculas (busca e ordenação na lista de usuários)
+    nome_normalizado = db.Column(db.String(100), nullable=False, server_default='')
+    # Data do registro de ponto mais recente (mantida pelos eventos de app/utils/resumo_mensal.py)
+    ultimo_ponto = db.Column(db.Date, nullable=True)
+    # Hash do PIN do quiosque (app/utils/quiosque.py), separado do hash da senha
+    pin_quiosque_hash = db.Column(db.String(128), nullable=True)
+    # PINs errados seguidos no quiosque e fim do bloqueio da matrícula (vale para todos os workers)
+    falhas_pin_quiosque = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+    pin_bloqueado_ate = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_users_ativo_nome', 'is_active_db', 'nome_normalizado'),
+        db.Index('ix_users_nome_normalizado', 'nome_normalizado'),
+        db.Index('ix_users_uf', 'uf'),
+        db.Index('ix_users_unidade_setor', 'unidade_setor'),
+    )
+
     # Relacionamentos
     pontos = db.relationship('Ponto', backref='user', lazy=True, cascade="all, delete-orphan")
+    sufixos_nome = db.relationship('SufixoNomeUsuario', lazy=True, cascade="all, delete-orphan")
+
+    @validates('name')
+    def _atualizar_nome_normalizado(self, chave, nome):
+        self.nome_normalizado = normalizar_texto(nome)
+        self.sufixos_nome = [SufixoNomeUsuario(sufixo=sufixo) for sufixo in sufixos_de_palavras(self.nome_normalizado)]
+        return nome
 
     def set_password(self, password):
         """Gera o hash da senha e armazena."""
@@ -72,3 +98,17 @@ class User(db.Model, UserMixin):
         """Representação em string do objeto User."""
         return f'<User {self.id}: {self.name} ({self.email})>'
 
+
+class SufixoNomeUsuario(db.Model):
+    """
+    Nome normalizado a partir de cada palavra ('joao da silva', 'da silva', 'silva'):
+    a busca por início de nome ou de sobrenome vira uma faixa na chave primária,
+    em vez de um LIKE '% termo%' que percorre a tabela users inteira.
+    """
+    __tablename__ = 'sufixos_nome_usuario'
+
+    sufixo = db.Column(db.String(100), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+
+    def __repr__(self):
+        return f'<SufixoNomeUsuario {self.sufixo!r} - User {self.user_id}>'
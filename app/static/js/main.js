@@ -25,10 +25,180 @@ function confirmarExclusao(event, mensagem) {
     return true;
 }
 
+// --- Fila de exportações (PDF, Excel, HTML SEI) ---
+// Enfileira a exportação no servidor e consulta o status até o worker concluir.
+// Retorna uma Promise com o JSON final da tarefa (contendo download_url).
+function solicitarExportacao(tipo, userId, mes, ano, extras) {
+    const dados = new FormData();
+    dados.append('tipo', tipo);
+    if (userId) dados.append('user_id', userId);
+    if (mes) dados.append('mes', mes);
+    if (ano) dados.append('ano', ano);
+    Object.entries(extras || {}).forEach(function([nome, valor]) {
+        if (valor !== undefined) dados.append(nome, valor);
+    });
+    const csrfToken = document.querySelector('meta[name="csrf-token"]').getAttribute('content');
+
+    return fetch('/exportacoes', { method: 'POST', body: dados, headers: { 'X-CSRFToken': csrfToken } })
+        .then(lerRespostaExportacao)
+        .then(aguardarExportacao);
+}
+
+function lerRespostaExportacao(response) {
+    return response.json().then(function(data) {
+        if (!response.ok || data.status === 'erro') {
+            throw new Error(data.error || response.statusText);
+        }
+        return data;
+    });
+}
+
+function aguardarExportacao(tarefa) {
+    if (tarefa.status === 'concluida') {
+        return tarefa;
+    }
+    return new Promise(function(resolve) { setTimeout(resolve, 1500); })
+        .then(function() { return fetch(tarefa.status_url); })
+        .then(lerRespostaExportacao)
+        .then(aguardarExportacao);
+}
+
+// Links com data-exportacao passam pela fila; o href continua como alternativa sem JavaScript
+function inicializarExportacoes() {
+    document.querySelectorAll('[data-exportacao]').forEach(function(link) {
+        link.addEventListener('click', function(event) {
+            event.preventDefault();
+            if (link.classList.contains('disabled')) return;
+            const conteudoOriginal = link.innerHTML;
+            link.classList.add('disabled');
+            link.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Gerando...';
+            solicitarExportacao(link.dataset.exportacao, link.dataset.userId, link.dataset.mes, link.dataset.ano,
+                                { com_autoavaliacao: link.dataset.comAutoavaliacao })
+                .then(function(tarefa) {
+                    window.location = tarefa.download_url;
+                })
+                .catch(function(error) {
+                    console.error('Erro na exportação:', error);
+                    alert('Não foi possível gerar o arquivo: ' + error.message);
+                })
+                .finally(function() {
+                    link.classList.remove('disabled');
+                    link.innerHTML = conteudoOriginal;
+                });
+        });
+    });
+}
+
+// Seletor de usuário do admin: busca no servidor enquanto o usuário digita
+function inicializarBuscaUsuarios() {
+    document.querySelectorAll('[data-busca-usuario]').forEach(function(container) {
+        const campoId = container.querySelector('input[type="hidden"]');
+        const campoBusca = container.querySelector('input[type="search"]');
+        const lista = container.querySelector('.list-group');
+        let temporizador = null;
+
+        function fecharLista() {
+            lista.classList.add('d-none');
+            lista.innerHTML = '';
+        }
+
+        function mostrarResultados(usuarios) {
+            lista.innerHTML = '';
+            usuarios.forEach(function(usuario) {
+                const item = document.createElement('button');
+                item.type = 'button';
+                item.className = 'list-group-item list-group-item-action py-1';
+                item.textContent = usuario.name + ' (' + usuario.matricula + ')' + (usuario.ativo ? '' : ' - inativo');
+                item.addEventListener('mousedown', function(event) {
+                    event.preventDefault(); // Mantém o foco até concluir a seleção
+                    campoId.value = usuario.id;
+                    campoBusca.value = usuario.name + ' (' + usuario.matricula + ')';
+                    fecharLista();
+                });
+                lista.appendChild(item);
+            });
+            lista.classList.toggle('d-none', usuarios.length === 0);
+        }
+
+        campoBusca.addEventListener('focus', function() { campoBusca.select(); });
+        campoBusca.addEventListener('blur', fecharLista);
+        campoBusca.addEventListener('input', function() {
+            clearTimeout(temporizador);
+            const termo = campoBusca.value.trim();
+            if (termo.length < 2) {
+                fecharLista();
+                return;
+            }
+            temporizador = setTimeout(function() {
+                fetch(container.dataset.buscaUsuario + '?q=' + encodeURIComponent(termo), {headers: {'Accept': 'application/json'}})
+                    .then(function(response) { return response.ok ? response.json() : []; })
+                    .then(mostrarResultados)
+                    .catch(fecharLista);
+            }, 250);
+        });
+        campoBusca.addEventListener('keydown', function(event) {
+            // Enter escolhe o primeiro resultado em vez de enviar o formulário com o usuário anterior
+            const primeiro = lista.querySelector('button');
+            if (event.key === 'Enter' && primeiro && !lista.classList.contains('d-none')) {
+                event.preventDefault();
+                primeiro.dispatchEvent(new MouseEvent('mousedown'));
+            }
+        });
+    });
+}
+
+// --- Bater ponto com um clique ---
+// Cada clique gera uma Idempotency-Key; a retentativa após falha de rede reenvia a mesma chave,
+// e o servidor devolve a resposta já gravada em vez de registrar outro horário.
+function novaChaveIdempotencia() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+function enviarBatida(url, chave, tentativas) {
+    const csrfToken = document.querySelector('meta[name="csrf-token"]').getAttribute('content');
+    return fetch(url, { method: 'POST', headers: { 'X-CSRFToken': csrfToken, 'Idempotency-Key': chave } })
+        .catch(function(error) {
+            if (tentativas <= 1) throw error;
+            return new Promise(function(resolve) { setTimeout(resolve, 1000); })
+                .then(function() { return enviarBatida(url, chave, tentativas - 1); });
+        });
+}
+
+function inicializarBaterPonto() {
+    const botao = document.getElementById('baterPonto');
+    if (!botao) return;
+    const mensagem = document.getElementById('baterPontoMensagem');
+    botao.addEventListener('click', function() {
+        botao.disabled = true;
+        enviarBatida(botao.dataset.url, novaChaveIdempotencia(), 3)
+            .then(function(response) {
+                return response.json().then(function(data) {
+                    mensagem.className = 'small mb-2 ' + (response.ok ? 'text-success' : 'text-danger');
+                    mensagem.textContent = response.ok ? data.mensagem : data.error;
+                });
+            })
+            .catch(function() {
+                mensagem.className = 'small mb-2 text-danger';
+                mensagem.textContent = 'Sem conexão com o servidor. Tente novamente.';
+            })
+            .finally(function() { botao.disabled = false; });
+    });
+}
+
 // Quando o documento estiver pronto
 document.addEventListener('DOMContentLoaded', function() {
+    // Botão "Bater ponto agora" do dashboard
+    inicializarBaterPonto();
+
     // Inicializa tooltips
     inicializarTooltips();
+
+    // Exportações pela fila em segundo plano
+    inicializarExportacoes();
+
+    // Seletores de usuário com busca
+    inicializarBuscaUsuarios();
     
     // Atualiza o relógio a cada segundo se o elemento existir
     if (document.getElementById('relogio')) {
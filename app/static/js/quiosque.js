@@ -0,0 +1,72 @@
+// Tela do terminal de quiosque: matrícula + PIN, resposta em JSON, sem recarregar a página
+const MENSAGEM_VISIVEL_MS = 4000;
+const RECARREGAR_OCIOSO_MS = 30 * 60 * 1000; // Renova o token CSRF e a página com o terminal ocioso
+
+function atualizarRelogio() {
+    const agora = new Date();
+    const horas = agora.getHours().toString().padStart(2, '0');
+    const minutos = agora.getMinutes().toString().padStart(2, '0');
+    const segundos = agora.getSeconds().toString().padStart(2, '0');
+
+    document.getElementById('relogio').textContent = `${horas}:${minutos}:${segundos}`;
+}
+
+function mostrarMensagem(texto, sucesso) {
+    const mensagem = document.getElementById('mensagemQuiosque');
+    mensagem.className = 'alert mt-4 mb-0 fs-5 ' + (sucesso ? 'alert-success' : 'alert-danger');
+    mensagem.textContent = texto;
+    clearTimeout(mostrarMensagem.temporizador);
+    mostrarMensagem.temporizador = setTimeout(function() { mensagem.classList.add('d-none'); }, MENSAGEM_VISIVEL_MS);
+}
+
+function inicializarQuiosque() {
+    const form = document.getElementById('formQuiosque');
+    const matricula = document.getElementById('matricula');
+    const pin = document.getElementById('pin');
+    const botao = document.getElementById('baterQuiosque');
+    const csrfToken = document.querySelector('meta[name="csrf-token"]').getAttribute('content');
+    let ultimaAtividade = Date.now();
+
+    form.addEventListener('submit', function(event) {
+        event.preventDefault();
+        ultimaAtividade = Date.now();
+        botao.disabled = true;
+        fetch(form.dataset.url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrfToken },
+            body: JSON.stringify({ matricula: matricula.value, pin: pin.value })
+        })
+            .then(function(response) {
+                if (response.status === 400 && !(response.headers.get('Content-Type') || '').includes('json')) {
+                    window.location.reload(); // Token CSRF vencido
+                    return;
+                }
+                return response.json().then(function(data) {
+                    const texto = response.ok ? `${data.nome}: ${data.mensagem}`
+                                              : (data.nome ? `${data.nome}: ${data.error}` : data.error);
+                    mostrarMensagem(texto, response.ok);
+                });
+            })
+            .catch(function() {
+                mostrarMensagem('Sem conexão com o servidor. Tente novamente.', false);
+            })
+            .finally(function() {
+                // Pronto para a próxima pessoa da fila
+                form.reset();
+                botao.disabled = false;
+                matricula.focus();
+            });
+    });
+
+    setInterval(function() {
+        if (Date.now() - ultimaAtividade > RECARREGAR_OCIOSO_MS && !matricula.value && !pin.value) {
+            window.location.reload();
+        }
+    }, 60 * 1000);
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    atualizarRelogio();
+    setInterval(atualizarRelogio, 1000);
+    inicializarQuiosque();
+});
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Perfil de produção do SQLite (vários workers do gunicorn + worker de exportações).
+
+Com as configurações padrão do SQLite, cada gravação bloqueia o arquivo inteiro
+e as requisições concorrentes falham na hora com "database is locked". Este
+perfil aplica em toda conexão nova:
+
+- journal_mode=WAL: leitores não bloqueiam o gravador (e vice-versa);
+- synchronous=NORMAL: seguro com WAL e bem mais rápido que FULL;
+- busy_timeout: espera o lock ser liberado em vez de falhar imediatamente;
+- cache_size e mmap_size: páginas quentes em memória;
+- foreign_keys=ON: integridade referencial (ondelete='CASCADE' das atividades).
+
+Os valores vêm das variáveis de ambiente SQLITE_* (ver `perfil_sqlite`).
+Na criação da app, `verificar_sqlite` lê os valores efetivos e registra no log.
+"""
+import logging
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+
+def perfil_sqlite():
+    """Pragmas e opções de pool do perfil, com os padrões de produção."""
+    return {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL').upper(),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL').upper(),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '15000')),
+        'cache_size': -int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000')),  # Negativo: tamanho em KiB
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE_MB', '128')) * 1024 * 1024,
+        'foreign_keys': os.getenv('SQLITE_FOREIGN_KEYS', '1') not in ('0', 'false', 'False'),
+        'pool_size': int(os.getenv('SQLITE_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('SQLITE_MAX_OVERFLOW', '10')),
+        'pool_timeout': int(os.getenv('SQLITE_POOL_TIMEOUT', '30')),
+    }
+
+
+def _em_memoria(url):
+    return url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+
+
+def configurar_engine_sqlite(app):
+    """
+    Ajusta SQLALCHEMY_ENGINE_OPTIONS para um banco SQLite (chamar antes de db.init_app).
+    Não faz nada para outros bancos.
+    """
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite':
+        return
+    perfil = perfil_sqlite()
+    app.config['SQLITE_PERFIL'] = perfil
+    opcoes = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    connect_args = opcoes.setdefault('connect_args', {})
+    # Timeout do driver (segundos) igual ao busy_timeout; conexões circulam entre threads pelo pool
+    connect_args.setdefault('timeout', perfil['busy_timeout'] / 1000)
+    connect_args.setdefault('check_same_thread', False)
+    if not _em_memoria(url):
+        # O banco em memória usa StaticPool (flask-sqlalchemy); o arquivo usa QueuePool
+        opcoes.setdefault('pool_size', perfil['pool_size'])
+        opcoes.setdefault('max_overflow', perfil['max_overflow'])
+        opcoes.setdefault('pool_timeout', perfil['pool_timeout'])
+
+
+def registrar_pragmas(engine, perfil):
+    """Aplica os pragmas do perfil a cada conexão aberta pelo engine."""
+    @event.listens_for(engine, 'connect')
+    def _aplicar_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA journal_mode={perfil['journal_mode']}")
+            cursor.execute(f"PRAGMA synchronous={perfil['synchronous']}")
+            cursor.execute(f"PRAGMA busy_timeout={perfil['busy_timeout']}")
+            cursor.execute(f"PRAGMA cache_size={perfil['cache_size']}")
+            cursor.execute(f"PRAGMA mmap_size={perfil['mmap_size']}")
+            cursor.execute(f"PRAGMA foreign_keys={'ON' if perfil['foreign_keys'] else 'OFF'}")
+        finally:
+            cursor.close()
+
+
+_NIVEIS_SYNCHRONOUS = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}
+
+
+def verificar_sqlite(engine, perfil):
+    """
+    Autoverificação de inicialização: lê os pragmas efetivos de uma conexão do pool,
+    registra no log e avisa sobre o que difere do perfil (ex.: WAL indisponível no disco).
+    Retorna o dicionário com os valores lidos.
+    """
+    with engine.connect() as conexao:
+        def pragma(nome):
+            return conexao.exec_driver_sql(f'PRAGMA {nome}').scalar()
+        efetivo = {
+            'sqlite_version': conexao.exec_driver_sql('SELECT sqlite_version()').scalar(),
+            'journal_mode': str(pragma('journal_mode')).upper(),
+            'synchronous': _NIVEIS_SYNCHRONOUS.get(pragma('synchronous'), 'DESCONHECIDO'),
+            'busy_timeout': pragma('busy_timeout'),
+            'cache_size': pragma('cache_size'),
+            'mmap_size': pragma('mmap_size'),
+            'foreign_keys': bool(pragma('foreign_keys')),
+        }
+    efetivo['pool'] = engine.pool.status()
+    logger.info("SQLite: " + ', '.join(f'{chave}={valor}' for chave, valor in efetivo.items()))
+
+    em_memoria = _em_memoria(engine.url)
+    for chave in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'foreign_keys'):
+        if chave == 'journal_mode' and em_memoria:
+            continue  # Banco em memória sempre usa journal_mode=memory
+        if efetivo[chave] != perfil[chave]:
+            logger.warning(f"SQLite: {chave}={efetivo[chave]} (perfil pede {perfil[chave]}).")
+    return efetivo
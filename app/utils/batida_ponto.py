@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Batida de ponto com um clique: o horário atual do servidor vai para o próximo
+campo vazio do registro de hoje (entrada -> saída para o almoço -> retorno do
+almoço -> saída).
+
+Cada batida é uma instrução: a primeira cria o registro do dia (INSERT ... ON
+CONFLICT DO NOTHING) e as demais fazem um UPDATE condicionado ao campo ainda
+estar vazio, de modo que duas batidas simultâneas nunca gravam o mesmo campo.
+As horas trabalhadas e o resumo do mês só são recalculados na batida que
+completa o dia; nas intermediárias apenas a versão do resumo (cache das telas)
+muda. Turnos que atravessam a meia-noite continuam sendo lançados pelo formulário.
+Nenhuma função daqui faz commit.
+"""
+import logging
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import select, update
+from app import db
+from app.models.ponto import Ponto
+from app.models.tipos import minutos_de_horario
+from app.utils.gravacao_lote import insert_com_conflito
+from app.utils.helpers import calcular_minutos
+from app.utils.resumo_mensal import sincronizar_resumos, incrementar_versao_resumo
+
+logger = logging.getLogger(__name__)
+
+SEQUENCIA_BATIDAS = ('entrada', 'saida_almoco', 'retorno_almoco', 'saida')
+DESCRICAO_BATIDAS = {'entrada': 'Entrada registrada', 'saida_almoco': 'Saída para o almoço registrada',
+                     'retorno_almoco': 'Retorno do almoço registrado', 'saida': 'Saída registrada'}
+TENTATIVAS = 3 # Releituras quando outra batida grava o mesmo campo ao mesmo tempo
+
+Batida = namedtuple('Batida', 'ponto_id data campo horario proximo minutos_trabalhados criado')
+
+
+class BatidaRecusada(ValueError):
+    """Não há campo a preencher hoje (dia completo ou afastamento)."""
+
+
+def _proximo_campo(horarios):
+    """Primeiro campo da sequência ainda vazio (None se o dia está completo)."""
+    return next((campo for campo in SEQUENCIA_BATIDAS if horarios[campo] is None), None)
+
+
+def bater_ponto(user_id, agora=None, intervalo_minimo=0):
+    """
+    Grava o horário atual (ou `agora`) no próximo campo vazio do dia. Retorna uma Batida.
+    Com `intervalo_minimo` (minutos), recusa a batida feita logo depois da anterior
+    (duplo toque no quiosque, fila que repete a matrícula).
+    """
+    agora = (agora or datetime.now()).replace(second=0, microsecond=0)
+    hoje, horario = agora.date(), agora.time()
+    tabela = Ponto.__table__
+    consulta = select(tabela.c.id, tabela.c.afastamento, *[tabela.c[campo] for campo in SEQUENCIA_BATIDAS])\
+        .where(tabela.c.user_id == user_id, tabela.c.data == hoje)
+
+    for _ in range(TENTATIVAS):
+        registro = db.session.execute(consulta).first()
+        if registro is None:
+            ponto_id = db.session.execute(
+                insert_com_conflito(tabela).values(user_id=user_id, data=hoje, entrada=horario, afastamento=False)
+                .on_conflict_do_nothing(index_elements=['user_id', 'data']).returning(tabela.c.id)
+            ).scalar()
+            if ponto_id is not None:
+                sincronizar_resumos(user_id, [hoje]) # Também atualiza users.ultimo_ponto
+                return Batida(ponto_id, hoje, 'entrada', horario, 'saida_almoco', None, True)
+            continue # Outra batida criou o registro agora: relê
+
+        if registro.afastamento:
+            raise BatidaRecusada('Hoje está registrado como afastamento.')
+        horarios = dict(registro._mapping)
+        campo = _proximo_campo(horarios)
+        if campo is None:
+            raise BatidaRecusada('Todos os horários de hoje já foram registrados.')
+        anterior = horarios[SEQUENCIA_BATIDAS[SEQUENCIA_BATIDAS.index(campo) - 1]] if campo != 'entrada' else None
+        if anterior is not None and 0 <= minutos_de_horario(horario) - minutos_de_horario(anterior) < intervalo_minimo:
+            raise BatidaRecusada(f"Batida anterior registrada às {anterior.strftime('%H:%M')}; "
+                                 f"aguarde {intervalo_minimo} minuto(s) entre as batidas.")
+
+        horarios[campo] = horario
+        valores = {campo: horario}
+        proximo = _proximo_campo(horarios)
+        if proximo is None: # Dia completo: calcula as horas trabalhadas
+            valores['minutos_trabalhados'] = calcular_minutos(hoje, horarios['entrada'], horarios['saida'],
+                                                              horarios['saida_almoco'], horarios['retorno_almoco'])
+        gravado = db.session.execute(
+            update(tabela).where(tabela.c.id == registro.id, tabela.c[campo].is_(None)).values(valores)).rowcount
+        if not gravado:
+            continue # Campo preenchido por outra batida simultânea: relê
+        if proximo is None:
+            sincronizar_resumos(user_id, [hoje])
+        else:
+            incrementar_versao_resumo(user_id, hoje)
+        return Batida(registro.id, hoje, campo, horario, proximo, valores.get('minutos_trabalhados'), False)
+    raise BatidaRecusada('Batidas simultâneas; tente novamente.')
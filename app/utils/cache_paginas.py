@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Cache HTTP e de fragmentos das telas mensais (dashboard, calendário e relatório).
+
+Cada resumo mensal tem uma `versao`, incrementada sempre que um registro, uma
+atividade, um feriado ou a autoavaliação daquele mês muda (app/utils/resumo_mensal.py).
+A ETag das páginas combina essa versão com o que mais aparece na tela (cadastro
+do usuário logado e do usuário exibido, dia atual, sessão), e requisições com If-None-Match
+igual recebem 304 sem consultar registros nem renderizar o template.
+
+Quando a página precisa ser renderizada, a grade do calendário e os cartões de
+resumo vêm de um cache LRU limitado em memória (um por worker), indexado pela
+mesma versão: não é preciso invalidar nada, versões antigas apenas deixam de ser
+usadas e são descartadas pelo limite de itens.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from markupsafe import Markup
+from jinja2 import pass_context
+from sqlalchemy import inspect
+from app import db
+from app.models.resumo_mensal import ResumoMensal
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+class CacheFragmentos:
+    """Cache LRU de HTML renderizado, limitado pelo número de itens."""
+
+    def __init__(self, max_itens):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obter(self, chave):
+        with self._lock:
+            html = self._itens.get(chave)
+            if html is None:
+                self.misses += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return html
+
+    def gravar(self, chave, html):
+        with self._lock:
+            self._itens[chave] = html
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def estatisticas(self):
+        with self._lock:
+            return {'itens': len(self._itens), 'max_itens': self.max_itens, 'hits': self.hits, 'misses': self.misses}
+
+
+def cache_fragmentos():
+    """Cache de fragmentos da aplicação atual (criado no primeiro uso)."""
+    cache = current_app.extensions.get('cache_fragmentos')
+    if cache is None:
+        cache = CacheFragmentos(current_app.config.get('FRAGMENT_CACHE_MAX_ITENS', 512))
+        current_app.extensions['cache_fragmentos'] = cache
+    return cache
+
+
+@pass_context
+def fragmento_em_cache(contexto, nome_template):
+    """
+    Renderiza (ou reaproveita) um template parcial do mês com o contexto da página.
+    Usado nos templates: {{ fragmento_em_cache('main/_calendario_grade.html') }}.
+    """
+    usuario = contexto.get('usuario')
+    versao = contexto.get('versao_resumo')
+    template = contexto.environment.get_template(nome_template)
+    if not usuario or not versao:
+        return Markup(template.render(contexto.get_all()))
+
+    chave = (nome_template, usuario.id, contexto.get('ano_atual'), contexto.get('mes_atual'), versao, date.today())
+    cache = cache_fragmentos()
+    html = cache.obter(chave)
+    if html is None:
+        html = Markup(template.render(contexto.get_all()))
+        cache.gravar(chave, html)
+    return html
+
+
+# --- GET condicional ---
+def _versao_mes(user_id, mes, ano):
+    return db.session.query(ResumoMensal.versao, ResumoMensal.atualizado_em).filter_by(
+        user_id=user_id, ano=ano, mes=mes).first()
+
+
+def _mtime_templates(*nomes):
+    pasta = os.path.join(current_app.root_path, current_app.template_folder)
+    mtimes = []
+    for nome in nomes:
+        try:
+            mtimes.append(os.stat(os.path.join(pasta, nome)).st_mtime_ns)
+        except OSError:
+            mtimes.append(0)
+    return mtimes
+
+
+def _versao_cadastro(usuario):
+    """Valores da linha do usuário em `users`: mudam com qualquer alteração do cadastro dele."""
+    if usuario is None:
+        return None
+    return tuple(getattr(usuario, coluna.key) for coluna in inspect(usuario).mapper.column_attrs)
+
+
+def _etag_pagina(template, user_id, mes, ano, versao):
+    # Token CSRF embutido na página: a ETag muda com a sessão e a cada meia validade do token
+    validade_csrf = current_app.config.get('WTF_CSRF_TIME_LIMIT') or 3600
+    logado = current_user._get_current_object() # Já carregado pelo flask-login: sem consulta
+    exibido = logado if user_id == logado.id else db.session.get(User, user_id)
+    partes = (template, request.full_path, logado.id, user_id, mes, ano, versao, _versao_cadastro(logado),
+              _versao_cadastro(exibido), date.today().isoformat(), session.get('csrf_token'),
+              int(time.time() // max(validade_csrf // 2, 1)), _mtime_templates(template, 'base.html'))
+    return hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()
+
+
+def pagina_condicional(template):
+    """
+    Decorador das telas mensais: responde 304 se a ETag enviada pelo navegador
+    ainda for válida e, caso contrário, adiciona ETag e Last-Modified à página gerada.
+    """
+    def decorador(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            hoje = date.today()
+            user_id = request.args.get('user_id', default=current_user.id, type=int)
+            mes = request.args.get('mes', default=hoje.month, type=int)
+            ano = request.args.get('ano', default=hoje.year, type=int)
+            # Só GETs válidos, sem mensagens flash pendentes (que seriam exibidas nesta página)
+            if (request.method != 'GET' or not 1 <= mes <= 12 or '_flashes' in session
+                    or (user_id != current_user.id and not current_user.is_admin)):
+                return view(*args, **kwargs)
+
+            versao = _versao_mes(user_id, mes, ano)
+            if versao is not None and request.if_none_match:
+                etag = _etag_pagina(template, user_id, mes, ano, versao.versao)
+                if request.if_none_match.contains(etag):
+                    resposta = make_response('', 304)
+                    resposta.set_etag(etag)
+                    resposta.headers['Cache-Control'] = 'private, no-cache'
+                    return resposta
+
+            resposta = make_response(view(*args, **kwargs))
+            versao = _versao_mes(user_id, mes, ano) # A própria view materializa o resumo na primeira visita
+            if resposta.status_code == 200 and versao is not None and '_flashes' not in session:
+                resposta.set_etag(_etag_pagina(template, user_id, mes, ano, versao.versao))
+                resposta.last_modified = versao.atualizado_em
+                resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
+        return wrapper
+    return decorador
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Carimbos de versão compartilhados entre processos (workers do gunicorn).
+
+Cada cache em memória guarda a versão com que foi carregado; quem altera os dados
+chama `incrementar_versao(nome)`, e os demais workers percebem a mudança com um
+simples `os.stat` no arquivo do carimbo, sem consultar o banco de dados.
+"""
+import os
+import logging
+import tempfile
+import time
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+def _diretorio_versoes():
+    diretorio = current_app.config.get('CACHE_VERSAO_DIR') or os.path.join(current_app.instance_path, 'cache')
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def versao_atual(nome):
+    """Retorna a versão atual do carimbo `nome` (0 se nunca foi incrementado)."""
+    try:
+        info = os.stat(os.path.join(_diretorio_versoes(), f'{nome}.versao'))
+    except FileNotFoundError:
+        return 0
+    # O arquivo é sempre substituído (os.replace), então o inode muda a cada incremento
+    return (info.st_ino, info.st_mtime_ns)
+
+
+def incrementar_versao(nome):
+    """Publica uma nova versão do carimbo `nome` para todos os workers."""
+    diretorio = _diretorio_versoes()
+    try:
+        fd, caminho_tmp = tempfile.mkstemp(dir=diretorio, prefix=f'.{nome}.')
+        with os.fdopen(fd, 'w') as arquivo:
+            arquivo.write(str(time.time_ns()))
+        os.replace(caminho_tmp, os.path.join(diretorio, f'{nome}.versao'))
+    except OSError as e:
+        logger.error(f"Erro ao incrementar versão do cache '{nome}': {e}", exc_info=True)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Diretório leve de usuários em memória (seletores e buscas do admin).
+
+Em vez de carregar objetos User completos (inclusive password_hash) a cada
+página, cada worker mantém uma lista de tuplas (id, nome, matrícula,
+unidade/setor, ativo) ordenada por nome. Qualquer commit que crie, altere ou
+exclua um usuário publica uma nova versão do carimbo 'usuarios'
+(app/utils/cache_versao.py) e o diretório é recarregado na próxima leitura.
+"""
+import logging
+import threading
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import event
+from app import db
+from app.models.user import User
+from app.utils.cache_versao import versao_atual, incrementar_versao
+from app.utils.texto import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+NOME_VERSAO_USUARIOS = 'usuarios'
+_USUARIOS_ALTERADOS = 'diretorio_usuarios_alterados'
+_lock = threading.Lock()
+
+UsuarioResumo = namedtuple('UsuarioResumo', 'id name matricula unidade_setor ativo')
+
+
+class DiretorioUsuarios:
+    """Snapshot imutável dos usuários cadastrados."""
+
+    def __init__(self, linhas, versao):
+        self.versao = versao
+        self.usuarios = [UsuarioResumo(*linha) for linha in linhas]
+        self.por_id = {u.id: u for u in self.usuarios}
+        self._chaves_busca = [f"{normalizar_texto(u.name)} {normalizar_texto(u.matricula)}" for u in self.usuarios]
+
+    def ativos(self):
+        return [u for u in self.usuarios if u.ativo]
+
+    def buscar(self, termo, limite=20, apenas_ativos=False):
+        """Usuários cujo nome ou matrícula contém todas as palavras do termo (ignora acentos)."""
+        palavras = normalizar_texto(termo).split()
+        encontrados = []
+        for usuario, chave in zip(self.usuarios, self._chaves_busca):
+            if apenas_ativos and not usuario.ativo:
+                continue
+            if all(palavra in chave for palavra in palavras):
+                encontrados.append(usuario)
+                if len(encontrados) >= limite:
+                    break
+        return encontrados
+
+
+def _estado():
+    return current_app.extensions.setdefault('diretorio_usuarios', {'diretorio': None})
+
+
+def diretorio_usuarios():
+    """Retorna o diretório do worker, recarregando-o se outra versão foi publicada."""
+    estado = _estado()
+    versao = versao_atual(NOME_VERSAO_USUARIOS)
+    diretorio = estado['diretorio']
+    if diretorio is not None and diretorio.versao == versao:
+        return diretorio
+    with _lock:
+        diretorio = estado['diretorio']
+        if diretorio is None or diretorio.versao != versao:
+            linhas = db.session.query(User.id, User.name, User.matricula, User.unidade_setor, User.is_active_db)\
+                .order_by(User.name).all()
+            diretorio = DiretorioUsuarios(linhas, versao)
+            estado['diretorio'] = diretorio
+            logger.info(f"Diretório de usuários carregado: {len(diretorio.usuarios)} usuário(s).")
+    return diretorio
+
+
+# --- Invalidação: qualquer commit com User criado, alterado ou excluído ---
+@event.listens_for(db.session, 'before_flush')
+def _anotar_usuarios_alterados(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            session.info[_USUARIOS_ALTERADOS] = True
+            return
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publicar_usuarios_alterados(session):
+    if session.info.pop(_USUARIOS_ALTERADOS, False):
+        with _lock:
+            _estado()['diretorio'] = None
+        incrementar_versao(NOME_VERSAO_USUARIOS)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _descartar_usuarios_alterados(session, previous_transaction):
+    session.info.pop(_USUARIOS_ALTERADOS, None)
@@ -1,6 +1,45 @@
 from io import BytesIO
 import xlsxwriter
 
+def write_excel_rows(rows, headers, sheet_name='Dados', column_width=15):
+    """
+    Escreve linhas em uma planilha Excel em modo de memória constante.
+
+    Args:
+        rows: Iterável (pode ser um gerador) de dicionários, consumido uma única vez
+        headers: Dicionário ordenado {chave: título da coluna}
+        sheet_name: Nome da planilha
+        column_width: Largura padrão das colunas
+
+    Returns:
+        BytesIO: Buffer contendo o arquivo Excel, posicionado no início
+    """
+    output = BytesIO()
+    # constant_memory: cada linha é gravada assim que a próxima começa, sem manter a planilha em memória
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet(sheet_name)
+
+    header_format = workbook.add_format({
+        'bold': True,
+        'bg_color': '#DDDDDD',
+        'border': 1,
+        'align': 'center',
+        'valign': 'vcenter'
+    })
+    cell_format = workbook.add_format({'border': 1})
+
+    keys = list(headers.keys())
+    worksheet.set_column(0, len(keys) - 1, column_width)
+    worksheet.write_row(0, 0, list(headers.values()), header_format)
+    for row_idx, row_data in enumerate(rows, 1):
+        for col_idx, key in enumerate(keys):
+            worksheet.write(row_idx, col_idx, row_data.get(key, ''), cell_format)
+
+    workbook.close()
+    output.seek(0)
+    return output
+
+
 def generate_excel_report(user, registros, mes, ano, horas_esperadas, horas_trabalhadas, saldo_horas):
     """
     Gera um relatório Excel com os dados do banco de horas do usuário.
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Calendário de feriados em memória, carregado uma vez por worker.
+
+Os feriados mudam raramente; em vez de consultar `feriados` a cada requisição,
+mantemos um vetor ordenado de datas (para buscas por intervalo com bisect) e um
+conjunto por ano (para testes de pertinência). As rotas de administração de
+feriados chamam `invalidar_feriados()`, que publica uma nova versão para todos
+os workers através de app/utils/cache_versao.py.
+"""
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from calendar import monthrange
+from flask import current_app
+from app import db
+from app.models.feriado import Feriado
+from app.utils.cache_versao import versao_atual, incrementar_versao
+
+logger = logging.getLogger(__name__)
+
+_NOME_VERSAO = 'feriados'
+_lock = threading.Lock()
+
+
+class CalendarioFeriados:
+    """Snapshot imutável dos feriados cadastrados."""
+
+    def __init__(self, feriados, versao):
+        self.versao = versao
+        self.descricoes = dict(feriados)
+        self.datas = sorted(self.descricoes)
+        self.por_ano = {}
+        for data_feriado in self.datas:
+            self.por_ano.setdefault(data_feriado.year, set()).add(data_feriado)
+
+    def eh_feriado(self, data_ref):
+        return data_ref in self.por_ano.get(data_ref.year, ())
+
+    def eh_dia_util(self, data_ref):
+        return data_ref.weekday() < 5 and not self.eh_feriado(data_ref)
+
+    def feriados_entre(self, inicio, fim):
+        """Retorna {data: descricao} dos feriados no intervalo fechado [inicio, fim]."""
+        i = bisect_left(self.datas, inicio)
+        j = bisect_right(self.datas, fim)
+        return {d: self.descricoes[d] for d in self.datas[i:j]}
+
+    def feriados_do_mes(self, ano, mes):
+        return self.feriados_entre(date(ano, mes, 1), date(ano, mes, monthrange(ano, mes)[1]))
+
+    def dias_uteis_entre(self, inicio, fim):
+        """Lista os dias úteis (seg-sex, sem feriado) no intervalo fechado [inicio, fim]."""
+        dias = []
+        data_atual = inicio
+        while data_atual <= fim:
+            if self.eh_dia_util(data_atual):
+                dias.append(data_atual)
+            data_atual += timedelta(days=1)
+        return dias
+
+    def dias_uteis_do_mes(self, ano, mes):
+        return self.dias_uteis_entre(date(ano, mes, 1), date(ano, mes, monthrange(ano, mes)[1]))
+
+
+def _estado():
+    # Um calendário por aplicação (cada worker tem a sua instância de app)
+    return current_app.extensions.setdefault('calendario_feriados', {'calendario': None})
+
+
+def calendario_feriados():
+    """Retorna o calendário de feriados do worker, recarregando-o se outra versão foi publicada."""
+    estado = _estado()
+    versao = versao_atual(_NOME_VERSAO)
+    calendario = estado['calendario']
+    if calendario is not None and calendario.versao == versao:
+        return calendario
+    with _lock:
+        calendario = estado['calendario']
+        if calendario is None or calendario.versao != versao:
+            feriados = db.session.query(Feriado.data, Feriado.descricao).order_by(Feriado.data).all()
+            calendario = CalendarioFeriados(feriados, versao)
+            estado['calendario'] = calendario
+            logger.info(f"Calendário de feriados carregado ({len(feriados)} feriados).")
+        return calendario
+
+
+def invalidar_feriados():
+    """Descarta o calendário deste worker e avisa os demais (chamar após o commit)."""
+    with _lock:
+        _estado()['calendario'] = None
+    incrementar_versao(_NOME_VERSAO)
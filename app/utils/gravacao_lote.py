@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Gravação em lote de registros de ponto (registro único e múltiplo, importação, afastamentos).
+
+Cada usuário tem no máximo um registro por dia (índice único ix_ponto_user_data).
+As funções daqui gravam com um único INSERT ... ON CONFLICT (user_id, data) por
+bloco de linhas: DO NOTHING para só inserir, DO UPDATE para upsert. O RETURNING
+devolve os ids gravados, sem consulta de existência antes, e cliques duplos ou
+workers concorrentes não criam registros repetidos. Como essas instruções não
+passam pelos eventos de flush da sessão, os resumos mensais são atualizados com
+`sincronizar_resumos`. Nenhuma delas faz commit: isso fica a cargo de quem chama.
+"""
+import logging
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models.ponto import Ponto, Atividade
+from app.utils.resumo_mensal import sincronizar_resumos
+
+logger = logging.getLogger(__name__)
+
+# Colunas de `pontos` aceitas nas linhas (além de user_id e data)
+CAMPOS_PONTO = ('entrada', 'saida_almoco', 'retorno_almoco', 'saida', 'minutos_trabalhados',
+                'observacoes', 'resultados_produtos', 'afastamento', 'tipo_afastamento')
+
+TAMANHO_BLOCO = 500 # Linhas por INSERT (limite de parâmetros do SQLite)
+
+_INSERT_POR_DIALETO = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def insert_com_conflito(tabela):
+    """INSERT do dialeto do banco atual, com on_conflict_do_nothing/on_conflict_do_update."""
+    return _INSERT_POR_DIALETO[db.session.get_bind().dialect.name](tabela)
+
+
+def datas_existentes(user_id, datas):
+    """Retorna o conjunto das datas (dentre as informadas) que já têm registro do usuário."""
+    datas = set(datas)
+    if not datas:
+        return set()
+    return {d for (d,) in db.session.query(Ponto.data).filter(Ponto.user_id == user_id, Ponto.data.in_(datas))}
+
+
+def _upsert(user_id, linhas, campos, atualizar):
+    """
+    INSERT ... ON CONFLICT (user_id, data) das linhas (datas únicas na lista).
+    Com `atualizar`, as linhas existentes recebem os `campos` informados; sem ele
+    são mantidas como estão. Retorna {data: id} das linhas gravadas.
+    """
+    tabela = Ponto.__table__
+    ids = {}
+    for inicio in range(0, len(linhas), TAMANHO_BLOCO):
+        bloco = linhas[inicio:inicio + TAMANHO_BLOCO]
+        instrucao = insert_com_conflito(tabela).values([
+            {'user_id': user_id, 'data': linha['data'], 'afastamento': False, **{campo: linha[campo] for campo in campos}}
+            for linha in bloco])
+        if atualizar and campos:
+            instrucao = instrucao.on_conflict_do_update(
+                index_elements=['user_id', 'data'], set_={campo: instrucao.excluded[campo] for campo in campos})
+        else:
+            instrucao = instrucao.on_conflict_do_nothing(index_elements=['user_id', 'data'])
+        ids.update(db.session.execute(instrucao.returning(tabela.c.data, tabela.c.id)).all())
+    return ids
+
+
+def _substituir_atividades(ids, linhas):
+    """
+    Para as linhas com a chave 'atividade', troca as atividades do dia pelo
+    texto informado (None apenas as remove). `ids` é o {data: id} do upsert.
+    """
+    com_atividade = [linha for linha in linhas if 'atividade' in linha and linha['data'] in ids]
+    if not com_atividade:
+        return
+    tabela = Atividade.__table__
+    db.session.execute(tabela.delete().where(tabela.c.ponto_id.in_([ids[linha['data']] for linha in com_atividade])))
+    _inserir_atividades(ids, com_atividade)
+
+
+def _inserir_atividades(ids, linhas):
+    """Insere as atividades (texto em 'atividade') das linhas gravadas em uma única instrução."""
+    atividades = [{'ponto_id': ids[linha['data']], 'descricao': linha['atividade']}
+                  for linha in linhas if linha.get('atividade') and linha['data'] in ids]
+    if atividades:
+        db.session.execute(Atividade.__table__.insert(), atividades)
+
+
+def inserir_pontos_lote(user_id, linhas):
+    """
+    Insere os registros novos do usuário; datas que já existem (no banco ou
+    repetidas na própria lista) são ignoradas. Cada linha é um dicionário com
+    'data', as colunas de CAMPOS_PONTO e, opcionalmente, 'atividade' (texto).
+    Retorna (datas inseridas, datas ignoradas).
+    """
+    novas = {}
+    ignoradas = []
+    for linha in linhas:
+        if linha['data'] in novas:
+            ignoradas.append(linha['data'])
+        else:
+            novas[linha['data']] = linha
+    if not novas:
+        return [], ignoradas
+
+    campos = [campo for campo in CAMPOS_PONTO if campo in linhas[0]]
+    ids = _upsert(user_id, list(novas.values()), campos, atualizar=False)
+    ignoradas += [data for data in novas if data not in ids]
+    _inserir_atividades(ids, novas.values())
+
+    inseridas = [data for data in novas if data in ids]
+    if inseridas:
+        sincronizar_resumos(user_id, inseridas)
+    logger.info(f"{len(inseridas)} registro(s) inserido(s) em lote para user {user_id} ({len(ignoradas)} ignorado(s)).")
+    return inseridas, ignoradas
+
+
+def gravar_pontos_lote(user_id, linhas, classificar=True):
+    """
+    Upsert em lote: atualiza os registros do usuário nas datas que já existem e
+    insere os demais (as datas devem ser únicas na lista). Todas as linhas devem
+    trazer as mesmas chaves de CAMPOS_PONTO. Se a linha tiver a chave 'atividade',
+    as atividades daquele dia são substituídas (None apenas as remove).
+    Retorna (datas inseridas, datas atualizadas). A separação entre as duas custa
+    uma consulta; com `classificar=False` ela é pulada e todas as datas vêm como inseridas.
+    """
+    if not linhas:
+        return [], []
+    campos = [campo for campo in CAMPOS_PONTO if campo in linhas[0]]
+    existentes = datas_existentes(user_id, [linha['data'] for linha in linhas]) if classificar else set()
+    ids = _upsert(user_id, linhas, campos, atualizar=True)
+    _substituir_atividades(ids, linhas)
+
+    sincronizar_resumos(user_id, [linha['data'] for linha in linhas])
+    return ([linha['data'] for linha in linhas if linha['data'] not in existentes],
+            [linha['data'] for linha in linhas if linha['data'] in existentes])
+
+
+def registrar_afastamento_periodo(user_id, datas, tipo_afastamento, classificar=True):
+    """
+    Marca as datas informadas como afastamento do usuário: registros existentes
+    têm horários e atividades limpos, os demais são criados. Observações e
+    resultados já lançados são mantidos. Retorna (datas inseridas, datas atualizadas),
+    como em gravar_pontos_lote.
+    """
+    linhas = [{'data': data, 'entrada': None, 'saida_almoco': None, 'retorno_almoco': None, 'saida': None,
+               'minutos_trabalhados': None, 'afastamento': True, 'tipo_afastamento': tipo_afastamento,
+               'atividade': None}
+              for data in sorted(set(datas))]
+    inseridas, atualizadas = gravar_pontos_lote(user_id, linhas, classificar)
+    logger.info(f"Afastamento '{tipo_afastamento}' registrado para user {user_id}: {len(linhas)} dia(s)"
+                + (f", {len(atualizadas)} já existente(s)." if classificar else "."))
+    return inseridas, atualizadas
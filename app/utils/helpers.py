@@ -1,65 +1,112 @@
 # -*- coding: utf-8 -*-
 import logging
+from dataclasses import dataclass, fields, replace
 from datetime import datetime, date, timedelta, time
 from calendar import monthrange
 from app import db # Importa db diretamente
 from app.models.user import User
-from app.models.ponto import Ponto, Atividade
+from app.models.ponto import Ponto
 from app.models.feriado import Feriado
-from sqlalchemy import extract # Necessário para filtros de data
+from app.models.tipos import MINUTOS_DIA, minutos_de_horario, horas_de_minutos
+from flask import g, has_app_context
+from sqlalchemy import event, func, case, and_
+from sqlalchemy.orm import selectinload
+from app.utils.resumo_mensal import obter_resumo_mensal, calcular_estatisticas_mes, JORNADA_DIARIA
+from app.utils.feriados_cache import calendario_feriados
 
 # Configura um logger para este módulo
 logger = logging.getLogger(__name__)
 
-def calcular_horas(data_ref, entrada, saida, saida_almoco=None, retorno_almoco=None):
-    """Calcula as horas trabalhadas em um dia, considerando o almoço."""
+_CAMPOS_ESTATISTICAS = ('dias_uteis', 'dias_trabalhados', 'dias_afastamento', 'horas_trabalhadas', 'carga_horaria_devida', 'saldo_horas')
+
+NOMES_MESES = ['', 'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+def calcular_minutos(data_ref, entrada, saida, saida_almoco=None, retorno_almoco=None):
+    """Calcula os minutos trabalhados em um dia, considerando o almoço."""
     if not entrada or not saida:
         return None
 
     try:
-        dt_entrada = datetime.combine(data_ref, entrada)
-        dt_saida = datetime.combine(data_ref, saida)
+        minutos_entrada = minutos_de_horario(entrada)
+        minutos_saida = minutos_de_horario(saida)
 
         # Se a saída for no dia seguinte (ex: virou meia-noite)
-        if dt_saida < dt_entrada:
-            dt_saida += timedelta(days=1)
+        if minutos_saida < minutos_entrada:
+            minutos_saida += MINUTOS_DIA
 
-        total_seconds = (dt_saida - dt_entrada).total_seconds()
+        total = minutos_saida - minutos_entrada
 
         if saida_almoco and retorno_almoco:
-            dt_saida_almoco = datetime.combine(data_ref, saida_almoco)
-            dt_retorno_almoco = datetime.combine(data_ref, retorno_almoco)
+            minutos_saida_almoco = minutos_de_horario(saida_almoco)
+            minutos_retorno_almoco = minutos_de_horario(retorno_almoco)
 
             # Se o retorno do almoço for no dia seguinte
-            if dt_retorno_almoco < dt_saida_almoco:
-                dt_retorno_almoco += timedelta(days=1)
+            if minutos_retorno_almoco < minutos_saida_almoco:
+                minutos_retorno_almoco += MINUTOS_DIA
 
             # Verifica se o intervalo de almoço está dentro do período de trabalho
-            if dt_saida_almoco >= dt_entrada and dt_retorno_almoco <= dt_saida:
-                almoco_seconds = (dt_retorno_almoco - dt_saida_almoco).total_seconds()
-                # Garante que o almoço não seja negativo e tenha pelo menos 1 hora (3600s)
-                if almoco_seconds >= 3600:
-                     total_seconds -= almoco_seconds
+            if minutos_saida_almoco >= minutos_entrada and minutos_retorno_almoco <= minutos_saida:
+                almoco = minutos_retorno_almoco - minutos_saida_almoco
+                # Garante que o almoço não seja negativo e tenha pelo menos 1 hora
+                if almoco >= 60:
+                     total -= almoco
                 else:
                      # Se o almoço for menor que 1h, não desconta ou loga um aviso
                      logger.warning(f"Intervalo de almoço inválido ou menor que 1h para {data_ref}. Não descontado.")
             else:
                  logger.warning(f"Intervalo de almoço fora do período de trabalho para {data_ref}. Não descontado.")
 
+        return total
 
-        # Retorna horas com duas casas decimais
-        return round(total_seconds / 3600, 2)
-
-    except (TypeError, ValueError) as e:
+    except (TypeError, ValueError, AttributeError) as e:
         logger.error(f"Erro ao calcular horas para {data_ref} com horários: E={entrada}, S={saida}, SA={saida_almoco}, RA={retorno_almoco}. Erro: {e}")
         return None # Retorna None em caso de erro no cálculo
 
 
-def _get_relatorio_mensal_data(user_id, mes, ano, order_desc=True):
-    """Busca e calcula dados para o relatório mensal."""
+def calcular_horas(data_ref, entrada, saida, saida_almoco=None, retorno_almoco=None):
+    """Calcula as horas trabalhadas em um dia (duas casas decimais), considerando o almoço."""
+    return horas_de_minutos(calcular_minutos(data_ref, entrada, saida, saida_almoco, retorno_almoco))
+
+
+@dataclass
+class RelatorioMensal:
+    """Resultado do motor de relatório mensal (usado pelas telas do usuário, do admin e pelas exportações)."""
+    usuario: User
+    registros: list
+    registros_por_data: dict
+    mes_atual: int
+    ano_atual: int
+    nome_mes: str
+    dias_uteis: int
+    dias_trabalhados: int
+    dias_afastamento: int
+    horas_trabalhadas: float
+    carga_horaria_devida: float
+    saldo_horas: float
+    media_diaria: float
+    feriados_dict: dict
+    feriados_datas: set
+    atividades_por_ponto: dict
+    ultimo_dia: date
+    mes_anterior: int
+    ano_anterior: int
+    proximo_mes: int
+    proximo_ano: int
+    versao_resumo: int = 0 # Versão do resumo materializado (chave do cache de fragmentos)
+
+    def como_contexto(self):
+        """Converte o resultado no dicionário de contexto esperado pelos templates."""
+        contexto = {campo.name: getattr(self, campo.name) for campo in fields(self)}
+        contexto['date_obj'] = date # Passa o construtor date para o template
+        return contexto
+
+
+def gerar_relatorio_mensal(user_id, mes, ano, order_desc=True):
+    """
+    Motor único do relatório mensal: busca registros, feriados e atividades do mês
+    e lê as estatísticas do resumo materializado (app/utils/resumo_mensal.py).
+    """
     usuario = User.query.get_or_404(user_id) # get_or_404 pode precisar do contexto da app, talvez get() seja melhor
-    # Alternativa: usuario = db.session.get(User, user_id) # A partir SQLAlchemy 1.4+
-    # Ou: usuario = User.query.get(user_id) # Clássico
     if not usuario:
          logger.error(f"Usuário com ID {user_id} não encontrado ao buscar dados do relatório.")
          raise ValueError(f"Usuário ID {user_id} não encontrado.")
@@ -71,6 +118,10 @@ def _get_relatorio_mensal_data(user_id, mes, ano, order_desc=True):
         logger.error(f"Data inválida fornecida: Mês={mes}, Ano={ano}")
         raise ValueError("Mês ou ano inválido.")
 
+    # Estatísticas lidas do resumo materializado (uma linha em vez de percorrer o mês).
+    # Na primeira leitura o resumo é gravado numa conexão própria; a sessão da requisição não é commitada.
+    resumo = obter_resumo_mensal(user_id, mes, ano)
+
     # Busca registros de ponto
     query_ponto = Ponto.query.filter(
         Ponto.user_id == user_id,
@@ -81,87 +132,181 @@ def _get_relatorio_mensal_data(user_id, mes, ano, order_desc=True):
         query_ponto = query_ponto.order_by(Ponto.data.desc())
     else:
         query_ponto = query_ponto.order_by(Ponto.data.asc())
-    registros = query_ponto.all()
-
-    # Busca feriados
-    feriados = Feriado.query.filter(
-        extract('year', Feriado.data) == ano,
-        extract('month', Feriado.data) == mes
-    ).all()
-    feriados_dict = {f.data: f.descricao for f in feriados}
-    feriados_datas = set(feriados_dict.keys())
-
-    # Busca atividades (otimizado)
-    ponto_ids = [r.id for r in registros]
-    atividades_por_ponto = {}
-    if ponto_ids: # Só busca atividades se houver pontos
-        atividades = Atividade.query.filter(Atividade.ponto_id.in_(ponto_ids)).all()
-        for atv in atividades:
-            if atv.ponto_id not in atividades_por_ponto:
-                atividades_por_ponto[atv.ponto_id] = []
-            atividades_por_ponto[atv.ponto_id].append(atv.descricao)
-
-    # Dicionário de registros para acesso rápido
-    registros_por_data = {r.data: r for r in registros}
-
-    # Cálculo de estatísticas
-    dias_uteis_potenciais = 0
-    dias_afastamento = 0
-    dias_trabalhados = 0
-    horas_trabalhadas = 0.0
-
-    for dia_num in range(1, ultimo_dia.day + 1):
-        data_atual = date(ano, mes, dia_num)
-        # Considera dia útil se não for fim de semana E não for feriado
-        if data_atual.weekday() < 5 and data_atual not in feriados_datas:
-            dias_uteis_potenciais += 1
-            registro_dia = registros_por_data.get(data_atual)
-            # Conta como afastamento se for dia útil E tiver registro marcado como afastamento
-            if registro_dia and registro_dia.afastamento:
-                dias_afastamento += 1
-
-    # Calcula dias e horas trabalhadas (apenas em dias que deveriam ser úteis)
-    for r_data, r_obj in registros_por_data.items():
-        # Só conta se NÃO for afastamento E tiver horas calculadas
-        if not r_obj.afastamento and r_obj.horas_trabalhadas is not None:
-             # E se o dia do registro era um dia útil potencial
-             if r_data.weekday() < 5 and r_data not in feriados_datas:
-                 dias_trabalhados += 1
-                 horas_trabalhadas += r_obj.horas_trabalhadas
-
-    # Carga horária devida = (Dias úteis potenciais - dias de afastamento nesses dias úteis) * 8h
-    carga_horaria_devida = (dias_uteis_potenciais - dias_afastamento) * 8.0
-    saldo_horas = horas_trabalhadas - carga_horaria_devida
-    media_diaria = horas_trabalhadas / dias_trabalhados if dias_trabalhados > 0 else 0.0
-
-    nomes_meses = ['', 'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-    nome_mes = nomes_meses[mes]
+    # Atividades carregadas junto (selectin): os templates podem usar registro.atividades sem N+1
+    registros = query_ponto.options(selectinload(Ponto.atividades)).all()
+
+    # Feriados do calendário em memória (sem consulta ao banco)
+    feriados_dict = calendario_feriados().feriados_do_mes(ano, mes)
+    atividades_por_ponto = _atividades_por_ponto(registros)
 
+    estatisticas = {campo: getattr(resumo, campo) for campo in _CAMPOS_ESTATISTICAS}
+    return _montar_relatorio(usuario, registros, estatisticas, feriados_dict, atividades_por_ponto, mes, ano,
+                             versao_resumo=resumo.versao or 0)
+
+
+def _atividades_por_ponto(registros):
+    """Descrições das atividades (já carregadas) agrupadas pelo id do registro."""
+    return {r.id: [atv.descricao for atv in r.atividades] for r in registros if r.atividades}
+
+
+def _montar_relatorio(usuario, registros, estatisticas, feriados_dict, atividades_por_ponto, mes, ano,
+                      versao_resumo=0):
+    """Monta o RelatorioMensal a partir dos dados já carregados."""
     # Navegação entre meses
     mes_anterior, ano_anterior = (12, ano - 1) if mes == 1 else (mes - 1, ano)
     proximo_mes, proximo_ano = (1, ano + 1) if mes == 12 else (mes + 1, ano)
+    dias_trabalhados = estatisticas['dias_trabalhados']
+
+    return RelatorioMensal(
+        usuario=usuario,
+        registros=registros,
+        registros_por_data={r.data: r for r in registros},
+        mes_atual=mes,
+        ano_atual=ano,
+        nome_mes=NOMES_MESES[mes],
+        media_diaria=estatisticas['horas_trabalhadas'] / dias_trabalhados if dias_trabalhados > 0 else 0.0,
+        feriados_dict=feriados_dict,
+        feriados_datas=set(feriados_dict),
+        atividades_por_ponto=atividades_por_ponto,
+        ultimo_dia=date(ano, mes, monthrange(ano, mes)[1]),
+        mes_anterior=mes_anterior,
+        ano_anterior=ano_anterior,
+        proximo_mes=proximo_mes,
+        proximo_ano=proximo_ano,
+        versao_resumo=versao_resumo,
+        **estatisticas,
+    )
+
+
+def gerar_relatorios_mensais_lote(usuarios, mes, ano, order_desc=True):
+    """
+    Versão em lote do motor do relatório mensal (fechamento do mês): carrega os
+    registros e as atividades de todos os usuários informados em duas consultas e
+    calcula as estatísticas em memória. Retorna {user_id: RelatorioMensal}.
+    """
+    try:
+        primeiro_dia = date(ano, mes, 1)
+        ultimo_dia = date(ano, mes, monthrange(ano, mes)[1])
+    except ValueError:
+        logger.error(f"Data inválida fornecida: Mês={mes}, Ano={ano}")
+        raise ValueError("Mês ou ano inválido.")
+
+    user_ids = [u.id for u in usuarios]
+    ordem = Ponto.data.desc() if order_desc else Ponto.data.asc()
+    registros = Ponto.query.filter(
+        Ponto.user_id.in_(user_ids),
+        Ponto.data >= primeiro_dia,
+        Ponto.data <= ultimo_dia
+    ).options(selectinload(Ponto.atividades)).order_by(Ponto.user_id, ordem).all() if user_ids else []
+
+    registros_por_usuario = {}
+    for registro in registros:
+        registros_por_usuario.setdefault(registro.user_id, []).append(registro)
+    atividades_por_ponto = _atividades_por_ponto(registros)
+
+    feriados_dict = calendario_feriados().feriados_do_mes(ano, mes)
+    feriados_datas = set(feriados_dict)
+    relatorios = {}
+    for usuario in usuarios:
+        registros_usuario = registros_por_usuario.get(usuario.id, [])
+        # Mesmas regras do resumo materializado (calcular_estatisticas_mes)
+        estatisticas = calcular_estatisticas_mes(
+            ano, mes, [(r.data, r.afastamento, r.minutos_trabalhados) for r in registros_usuario], feriados_datas)
+        atividades_usuario = {r.id: atividades_por_ponto[r.id] for r in registros_usuario if r.id in atividades_por_ponto}
+        relatorios[usuario.id] = _montar_relatorio(usuario, registros_usuario, estatisticas, feriados_dict,
+                                                   atividades_usuario, mes, ano)
+    return relatorios
+
+
+# --- Memoização do relatório mensal por requisição ---
+_RELATORIOS_DA_REQUISICAO = '_relatorios_mensais'
+
+
+def relatorio_mensal_da_requisicao(user_id, mes, ano, order_desc=True):
+    """
+    gerar_relatorio_mensal memoizado em flask.g: a view e as funções de exportação
+    que ela chama (PDF, SEI, relatório completo) consultam o mês uma única vez por
+    requisição. A ordem inversa é obtida do resultado já carregado, sem nova consulta.
+    Qualquer flush da sessão descarta a memória (os dados podem ter mudado).
+    """
+    if not has_app_context():
+        return gerar_relatorio_mensal(user_id, mes, ano, order_desc)
+    memoria = g.setdefault(_RELATORIOS_DA_REQUISICAO, {})
+    chave = (user_id, mes, ano, order_desc)
+    relatorio = memoria.get(chave)
+    if relatorio is None:
+        inverso = memoria.get((user_id, mes, ano, not order_desc))
+        if inverso is not None:
+            relatorio = replace(inverso, registros=inverso.registros[::-1])
+        else:
+            relatorio = gerar_relatorio_mensal(user_id, mes, ano, order_desc)
+        # Gravado depois de gerar: a primeira leitura do mês materializa o resumo e faz flush
+        g.setdefault(_RELATORIOS_DA_REQUISICAO, {})[chave] = relatorio
+    return relatorio
+
+
+def descartar_relatorios_da_requisicao(*args, **kwargs):
+    """Esquece os relatórios memoizados (fim da requisição ou gravação na sessão)."""
+    if has_app_context():
+        g.pop(_RELATORIOS_DA_REQUISICAO, None)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _descartar_relatorios_apos_flush(session, flush_context):
+    descartar_relatorios_da_requisicao()
+
+
+def _get_relatorio_mensal_data(user_id, mes, ano, order_desc=True):
+    """Busca e calcula dados para o relatório mensal (contexto em dicionário para os templates)."""
+    # Um dicionário novo a cada chamada: os consumidores podem acrescentar chaves sem afetar a memória
+    return relatorio_mensal_da_requisicao(user_id, mes, ano, order_desc).como_contexto()
+
+
+def gerar_relatorio_equipe(mes, ano, unidade_setor=None, chefia_imediata=None):
+    """
+    Consolida o mês de todos os usuários ativos (opcionalmente filtrados por
+    unidade/setor e chefia imediata) em uma única consulta agregada sobre `pontos`.
+    Os dias úteis vêm do calendário de feriados em memória.
+    """
+    try:
+        dias_uteis = calendario_feriados().dias_uteis_do_mes(ano, mes)
+    except ValueError:
+        logger.error(f"Data inválida fornecida: Mês={mes}, Ano={ano}")
+        raise ValueError("Mês ou ano inválido.")
+
+    # Agrega apenas os registros em dias úteis (mesma regra do relatório individual)
+    agregado = db.session.query(
+        Ponto.user_id.label('user_id'),
+        func.count(case((Ponto.afastamento == True, 1))).label('dias_afastamento'),
+        func.count(case((and_(Ponto.afastamento == False, Ponto.minutos_trabalhados.isnot(None)), 1))).label('dias_trabalhados'),
+        func.sum(case((Ponto.afastamento == False, Ponto.minutos_trabalhados))).label('minutos_trabalhados'),
+    ).filter(Ponto.data.in_(dias_uteis)).group_by(Ponto.user_id).subquery()
+
+    query = db.session.query(
+        User.id, User.name, User.matricula, User.unidade_setor, User.chefia_imediata,
+        agregado.c.dias_afastamento, agregado.c.dias_trabalhados, agregado.c.minutos_trabalhados,
+    ).outerjoin(agregado, agregado.c.user_id == User.id).filter(User.is_active_db == True)
+    if unidade_setor:
+        query = query.filter(User.unidade_setor == unidade_setor)
+    if chefia_imediata:
+        query = query.filter(User.chefia_imediata == chefia_imediata)
 
-    return {
-        'usuario': usuario,
-        'registros': registros,
-        'registros_por_data': registros_por_data,
-        'mes_atual': mes,
-        'ano_atual': ano,
-        'nome_mes': nome_mes,
-        'dias_uteis': dias_uteis_potenciais,
-        'dias_trabalhados': dias_trabalhados,
-        'dias_afastamento': dias_afastamento,
-        'horas_trabalhadas': horas_trabalhadas,
-        'carga_horaria_devida': carga_horaria_devida,
-        'saldo_horas': saldo_horas,
-        'media_diaria': media_diaria,
-        'feriados_dict': feriados_dict,
-        'feriados_datas': feriados_datas,
-        'atividades_por_ponto': atividades_por_ponto,
-        'ultimo_dia': ultimo_dia,
-        'mes_anterior': mes_anterior,
-        'ano_anterior': ano_anterior,
-        'proximo_mes': proximo_mes,
-        'proximo_ano': proximo_ano,
-        'date_obj': date # Passa o construtor date para o template
-    }
+    linhas = []
+    for user_id, nome, matricula, setor, chefia, dias_afastamento, dias_trabalhados, minutos in query.order_by(User.name):
+        dias_afastamento = dias_afastamento or 0
+        horas = (minutos or 0) / 60  # Soma exata em minutos inteiros
+        carga_horaria_devida = (len(dias_uteis) - dias_afastamento) * JORNADA_DIARIA
+        linhas.append({
+            'user_id': user_id,
+            'nome': nome,
+            'matricula': matricula,
+            'unidade_setor': setor,
+            'chefia_imediata': chefia,
+            'dias_uteis': len(dias_uteis),
+            'dias_trabalhados': dias_trabalhados or 0,
+            'dias_afastamento': dias_afastamento,
+            'horas_trabalhadas': round(horas, 2),
+            'carga_horaria_devida': carga_horaria_devida,
+            'saldo_horas': round(horas - carga_horaria_devida, 2),
+        })
+    return linhas
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Chaves de idempotência (cabeçalho Idempotency-Key) para rotas de escrita.
+
+O cliente gera uma chave por operação (ex.: um UUID por clique) e a reenvia nas
+retentativas. A primeira requisição reserva a chave com INSERT ... ON CONFLICT
+DO NOTHING na mesma transação da operação e grava a resposta junto; as
+repetições recebem a resposta gravada (cabeçalho Idempotent-Replayed) sem
+executar a operação de novo. Chaves expiram após VALIDADE.
+
+A view decorada não faz commit: o decorador confirma a transação (operação,
+chave e resposta juntas) para respostas abaixo de 500 e desfaz nas demais, de
+modo que uma falha no servidor libera a chave para nova tentativa.
+"""
+import logging
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import jsonify, make_response, request
+from flask_login import current_user
+from sqlalchemy import select
+from app import db
+from app.models.chave_idempotencia import ChaveIdempotencia
+from app.utils.gravacao_lote import insert_com_conflito
+
+logger = logging.getLogger(__name__)
+
+CABECALHO = 'Idempotency-Key'
+VALIDADE = timedelta(hours=24)
+TAMANHO_MAXIMO = 100
+
+
+def _reservar(tabela, chave):
+    """Reserva a chave do usuário; retorna False se ela já existia (requisição repetida)."""
+    agora = datetime.utcnow()
+    # Chaves vencidas do usuário saem aqui mesmo (uma instrução, pelo índice (user_id, chave))
+    db.session.execute(tabela.delete().where(tabela.c.user_id == current_user.id,
+                                             tabela.c.created_at < agora - VALIDADE))
+    reservada = db.session.execute(
+        insert_com_conflito(tabela)
+        .values(user_id=current_user.id, chave=chave, rota=request.path, created_at=agora)
+        .on_conflict_do_nothing(index_elements=['user_id', 'chave'])
+        .returning(tabela.c.id)
+    ).scalar()
+    return reservada is not None
+
+
+def _repetir(tabela, chave):
+    """Resposta gravada para a chave (ou erro, se ela pertence a outra rota)."""
+    anterior = db.session.execute(
+        select(tabela.c.rota, tabela.c.status, tabela.c.resposta)
+        .where(tabela.c.user_id == current_user.id, tabela.c.chave == chave)
+    ).one()
+    db.session.rollback()
+    if anterior.rota != request.path:
+        return jsonify({'error': f'{CABECALHO} já usada em outra requisição.'}), 422
+    if anterior.status is None:
+        return jsonify({'error': 'Requisição com esta chave ainda em andamento.'}), 409
+    resposta = make_response(anterior.resposta, anterior.status)
+    resposta.mimetype = 'application/json'
+    resposta.headers['Idempotent-Replayed'] = 'true'
+    return resposta
+
+
+def idempotente(view):
+    """Decorador de view JSON de escrita: repetições com a mesma Idempotency-Key recebem a mesma resposta."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        chave = request.headers.get(CABECALHO, '').strip()
+        if len(chave) > TAMANHO_MAXIMO:
+            return jsonify({'error': f'{CABECALHO} deve ter no máximo {TAMANHO_MAXIMO} caracteres.'}), 400
+        tabela = ChaveIdempotencia.__table__
+        try:
+            if chave and not _reservar(tabela, chave):
+                return _repetir(tabela, chave)
+            resposta = make_response(view(*args, **kwargs))
+            if resposta.status_code >= 500:
+                db.session.rollback()
+                return resposta
+            if chave:
+                db.session.execute(
+                    tabela.update().where(tabela.c.user_id == current_user.id, tabela.c.chave == chave)
+                    .values(status=resposta.status_code, resposta=resposta.get_data(as_text=True)))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erro na requisição idempotente {request.path} (chave '{chave}'): {e}", exc_info=True)
+            return jsonify({'error': 'Erro inesperado no servidor.'}), 500
+        return resposta
+    return wrapper
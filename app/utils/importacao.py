@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Importação de registros de ponto a partir de planilhas CSV ou XLSX.
+
+O arquivo é lido linha a linha (csv.reader sobre o stream do upload ou
+openpyxl em modo read_only), cada linha é validada e tem as horas calculadas
+com `calcular_minutos`, e as linhas válidas são gravadas em lotes com
+`gravar_pontos_lote` (upsert). A memória usada não depende do tamanho do
+arquivo: só o lote atual e o conjunto de (usuário, data) já vistos ficam em
+memória. No modo simulação cada lote é desfeito com rollback, e o relatório
+mostra o que seria inserido ou atualizado.
+"""
+import csv
+import codecs
+import logging
+import unicodedata
+from datetime import date, datetime, time
+from openpyxl import load_workbook
+from app import db
+from app.models.user import User
+from app.utils.helpers import calcular_minutos
+from app.utils.gravacao_lote import gravar_pontos_lote
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 500
+MAX_ERROS_RELATORIO = 100
+
+# Cabeçalhos aceitos (normalizados: sem acentos, minúsculos, '_' no lugar de símbolos).
+# Inclui os cabeçalhos do próprio Excel exportado pelo sistema.
+COLUNAS = {
+    'data': 'data',
+    'matricula': 'matricula',
+    'entrada': 'entrada',
+    'saida_almoco': 'saida_almoco',
+    'retorno_almoco': 'retorno_almoco',
+    'saida': 'saida',
+    'observacoes': 'observacoes',
+    'resultados_produtos': 'resultados_produtos',
+    'atividade': 'atividade',
+    'atividades': 'atividade',
+    'tipo_afastamento': 'tipo_afastamento',
+    'afastamento': 'tipo_afastamento',
+    'status': 'status',
+}
+
+
+class RelatorioImportacao:
+    """Totais da importação (ou da simulação) exibidos ao usuário."""
+
+    def __init__(self, simulacao):
+        self.simulacao = simulacao
+        self.linhas_lidas = 0
+        self.inseridos = 0
+        self.atualizados = 0
+        self.ignorados = 0 # Linhas sem horários nem afastamento (ex.: fins de semana do Excel exportado)
+        self.total_erros = 0
+        self.erros = []
+
+    def adicionar_erro(self, numero_linha, mensagem):
+        self.total_erros += 1
+        if len(self.erros) < MAX_ERROS_RELATORIO:
+            self.erros.append(f"Linha {numero_linha}: {mensagem}")
+
+
+def _normalizar_cabecalho(nome):
+    texto = unicodedata.normalize('NFKD', str(nome or '')).encode('ascii', 'ignore').decode('ascii').lower()
+    return '_'.join(''.join(c if c.isalnum() else ' ' for c in texto).split())
+
+
+def _mapear_cabecalhos(cabecalhos):
+    return [COLUNAS.get(_normalizar_cabecalho(nome)) for nome in cabecalhos]
+
+
+def ler_linhas_csv(stream):
+    """Gera (número da linha, dicionário) de um CSV separado por ';' ou ','."""
+    # iterdecode funciona com qualquer stream binário iterável (inclusive o SpooledTemporaryFile do upload)
+    texto = codecs.iterdecode(stream, 'utf-8-sig')
+    primeira = next(texto, '')
+    delimitador = ';' if primeira.count(';') >= primeira.count(',') else ','
+    cabecalhos = _mapear_cabecalhos(next(csv.reader([primeira], delimiter=delimitador), []))
+    for numero, valores in enumerate(csv.reader(texto, delimiter=delimitador), start=2):
+        yield numero, {chave: valor for chave, valor in zip(cabecalhos, valores) if chave}
+
+
+def ler_linhas_xlsx(stream):
+    """Gera (número da linha, dicionário) da primeira planilha de um XLSX (modo read_only)."""
+    planilha = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        linhas = planilha.worksheets[0].iter_rows(values_only=True)
+        cabecalhos = _mapear_cabecalhos(next(linhas, ()))
+        for numero, valores in enumerate(linhas, start=2):
+            yield numero, {chave: valor for chave, valor in zip(cabecalhos, valores) if chave}
+    finally:
+        planilha.close()
+
+
+def ler_linhas(arquivo):
+    """Escolhe o leitor pelo nome do arquivo enviado (FileStorage)."""
+    nome = (arquivo.filename or '').lower()
+    if nome.endswith('.csv'):
+        return ler_linhas_csv(arquivo.stream)
+    if nome.endswith('.xlsx'):
+        return ler_linhas_xlsx(arquivo.stream)
+    raise ValueError("Formato não suportado. Envie um arquivo .csv ou .xlsx.")
+
+
+def _texto(valor):
+    if valor is None:
+        return None
+    texto = str(valor).strip()
+    return texto or None
+
+
+def _converter_data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = _texto(valor)
+    if not texto:
+        raise ValueError("data ausente")
+    for formato in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(f"data inválida '{texto}' (use DD/MM/AAAA)")
+
+
+def _converter_hora(valor):
+    if isinstance(valor, datetime):
+        return valor.time().replace(second=0, microsecond=0)
+    if isinstance(valor, time):
+        return valor.replace(second=0, microsecond=0)
+    texto = _texto(valor)
+    if not texto:
+        return None
+    try:
+        return datetime.strptime(texto[:5], '%H:%M').time()
+    except ValueError:
+        raise ValueError(f"horário inválido '{texto}' (use HH:MM)")
+
+
+def _tipo_afastamento(dados):
+    tipo = _texto(dados.get('tipo_afastamento'))
+    if tipo:
+        return tipo
+    # Coluna 'Status' do Excel exportado: "Afastamento (Férias)"
+    status = _texto(dados.get('status')) or ''
+    if status.startswith('Afastamento (') and status.endswith(')'):
+        return status[len('Afastamento ('):-1]
+    return None
+
+
+def converter_linha(dados):
+    """Valida a linha da planilha e devolve o dicionário aceito por gravar_pontos_lote (ou None se vazia)."""
+    data_ponto = _converter_data(dados.get('data'))
+    tipo_afastamento = _tipo_afastamento(dados)
+    observacoes = _texto(dados.get('observacoes'))
+    resultados = _texto(dados.get('resultados_produtos'))
+    if tipo_afastamento:
+        return {'data': data_ponto, 'entrada': None, 'saida_almoco': None, 'retorno_almoco': None, 'saida': None,
+                'minutos_trabalhados': None, 'observacoes': observacoes, 'resultados_produtos': resultados,
+                'afastamento': True, 'tipo_afastamento': tipo_afastamento, 'atividade': None}
+
+    entrada = _converter_hora(dados.get('entrada'))
+    saida_almoco = _converter_hora(dados.get('saida_almoco'))
+    retorno_almoco = _converter_hora(dados.get('retorno_almoco'))
+    saida = _converter_hora(dados.get('saida'))
+    if not any((entrada, saida_almoco, retorno_almoco, saida)):
+        return None
+    if bool(saida_almoco) != bool(retorno_almoco):
+        raise ValueError("informe a saída e o retorno do almoço juntos")
+    linha = {'data': data_ponto, 'entrada': entrada, 'saida_almoco': saida_almoco,
+             'retorno_almoco': retorno_almoco, 'saida': saida,
+             'minutos_trabalhados': calcular_minutos(data_ponto, entrada, saida, saida_almoco, retorno_almoco),
+             'observacoes': observacoes, 'resultados_produtos': resultados,
+             'afastamento': False, 'tipo_afastamento': None}
+    atividade = _texto(dados.get('atividade'))
+    if atividade:
+        linha['atividade'] = atividade
+    return linha
+
+
+def _gravar_lote(lote, relatorio):
+    """Grava o lote (agrupado por usuário) e atualiza os totais; desfaz tudo se for simulação."""
+    try:
+        for user_id, linhas in lote.items():
+            # Linhas com e sem atividade têm chaves diferentes: gravadas separadamente
+            for com_atividade in (True, False):
+                grupo = [linha for linha in linhas if ('atividade' in linha) == com_atividade]
+                inseridas, atualizadas = gravar_pontos_lote(user_id, grupo)
+                relatorio.inseridos += len(inseridas)
+                relatorio.atualizados += len(atualizadas)
+        if relatorio.simulacao:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    lote.clear()
+
+
+def importar_pontos(linhas, user_id=None, simulacao=False, tamanho_lote=TAMANHO_LOTE):
+    """
+    Importa as linhas (pares (número, dicionário) de ler_linhas). Com `user_id`
+    todas as linhas são do usuário informado (importação do próprio usuário);
+    sem ele a coluna 'matricula' identifica o usuário de cada linha (admin).
+    Retorna um RelatorioImportacao.
+    """
+    relatorio = RelatorioImportacao(simulacao)
+    matriculas = None
+    if user_id is None:
+        matriculas = dict(db.session.query(User.matricula, User.id))
+    vistos = set()
+    lote = {}
+    tamanho_atual = 0
+
+    for numero, dados in linhas:
+        if not any(_texto(valor) for valor in dados.values()):
+            continue # Linha totalmente vazia
+        relatorio.linhas_lidas += 1
+        try:
+            dono = user_id
+            if matriculas is not None:
+                matricula = _texto(dados.get('matricula'))
+                if not matricula:
+                    raise ValueError("matrícula ausente")
+                dono = matriculas.get(matricula)
+                if dono is None:
+                    raise ValueError(f"matrícula '{matricula}' não encontrada")
+            linha = converter_linha(dados)
+            if linha is None:
+                relatorio.ignorados += 1
+                continue
+            if (dono, linha['data']) in vistos:
+                raise ValueError(f"data {linha['data'].strftime('%d/%m/%Y')} repetida no arquivo")
+        except ValueError as ve:
+            relatorio.adicionar_erro(numero, str(ve))
+            continue
+
+        vistos.add((dono, linha['data']))
+        lote.setdefault(dono, []).append(linha)
+        tamanho_atual += 1
+        if tamanho_atual >= tamanho_lote:
+            _gravar_lote(lote, relatorio)
+            tamanho_atual = 0
+
+    if lote:
+        _gravar_lote(lote, relatorio)
+    logger.info(f"Importação {'(simulação) ' if simulacao else ''}concluída: {relatorio.linhas_lidas} linhas, "
+                f"{relatorio.inseridos} inseridas, {relatorio.atualizados} atualizadas, {relatorio.total_erros} erros.")
+    return relatorio
@@ -0,0 +1,522 @@
+# -*- coding: utf-8 -*-
+"""
+Migrações versionadas do esquema do banco.
+
+A versão aplicada fica na tabela `schema_version` (uma linha por migração).
+O script de implantação (init_db_production.py) aplica as migrações pendentes
+uma única vez; na inicialização de cada worker, `verificar_esquema` apenas lê a
+versão atual (uma consulta) em vez de rodar db.create_all() e sondar colunas.
+
+Para alterar o esquema: acrescente uma função ao fim de MIGRACOES. Migrações
+aplicadas nunca são editadas nem reordenadas. Bancos antigos, anteriores à
+tabela schema_version, começam da versão 0 e passam por todas as migrações,
+por isso as primeiras verificam se a coluna já existe antes do ALTER TABLE.
+Cada migração usa só definições congeladas (tabelas, índices e regras das
+cargas de dados como eram na sua versão), nunca os modelos nem funções da
+aplicação: estes mudam depois e quebrariam a atualização de bancos antigos.
+"""
+import logging
+import os
+import sqlite3
+import unicodedata
+from contextlib import contextmanager
+from calendar import monthrange
+from datetime import date, datetime
+from sqlalchemy import (inspect, text, select, insert, update, func, and_, or_, case, bindparam, MetaData, Table,
+                        Column, Index, ForeignKey, UniqueConstraint, Integer, String, Boolean, Date, DateTime, Time,
+                        Float, Text)
+from app import db
+
+try:
+    import fcntl
+except ImportError: # Windows: sem trava entre processos (implantação com um único processo)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class EsquemaDesatualizado(RuntimeError):
+    """O banco está numa versão de esquema anterior à esperada pelo código."""
+
+
+def _adicionar_coluna(conexao, tabela, coluna, definicao):
+    """ALTER TABLE ADD COLUMN, se a coluna ainda não existir (bancos criados antes das migrações)."""
+    colunas = {c['name'] for c in inspect(conexao).get_columns(tabela)}
+    if coluna not in colunas:
+        logger.info(f"Adicionando coluna {tabela}.{coluna}")
+        conexao.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}"))
+
+
+def _criar_indice(conexao, nome, tabela, colunas, unico=False):
+    """CREATE INDEX, se o índice ainda não existir (colunas fixas da migração, não as do modelo atual)."""
+    conexao.execute(text(f"CREATE {'UNIQUE ' if unico else ''}INDEX IF NOT EXISTS {nome} ON {tabela} ({colunas})"))
+
+
+# --- Esquema da migração 1, congelado ---
+# Cópia das tabelas como eram antes do controle de versão. Não usa os modelos atuais:
+# colunas novas entram só pelas migrações seguintes, num banco novo ou antigo.
+_ESQUEMA_V1 = MetaData()
+
+Table('users', _ESQUEMA_V1,
+      Column('id', Integer, primary_key=True),
+      Column('name', String(100), nullable=False),
+      Column('email', String(100), nullable=False, unique=True, index=True),
+      Column('matricula', String(20), nullable=False, unique=True, index=True),
+      Column('cargo', String(100)),
+      Column('uf', String(2)),
+      Column('telefone', String(20)),
+      Column('vinculo', String(50), nullable=False),
+      Column('foto_path', String(255)),
+      Column('password_hash', String(128), nullable=False),
+      Column('is_admin', Boolean, nullable=False),
+      Column('data_cadastro', DateTime, nullable=False),
+      Column('is_active_db', Boolean, nullable=False, server_default='1'),
+      Column('unidade_setor', String(150), nullable=False, server_default=''),
+      Column('chefia_imediata', String(100), nullable=False, server_default=''))
+
+Table('feriados', _ESQUEMA_V1,
+      Column('id', Integer, primary_key=True),
+      Column('data', Date, nullable=False, unique=True),
+      Column('descricao', String(100), nullable=False))
+
+Table('pontos', _ESQUEMA_V1,
+      Column('id', Integer, primary_key=True),
+      Column('user_id', Integer, ForeignKey('users.id'), nullable=False, index=True),
+      Column('data', Date, nullable=False, index=True),
+      Column('entrada', Time),
+      Column('saida_almoco', Time),
+      Column('retorno_almoco', Time),
+      Column('saida', Time),
+      Column('horas_trabalhadas', Float),
+      Column('observacoes', Text),
+      Column('afastamento', Boolean, nullable=False),
+      Column('tipo_afastamento', String(100)),
+      Column('resultados_produtos', Text),
+      Index('ix_ponto_user_data', 'user_id', 'data'))
+
+Table('atividades', _ESQUEMA_V1,
+      Column('id', Integer, primary_key=True),
+      Column('ponto_id', Integer, ForeignKey('pontos.id', ondelete='CASCADE'), nullable=False, index=True),
+      Column('descricao', Text, nullable=False),
+      Column('created_at', DateTime))
+
+Table('relatorios_completos', _ESQUEMA_V1,
+      Column('id', Integer, primary_key=True),
+      Column('user_id', Integer, ForeignKey('users.id'), nullable=False, index=True),
+      Column('ano', Integer, nullable=False, index=True),
+      Column('mes', Integer, nullable=False, index=True),
+      Column('autoavaliacao', Text, nullable=False),
+      Column('dificuldades', Text, nullable=False),
+      Column('sugestoes', Text, nullable=False),
+      Column('declaracao_marcada', Boolean, nullable=False),
+      Column('created_at', DateTime),
+      Column('updated_at', DateTime),
+      UniqueConstraint('user_id', 'ano', 'mes', name='uq_user_ano_mes_relatorio'))
+
+Table('resumos_mensais', _ESQUEMA_V1,
+      Column('id', Integer, primary_key=True),
+      Column('user_id', Integer, ForeignKey('users.id'), nullable=False, index=True),
+      Column('ano', Integer, nullable=False),
+      Column('mes', Integer, nullable=False),
+      Column('dias_uteis', Integer, nullable=False),
+      Column('dias_trabalhados', Integer, nullable=False),
+      Column('dias_afastamento', Integer, nullable=False),
+      Column('horas_trabalhadas', Float, nullable=False),
+      Column('carga_horaria_devida', Float, nullable=False),
+      Column('saldo_horas', Float, nullable=False),
+      Column('atualizado_em', DateTime),
+      UniqueConstraint('user_id', 'ano', 'mes', name='uq_resumo_user_ano_mes'))
+
+Table('tarefas_exportacao', _ESQUEMA_V1,
+      Column('id', Integer, primary_key=True),
+      Column('solicitante_id', Integer, ForeignKey('users.id'), nullable=False, index=True),
+      Column('user_id', Integer, ForeignKey('users.id'), nullable=False),
+      Column('tipo', String(10), nullable=False),
+      Column('mes', Integer, nullable=False),
+      Column('ano', Integer, nullable=False),
+      Column('com_autoavaliacao', Boolean, nullable=False, server_default='1'),
+      Column('status', String(20), nullable=False, index=True),
+      Column('arquivo', String(255)),
+      Column('nome_arquivo', String(255)),
+      Column('mensagem_erro', Text),
+      Column('created_at', DateTime),
+      Column('iniciada_em', DateTime),
+      Column('concluida_em', DateTime))
+
+
+# --- Tabelas criadas pelas migrações 6, 7 e 10, congeladas ---
+# Como eram ao serem criadas; colunas posteriores (ex.: falhas_pin, migração 9) entram pelo ALTER TABLE.
+_TABELAS_NOVAS = MetaData()
+
+Table('users', _TABELAS_NOVAS, Column('id', Integer, primary_key=True)) # Só para as chaves estrangeiras
+
+_CHAVES_IDEMPOTENCIA_V6 = Table(
+    'chaves_idempotencia', _TABELAS_NOVAS,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+    Column('chave', String(100), nullable=False),
+    Column('rota', String(200), nullable=False),
+    Column('status', Integer),
+    Column('resposta', Text),
+    Column('created_at', DateTime, nullable=False),
+    Index('ix_idempotencia_user_chave', 'user_id', 'chave', unique=True))
+
+_TERMINAIS_QUIOSQUE_V7 = Table(
+    'terminais_quiosque', _TABELAS_NOVAS,
+    Column('id', Integer, primary_key=True),
+    Column('nome', String(100), nullable=False),
+    Column('token_hash', String(64), nullable=False),
+    Column('ativo', Boolean, nullable=False),
+    Column('criado_por', Integer, ForeignKey('users.id', ondelete='SET NULL')),
+    Column('created_at', DateTime, nullable=False))
+
+_SUFIXOS_NOME_USUARIO_V10 = Table(
+    'sufixos_nome_usuario', _TABELAS_NOVAS,
+    Column('sufixo', String(100), primary_key=True),
+    Column('user_id', Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True))
+
+
+# --- Colunas lidas e gravadas pelas cargas de dados, congeladas ---
+# Só as que as migrações 2, 5 e 8 usam, todas já existentes na versão em que cada uma roda.
+_CARGAS = MetaData()
+
+_PONTOS = Table('pontos', _CARGAS,
+                Column('id', Integer, primary_key=True),
+                Column('user_id', Integer),
+                Column('data', Date),
+                Column('afastamento', Boolean),
+                Column('minutos_trabalhados', Integer))
+
+_FERIADOS = Table('feriados', _CARGAS, Column('data', Date))
+
+_RESUMOS = Table('resumos_mensais', _CARGAS,
+                 Column('id', Integer, primary_key=True),
+                 Column('user_id', Integer),
+                 Column('ano', Integer),
+                 Column('mes', Integer),
+                 Column('dias_uteis', Integer),
+                 Column('dias_trabalhados', Integer),
+                 Column('dias_afastamento', Integer),
+                 Column('horas_trabalhadas', Float),
+                 Column('carga_horaria_devida', Float),
+                 Column('saldo_horas', Float),
+                 Column('saldo_acumulado', Float),
+                 Column('versao', Integer),
+                 Column('atualizado_em', DateTime))
+
+_JORNADA_DIARIA = 8.0
+
+
+def _normalizar_nome(nome):
+    """Minúsculas e sem acentos, como na migração 3 (cópia fixa de app/utils/texto.py)."""
+    return unicodedata.normalize('NFKD', nome or '').encode('ascii', 'ignore').decode('ascii').lower().strip()
+
+
+def _sufixos_nome(nome_normalizado):
+    """Nome a partir de cada palavra, como na migração 10 (cópia fixa de app/utils/texto.py)."""
+    palavras = nome_normalizado.split()
+    return [' '.join(palavras[i:]) for i in range(len(palavras))]
+
+
+def _estatisticas_mes(ano, mes, registros, feriados):
+    """
+    Resumo de um mês fechado a partir de tuplas (data, afastamento, minutos), com as
+    regras da versão em que as migrações 5 e 8 foram escritas: dias úteis são seg-sex
+    sem feriado; afastamento abate 8h da carga; minutos somados e convertidos no fim.
+    """
+    por_data = {registro[0]: registro for registro in registros}
+    dias_uteis = dias_afastamento = dias_trabalhados = minutos_trabalhados = 0
+    for dia in range(1, monthrange(ano, mes)[1] + 1):
+        data = date(ano, mes, dia)
+        if data.weekday() >= 5 or data in feriados:
+            continue
+        dias_uteis += 1
+        registro = por_data.get(data)
+        if registro is None:
+            continue
+        if registro[1]:
+            dias_afastamento += 1
+        elif registro[2] is not None:
+            dias_trabalhados += 1
+            minutos_trabalhados += registro[2]
+    horas = minutos_trabalhados / 60
+    carga = (dias_uteis - dias_afastamento) * _JORNADA_DIARIA
+    return {'dias_uteis': dias_uteis, 'dias_trabalhados': dias_trabalhados, 'dias_afastamento': dias_afastamento,
+            'horas_trabalhadas': horas, 'carga_horaria_devida': carga, 'saldo_horas': horas - carga}
+
+
+def _materializar_resumos(conexao, meses=None):
+    """
+    Recalcula e grava (update ou insert) os resumos mensais dos meses com registro de
+    ponto; com `meses` ({(user_id, ano, mes)}), só esses. O saldo acumulado é refeito
+    depois por _recalcular_saldo_acumulado. Retorna quantos resumos foram gravados.
+    """
+    consulta = select(_PONTOS.c.user_id, _PONTOS.c.data, _PONTOS.c.afastamento, _PONTOS.c.minutos_trabalhados)
+    if meses is not None:
+        if not meses:
+            return 0
+        consulta = consulta.where(_PONTOS.c.user_id.in_({user_id for user_id, _, _ in meses}))
+    registros_por_mes = {}
+    for user_id, data, afastamento, minutos in conexao.execute(consulta):
+        chave = (user_id, data.year, data.month)
+        if meses is None or chave in meses:
+            registros_por_mes.setdefault(chave, []).append((data, afastamento, minutos))
+    if not registros_por_mes:
+        return 0
+
+    feriados = set(conexao.execute(select(_FERIADOS.c.data)).scalars())
+    existentes = {(user_id, ano, mes): id_resumo for id_resumo, user_id, ano, mes in conexao.execute(
+        select(_RESUMOS.c.id, _RESUMOS.c.user_id, _RESUMOS.c.ano, _RESUMOS.c.mes))}
+    agora = datetime.utcnow()
+    novos, alterados = [], []
+    for (user_id, ano, mes), registros in registros_por_mes.items():
+        valores = _estatisticas_mes(ano, mes, registros, feriados)
+        valores['atualizado_em'] = agora
+        if (user_id, ano, mes) in existentes:
+            alterados.append({'b_id': existentes[(user_id, ano, mes)], **valores})
+        else:
+            novos.append({'user_id': user_id, 'ano': ano, 'mes': mes, 'saldo_acumulado': 0.0, 'versao': 1, **valores})
+    if novos:
+        conexao.execute(insert(_RESUMOS), novos)
+    if alterados:
+        colunas = ('dias_uteis', 'dias_trabalhados', 'dias_afastamento', 'horas_trabalhadas',
+                   'carga_horaria_devida', 'saldo_horas', 'atualizado_em')
+        conexao.execute(update(_RESUMOS).where(_RESUMOS.c.id == bindparam('b_id'))
+                        .values(versao=_RESUMOS.c.versao + 1, **{coluna: bindparam(coluna) for coluna in colunas}),
+                        alterados)
+    return len(registros_por_mes)
+
+
+def _recalcular_saldo_acumulado(conexao):
+    """
+    Banco de horas em um UPDATE: o acumulado de cada resumo é a soma dos saldos do
+    usuário até aquele mês (meses sem dia trabalhado nem afastamento não contam).
+    """
+    anteriores = _RESUMOS.alias('anteriores')
+    contribuicao = case((or_(anteriores.c.dias_trabalhados > 0, anteriores.c.dias_afastamento > 0),
+                         anteriores.c.saldo_horas), else_=0.0)
+    soma = select(func.coalesce(func.sum(contribuicao), 0.0)).where(
+        anteriores.c.user_id == _RESUMOS.c.user_id,
+        or_(anteriores.c.ano < _RESUMOS.c.ano,
+            and_(anteriores.c.ano == _RESUMOS.c.ano, anteriores.c.mes <= _RESUMOS.c.mes)),
+    ).scalar_subquery()
+    conexao.execute(update(_RESUMOS).values(saldo_acumulado=soma))
+
+
+# --- Migrações (em ordem; nunca editar as já publicadas) ---
+def _m001_tabelas_base(conexao):
+    """Tabelas base (esquema congelado acima) e colunas acrescentadas antes do controle de versão."""
+    _ESQUEMA_V1.create_all(bind=conexao)
+    _adicionar_coluna(conexao, 'users', 'is_active_db', 'BOOLEAN NOT NULL DEFAULT 1')
+    _adicionar_coluna(conexao, 'pontos', 'afastamento', 'BOOLEAN DEFAULT 0')
+    _adicionar_coluna(conexao, 'pontos', 'tipo_afastamento', 'VARCHAR(100)')
+    _adicionar_coluna(conexao, 'pontos', 'observacoes', 'TEXT')
+    _adicionar_coluna(conexao, 'pontos', 'resultados_produtos', 'TEXT')
+    _adicionar_coluna(conexao, 'atividades', 'created_at', 'DATETIME DEFAULT CURRENT_TIMESTAMP')
+    _adicionar_coluna(conexao, 'users', 'unidade_setor', "TEXT NOT NULL DEFAULT ''")
+    _adicionar_coluna(conexao, 'users', 'chefia_imediata', "TEXT NOT NULL DEFAULT ''")
+    _adicionar_coluna(conexao, 'tarefas_exportacao', 'com_autoavaliacao', 'BOOLEAN NOT NULL DEFAULT 1')
+
+
+def _m002_banco_de_horas(conexao):
+    """Soma acumulada do banco de horas e versão dos resumos mensais."""
+    _adicionar_coluna(conexao, 'resumos_mensais', 'saldo_acumulado', 'FLOAT NOT NULL DEFAULT 0')
+    _adicionar_coluna(conexao, 'resumos_mensais', 'versao', 'INTEGER NOT NULL DEFAULT 0')
+    _recalcular_saldo_acumulado(conexao)
+
+
+def _m003_lista_de_usuarios(conexao):
+    """Nome normalizado, último registro e índices da lista de usuários."""
+    _adicionar_coluna(conexao, 'users', 'nome_normalizado', "VARCHAR(100) NOT NULL DEFAULT ''")
+    _adicionar_coluna(conexao, 'users', 'ultimo_ponto', 'DATE')
+    _criar_indice(conexao, 'ix_users_ativo_nome', 'users', 'is_active_db, nome_normalizado')
+    _criar_indice(conexao, 'ix_users_nome_normalizado', 'users', 'nome_normalizado')
+    _criar_indice(conexao, 'ix_users_uf', 'users', 'uf')
+    _criar_indice(conexao, 'ix_users_unidade_setor', 'users', 'unidade_setor')
+    nomes = conexao.execute(text("SELECT id, name FROM users WHERE nome_normalizado = ''")).all()
+    if nomes:
+        conexao.execute(text("UPDATE users SET nome_normalizado = :nome WHERE id = :id"),
+                        [{'id': id_usuario, 'nome': _normalizar_nome(nome)} for id_usuario, nome in nomes])
+    conexao.execute(text(
+        "UPDATE users SET ultimo_ponto = (SELECT max(p.data) FROM pontos p WHERE p.user_id = users.id) "
+        "WHERE ultimo_ponto IS NULL"))
+
+
+def _m004_minutos_inteiros(conexao):
+    """Horários em minutos desde a meia-noite e tempo trabalhado em minutos inteiros."""
+    colunas = {c['name']: c for c in inspect(conexao).get_columns('pontos')}
+    horarios = ('entrada', 'saida_almoco', 'retorno_almoco', 'saida')
+    if conexao.dialect.name == 'sqlite':
+        # As colunas TIME têm afinidade NUMERIC: os inteiros passam a ser gravados como INTEGER
+        for coluna in horarios:
+            conexao.execute(text(
+                f"UPDATE pontos SET {coluna} = CAST(substr({coluna}, 1, 2) AS INTEGER) * 60 "
+                f"+ CAST(substr({coluna}, 4, 2) AS INTEGER) WHERE typeof({coluna}) = 'text'"))
+    else:
+        for coluna in horarios:
+            if not isinstance(colunas[coluna]['type'], Integer):
+                conexao.execute(text(
+                    f"ALTER TABLE pontos ALTER COLUMN {coluna} TYPE INTEGER "
+                    f"USING (EXTRACT(HOUR FROM {coluna}) * 60 + EXTRACT(MINUTE FROM {coluna}))::integer"))
+
+    _adicionar_coluna(conexao, 'pontos', 'minutos_trabalhados', 'INTEGER')
+    conexao.execute(text("UPDATE pontos SET minutos_trabalhados = CAST(round(horas_trabalhadas * 60) AS INTEGER) "
+                         "WHERE horas_trabalhadas IS NOT NULL"))
+    if conexao.dialect.name == 'sqlite' and sqlite3.sqlite_version_info < (3, 35, 0):
+        logger.warning("SQLite sem DROP COLUMN (< 3.35): a coluna pontos.horas_trabalhadas fica sem uso.")
+        return
+    conexao.execute(text("ALTER TABLE pontos DROP COLUMN horas_trabalhadas"))
+
+
+def _m005_ponto_unico_por_dia(conexao):
+    """Remove registros repetidos (mesmo usuário e dia) e torna o índice (user_id, data) único."""
+    pontos = _PONTOS
+    repetidos = select(pontos.c.user_id, pontos.c.data, func.min(pontos.c.id).label('manter'))\
+        .group_by(pontos.c.user_id, pontos.c.data).having(func.count() > 1).subquery()
+    duplicados = conexao.execute(
+        select(pontos.c.id, repetidos.c.manter, pontos.c.user_id, pontos.c.data)
+        .join(repetidos, and_(repetidos.c.user_id == pontos.c.user_id, repetidos.c.data == pontos.c.data))
+        .where(pontos.c.id != repetidos.c.manter)).all()
+    if duplicados:
+        # Fica o registro mais antigo do dia (o que as telas exibiam); as atividades dos demais passam para ele
+        conexao.execute(text("UPDATE atividades SET ponto_id = :manter WHERE ponto_id = :id"),
+                        [{'id': id_ponto, 'manter': manter} for id_ponto, manter, _, _ in duplicados])
+        conexao.execute(text("DELETE FROM pontos WHERE id = :id"), [{'id': id_ponto} for id_ponto, _, _, _ in duplicados])
+        logger.warning(f"{len(duplicados)} registro(s) de ponto repetido(s) removido(s).")
+        # O dia continua com registro (users.ultimo_ponto não muda); só os resumos dos meses afetados
+        _materializar_resumos(conexao, {(user_id, data.year, data.month) for _, _, user_id, data in duplicados})
+        _recalcular_saldo_acumulado(conexao)
+
+    indices = {indice['name']: indice for indice in inspect(conexao).get_indexes('pontos')}
+    if 'ix_ponto_user_data' in indices and not indices['ix_ponto_user_data']['unique']:
+        conexao.execute(text("DROP INDEX ix_ponto_user_data"))
+    _criar_indice(conexao, 'ix_ponto_user_data', 'pontos', 'user_id, data', unico=True)
+
+
+def _m006_chaves_idempotencia(conexao):
+    """Tabela das chaves Idempotency-Key (batida de ponto com um clique)."""
+    _CHAVES_IDEMPOTENCIA_V6.create(bind=conexao, checkfirst=True)
+
+
+def _m007_quiosque(conexao):
+    """PIN do quiosque nos usuários e tabela dos terminais compartilhados."""
+    _adicionar_coluna(conexao, 'users', 'pin_quiosque_hash', 'VARCHAR(128)')
+    _TERMINAIS_QUIOSQUE_V7.create(bind=conexao, checkfirst=True)
+
+
+def _m008_resumos_de_todos_os_meses(conexao):
+    """
+    Materializa o resumo de todo (usuário, mês) com registro de ponto e refaz o banco
+    de horas. A migração 2 só somava os resumos já existentes: meses nunca abertos
+    numa tela (ou gravados direto em `pontos`) ficavam fora do saldo acumulado.
+    """
+    gravados = _materializar_resumos(conexao)
+    logger.info(f"{gravados} resumo(s) mensal(is) materializado(s).")
+    _recalcular_saldo_acumulado(conexao)
+
+
+def _m009_bloqueio_pin_quiosque(conexao):
+    """Contagem de PINs errados do quiosque no banco: por matrícula (bloqueio) e por terminal (limite)."""
+    _adicionar_coluna(conexao, 'users', 'falhas_pin_quiosque', 'INTEGER NOT NULL DEFAULT 0')
+    _adicionar_coluna(conexao, 'users', 'pin_bloqueado_ate', 'DATETIME')
+    _adicionar_coluna(conexao, 'terminais_quiosque', 'falhas_pin', 'INTEGER NOT NULL DEFAULT 0')
+    _adicionar_coluna(conexao, 'terminais_quiosque', 'falhas_desde', 'DATETIME')
+
+
+def _m010_busca_por_sobrenome(conexao):
+    """Sufixos do nome de cada usuário: busca por início de sobrenome com índice, sem LIKE '% termo%'."""
+    _SUFIXOS_NOME_USUARIO_V10.create(bind=conexao, checkfirst=True)
+    usuarios = conexao.execute(text("SELECT id, nome_normalizado FROM users")).all()
+    linhas = [{'user_id': id_usuario, 'sufixo': sufixo} for id_usuario, nome in usuarios
+              for sufixo in _sufixos_nome(nome or '')]
+    if linhas:
+        conexao.execute(insert(_SUFIXOS_NOME_USUARIO_V10), linhas)
+
+
+MIGRACOES = [
+    (1, 'Tabelas base', _m001_tabelas_base),
+    (2, 'Banco de horas acumulado', _m002_banco_de_horas),
+    (3, 'Lista de usuários paginada', _m003_lista_de_usuarios),
+    (4, 'Horários e horas trabalhadas em minutos inteiros', _m004_minutos_inteiros),
+    (5, 'Um registro de ponto por usuário e dia', _m005_ponto_unico_por_dia),
+    (6, 'Chaves de idempotência', _m006_chaves_idempotencia),
+    (7, 'Modo quiosque (PIN e terminais)', _m007_quiosque),
+    (8, 'Resumos mensais de todos os meses com registro', _m008_resumos_de_todos_os_meses),
+    (9, 'Bloqueio de PIN do quiosque no banco', _m009_bloqueio_pin_quiosque),
+    (10, 'Busca de usuários por sobrenome', _m010_busca_por_sobrenome),
+]
+VERSAO_ESQUEMA = MIGRACOES[-1][0]
+
+
+def versao_esquema():
+    """Versão aplicada no banco (0 se a tabela schema_version ainda não existe)."""
+    try:
+        return db.session.execute(text("SELECT max(versao) FROM schema_version")).scalar() or 0
+    except Exception:
+        db.session.rollback()
+        return 0
+
+
+@contextmanager
+def _trava_migracoes(app):
+    """Trava entre processos: só um worker aplica as migrações; os demais esperam."""
+    if fcntl is None:
+        yield
+        return
+    diretorio = os.path.join(app.instance_path, 'cache')
+    os.makedirs(diretorio, exist_ok=True)
+    with open(os.path.join(diretorio, 'migracoes.lock'), 'w') as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def aplicar_migracoes(app):
+    """Aplica as migrações pendentes, cada uma na própria transação. Retorna as versões aplicadas."""
+    aplicadas = []
+    with _trava_migracoes(app):
+        db.session.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "versao INTEGER PRIMARY KEY, descricao VARCHAR(200) NOT NULL, aplicada_em DATETIME NOT NULL)"))
+        db.session.commit()
+        atual = versao_esquema() # Relido com a trava: outro processo pode ter acabado de migrar
+        for versao, descricao, migracao in MIGRACOES:
+            if versao <= atual:
+                continue
+            logger.info(f"Aplicando migração {versao}: {descricao}")
+            try:
+                migracao(db.session.connection())
+                db.session.execute(text("INSERT INTO schema_version (versao, descricao, aplicada_em) "
+                                        "VALUES (:versao, :descricao, :agora)"),
+                                   {'versao': versao, 'descricao': descricao, 'agora': datetime.utcnow()})
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.error(f"Falha na migração {versao} ({descricao}).", exc_info=True)
+                raise
+            aplicadas.append(versao)
+    return aplicadas
+
+
+def verificar_esquema(app):
+    """
+    Checagem da inicialização dos workers: uma consulta à schema_version.
+    Se o banco estiver atrás do código, aplica as migrações quando AUTO_MIGRAR
+    estiver ligado (desenvolvimento, banco novo) ou levanta EsquemaDesatualizado.
+    """
+    versao = versao_esquema()
+    if versao == VERSAO_ESQUEMA:
+        return versao
+    if versao > VERSAO_ESQUEMA:
+        logger.warning(f"Banco na versão de esquema {versao}, mais nova que a do código ({VERSAO_ESQUEMA}).")
+        return versao
+    if not app.config.get('AUTO_MIGRAR'):
+        raise EsquemaDesatualizado(
+            f"Banco na versão de esquema {versao}; o código espera {VERSAO_ESQUEMA}. "
+            "Execute 'python init_db_production.py' antes de iniciar a aplicação.")
+    aplicadas = aplicar_migracoes(app)
+    if aplicadas:
+        logger.info(f"Migrações aplicadas na inicialização: {aplicadas}")
+    return VERSAO_ESQUEMA
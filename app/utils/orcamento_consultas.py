@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Orçamento de consultas SQL das telas mais acessadas.
+
+Cada view marcada com `@orcamento_consultas(n)` declara quantas consultas pode
+executar. Nos testes (app.testing) ou com QUERY_BUDGET_ENFORCE ligado, as
+consultas da view são contadas e exceder o orçamento levanta
+OrcamentoConsultasExcedido, de modo que um N+1 novo (por exemplo, acessar um
+relacionamento preguiçoso num loop do template) quebra a suíte de testes.
+Em produção o decorador não faz nada.
+"""
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from app import db
+
+logger = logging.getLogger(__name__)
+
+_CONTADORES = '_contadores_consultas'
+
+
+class OrcamentoConsultasExcedido(AssertionError):
+    """A view executou mais consultas do que o orçamento declarado."""
+
+
+def _anotar_consulta(conn, cursor, statement, parameters, context, executemany):
+    contadores = g.get(_CONTADORES) if has_app_context() else None
+    for consultas in contadores or ():
+        consultas.append(statement)
+
+
+@contextmanager
+def contar_consultas():
+    """Coleta (numa lista) as instruções SQL executadas dentro do bloco."""
+    if not event.contains(db.engine, 'before_cursor_execute', _anotar_consulta):
+        event.listen(db.engine, 'before_cursor_execute', _anotar_consulta)
+    consultas = []
+    contadores = g.setdefault(_CONTADORES, [])
+    contadores.append(consultas)
+    try:
+        yield consultas
+    finally:
+        contadores.remove(consultas)
+
+
+def orcamento_consultas(maximo, metodos=('GET',)):
+    """
+    Decorador de view: no máximo `maximo` consultas SQL por requisição (verificado nos testes).
+    Por padrão só as leituras (GET) são medidas; gravações disparam os eventos dos resumos.
+    """
+    def decorador(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if (request.method not in metodos
+                    or not current_app.config.get('QUERY_BUDGET_ENFORCE', current_app.testing)):
+                return view(*args, **kwargs)
+            with contar_consultas() as consultas:
+                resposta = view(*args, **kwargs)
+            if len(consultas) > maximo:
+                detalhes = '\n'.join(f'  {i}. {sql}' for i, sql in enumerate(consultas, 1))
+                raise OrcamentoConsultasExcedido(
+                    f"{view.__name__} executou {len(consultas)} consultas (orçamento: {maximo}):\n{detalhes}")
+            return resposta
+        return wrapper
+    return decorador
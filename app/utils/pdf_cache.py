@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Cache em disco dos PDFs gerados, endereçado pelo conteúdo do relatório.
+
+A chave é um hash SHA-256 de tudo o que aparece no PDF (usuário, mês, registros
+de ponto e atividades, feriados, estatísticas e, no relatório completo, a
+autoavaliação com o seu `updated_at`). Se nada mudou, o download seguinte é
+servido do disco sem rodar o xhtml2pdf. O diretório é limitado em bytes e os
+arquivos menos usados recentemente (mtime atualizado a cada acerto) são removidos.
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+PDF_TEMPLATE = 'exports/relatorio_ponto_pdf.html'
+# Incrementar ao mudar os estilos de create_pdf (não fazem parte do template)
+VERSAO_LAYOUT = 1
+
+_CAMPOS_USUARIO = ('id', 'name', 'email', 'matricula', 'cargo', 'uf', 'telefone', 'vinculo', 'unidade_setor', 'chefia_imediata')
+_CAMPOS_REGISTRO = ('id', 'data', 'entrada', 'saida_almoco', 'retorno_almoco', 'saida', 'horas_trabalhadas',
+                    'afastamento', 'tipo_afastamento', 'observacoes', 'resultados_produtos')
+_CAMPOS_ESTATISTICAS = ('dias_uteis', 'dias_trabalhados', 'dias_afastamento', 'horas_trabalhadas',
+                        'carga_horaria_devida', 'saldo_horas')
+_CAMPOS_AUTOAVALIACAO = ('autoavaliacao_data', 'dificuldades_data', 'sugestoes_data', 'declaracao_marcada',
+                         'data_geracao', 'titulo')
+
+
+class PdfCache:
+    """Diretório de PDFs com remoção LRU limitada por tamanho e contadores de acertos/faltas."""
+
+    def __init__(self, diretorio, max_bytes):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def caminho(self, chave):
+        return os.path.join(self.diretorio, f'{chave}.pdf')
+
+    def obter(self, chave):
+        """Retorna o caminho do PDF em cache (marcando-o como usado) ou None."""
+        caminho = self.caminho(chave)
+        try:
+            os.utime(caminho) # Atualiza o mtime: ordem LRU
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return caminho
+
+    def gravar(self, chave, conteudo):
+        """Grava o PDF de forma atômica e aplica o limite de tamanho do diretório."""
+        caminho = self.caminho(chave)
+        fd, caminho_tmp = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(caminho_tmp, caminho)
+        self._remover_excedentes(preservar=caminho)
+        return caminho
+
+    def _remover_excedentes(self, preservar=None):
+        arquivos = []
+        total = 0
+        with os.scandir(self.diretorio) as entradas:
+            for entrada in entradas:
+                if not entrada.name.endswith('.pdf'):
+                    continue
+                try:
+                    info = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                arquivos.append((info.st_mtime_ns, entrada.path, info.st_size))
+                total += info.st_size
+        if total <= self.max_bytes:
+            return
+        for _, caminho, tamanho in sorted(arquivos):
+            if total <= self.max_bytes:
+                break
+            if caminho == preservar:
+                continue
+            try:
+                os.remove(caminho)
+                total -= tamanho
+                with self._lock:
+                    self.evictions += 1
+            except FileNotFoundError:
+                pass
+
+    def estatisticas(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'diretorio': self.diretorio, 'max_bytes': self.max_bytes}
+
+
+def pdf_cache():
+    """Retorna o cache de PDFs da aplicação atual (criado na primeira chamada)."""
+    cache = current_app.extensions.get('pdf_cache')
+    if cache is None:
+        diretorio = current_app.config.get('PDF_CACHE_DIR') or os.path.join(current_app.instance_path, 'cache', 'pdf')
+        max_bytes = int(current_app.config.get('PDF_CACHE_MAX_BYTES') or 100 * 1024 * 1024)
+        cache = PdfCache(diretorio, max_bytes)
+        current_app.extensions['pdf_cache'] = cache
+    return cache
+
+
+def chave_pdf(context, completo=False):
+    """Calcula o hash das entradas do relatório que determinam o conteúdo do PDF."""
+    usuario = context['usuario']
+    try:
+        mtime_template = os.path.getmtime(os.path.join(current_app.root_path, 'templates', PDF_TEMPLATE))
+    except OSError:
+        mtime_template = None
+    partes = {
+        'layout': [VERSAO_LAYOUT, mtime_template],
+        'usuario': [getattr(usuario, campo, None) for campo in _CAMPOS_USUARIO],
+        'periodo': [context['mes_atual'], context['ano_atual']],
+        'registros': [[getattr(r, campo) for campo in _CAMPOS_REGISTRO] for r in context['registros']],
+        'atividades': sorted(context['atividades_por_ponto'].items()),
+        'feriados': sorted(context['feriados_dict'].items()),
+        'estatisticas': [context[campo] for campo in _CAMPOS_ESTATISTICAS],
+        'autoavaliacao': [context.get(campo) for campo in _CAMPOS_AUTOAVALIACAO] if completo else None,
+    }
+    serializado = json.dumps(partes, default=str, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serializado.encode('utf-8')).hexdigest()
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Modo quiosque: terminal compartilhado onde cada servidor bate o ponto com a
+matrícula e um PIN curto, sem login, sessão própria nem carregar o dashboard.
+
+- O terminal se autentica como dispositivo: a sessão do navegador guarda o id e o
+  token do terminal, conferidos contra um mapa em memória dos terminais ativos
+  (carimbo 'terminais_quiosque').
+- Cada worker mantém um mapa matrícula -> (id, nome, hash do PIN) dos usuários
+  ativos com PIN cadastrado. O PIN fica em users.pin_quiosque_hash, então o mapa
+  é recarregado pelo mesmo carimbo 'usuarios' do diretório de usuários
+  (app/utils/diretorio_usuarios.py).
+- O hash do PIN é PBKDF2-SHA256 com sal e poucas iterações (cerca de 1 ms),
+  e não o hash da senha (dezenas de ms): a fila do terminal não espera.
+- Como o espaço de PINs é pequeno, os erros ficam no banco e valem para todos
+  os workers: a matrícula é bloqueada por BLOQUEIO_SEGUNDOS após FALHAS_MAXIMAS
+  PINs errados seguidos (users.pin_bloqueado_ate, que entra no mapa em memória)
+  e o terminal recusa tentativas após FALHAS_MAXIMAS_TERMINAL erros em
+  JANELA_TERMINAL_SEGUNDOS. Matrícula desconhecida também calcula um hash, para
+  que o tempo de resposta não revele quem tem PIN cadastrado.
+"""
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app, session
+from sqlalchemy import select, update, case, or_
+from app import db
+from app.models.user import User
+from app.models.terminal_quiosque import TerminalQuiosque
+from app.utils.cache_versao import versao_atual, incrementar_versao
+from app.utils.diretorio_usuarios import NOME_VERSAO_USUARIOS
+
+logger = logging.getLogger(__name__)
+
+NOME_VERSAO_TERMINAIS = 'terminais_quiosque'
+CHAVE_SESSAO = 'terminal_quiosque'
+ITERACOES_PIN = 2000
+FALHAS_MAXIMAS = 5
+BLOQUEIO_SEGUNDOS = 300
+FALHAS_MAXIMAS_TERMINAL = 20
+JANELA_TERMINAL_SEGUNDOS = 600
+INTERVALO_MINIMO_BATIDAS = 2 # Minutos entre duas batidas do mesmo servidor no quiosque
+_lock = threading.Lock()
+
+CredencialQuiosque = namedtuple('CredencialQuiosque', 'user_id name pin_hash bloqueado_ate')
+
+
+class MatriculaBloqueada(ValueError):
+    """Muitas tentativas de PIN erradas para a matrícula; aguarde o desbloqueio."""
+
+
+class TerminalBloqueado(ValueError):
+    """Muitas tentativas de PIN erradas no terminal; aguarde o fim da janela."""
+
+
+# --- Hash do PIN ---
+def gerar_hash_pin(pin):
+    """Hash 'pbkdf2:sha256:<iterações>$<sal>$<hash>' do PIN."""
+    sal = secrets.token_hex(8)
+    resumo = hashlib.pbkdf2_hmac('sha256', pin.encode(), sal.encode(), ITERACOES_PIN).hex()
+    return f'pbkdf2:sha256:{ITERACOES_PIN}${sal}${resumo}'
+
+
+def verificar_hash_pin(pin_hash, pin):
+    """Confere o PIN com o hash gerado por `gerar_hash_pin` (comparação em tempo constante)."""
+    try:
+        metodo, sal, resumo = pin_hash.split('$')
+        iteracoes = int(metodo.rsplit(':', 1)[1])
+    except (AttributeError, ValueError, IndexError):
+        return False
+    calculado = hashlib.pbkdf2_hmac('sha256', pin.encode(), sal.encode(), iteracoes).hex()
+    return hmac.compare_digest(calculado, resumo)
+
+
+# Conferido quando a matrícula não tem PIN: a resposta leva o mesmo tempo de um PIN errado
+_HASH_FICTICIO = gerar_hash_pin(secrets.token_hex(8))
+
+
+def _hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _estado():
+    return current_app.extensions.setdefault('quiosque', {'credenciais': None, 'terminais': None})
+
+
+def _carregar(nome, versao, consulta):
+    """Mapa em memória do worker, recarregado quando a versão publicada muda."""
+    estado = _estado()
+    atual = estado[nome]
+    if atual is not None and atual[0] == versao:
+        return atual[1]
+    with _lock:
+        atual = estado[nome]
+        if atual is None or atual[0] != versao:
+            atual = (versao, consulta())
+            estado[nome] = atual
+            logger.info(f"Quiosque: {nome} carregados ({len(atual[1])}).")
+    return atual[1]
+
+
+# --- Terminais ---
+def _terminais_ativos():
+    def consulta():
+        linhas = db.session.execute(select(TerminalQuiosque.id, TerminalQuiosque.nome, TerminalQuiosque.token_hash)
+                                    .where(TerminalQuiosque.ativo == True)).all()
+        return {id_terminal: (nome, token_hash) for id_terminal, nome, token_hash in linhas}
+    return _carregar('terminais', versao_atual(NOME_VERSAO_TERMINAIS), consulta)
+
+
+def ativar_terminal(nome, criado_por):
+    """Cadastra o terminal e guarda as credenciais dele na sessão atual. Faz commit."""
+    token = secrets.token_urlsafe(32)
+    terminal = TerminalQuiosque(nome=nome, token_hash=_hash_token(token), criado_por=criado_por)
+    db.session.add(terminal)
+    db.session.commit()
+    incrementar_versao(NOME_VERSAO_TERMINAIS)
+    session[CHAVE_SESSAO] = [terminal.id, token]
+    session.permanent = True
+    logger.info(f"Terminal de quiosque {terminal.id} ('{nome}') ativado pelo usuário {criado_por}.")
+    return terminal
+
+
+def revogar_terminal(terminal):
+    """Desativa o terminal (a sessão dele deixa de valer em todos os workers). Faz commit."""
+    terminal.ativo = False
+    db.session.commit()
+    incrementar_versao(NOME_VERSAO_TERMINAIS)
+    logger.info(f"Terminal de quiosque {terminal.id} revogado.")
+
+
+def terminal_da_sessao():
+    """(id, nome) do terminal autenticado nesta sessão, ou None."""
+    credencial = session.get(CHAVE_SESSAO)
+    if not credencial or len(credencial) != 2:
+        return None
+    id_terminal, token = credencial
+    terminal = _terminais_ativos().get(id_terminal)
+    if terminal is None or not hmac.compare_digest(terminal[1], _hash_token(token)):
+        return None
+    return id_terminal, terminal[0]
+
+
+# --- Servidores (matrícula + PIN) ---
+def _credenciais():
+    def consulta():
+        linhas = db.session.execute(select(User.matricula, User.id, User.name, User.pin_quiosque_hash,
+                                           User.pin_bloqueado_ate)
+                                    .where(User.is_active_db == True, User.pin_quiosque_hash.isnot(None))).all()
+        return {matricula.strip(): CredencialQuiosque(*resto) for matricula, *resto in linhas}
+    return _carregar('credenciais', versao_atual(NOME_VERSAO_USUARIOS), consulta)
+
+
+def _conferir_terminal(terminal_id, agora):
+    """Levanta TerminalBloqueado se o terminal já errou FALHAS_MAXIMAS_TERMINAL PINs na janela atual."""
+    falhas, desde = db.session.execute(select(TerminalQuiosque.falhas_pin, TerminalQuiosque.falhas_desde)
+                                       .where(TerminalQuiosque.id == terminal_id)).one()
+    if falhas >= FALHAS_MAXIMAS_TERMINAL and desde and desde > agora - timedelta(seconds=JANELA_TERMINAL_SEGUNDOS):
+        raise TerminalBloqueado('Muitas tentativas erradas neste terminal. Aguarde alguns minutos e tente novamente.')
+
+
+def _registrar_falha(terminal_id, credencial, agora):
+    """Conta o erro no terminal e, se a matrícula existe, na matrícula (bloqueando-a no limite). Faz commit."""
+    terminais = TerminalQuiosque.__table__
+    nova_janela = or_(terminais.c.falhas_desde.is_(None),
+                      terminais.c.falhas_desde <= agora - timedelta(seconds=JANELA_TERMINAL_SEGUNDOS))
+    db.session.execute(update(terminais).where(terminais.c.id == terminal_id).values(
+        falhas_pin=case((nova_janela, 1), else_=terminais.c.falhas_pin + 1),
+        falhas_desde=case((nova_janela, agora), else_=terminais.c.falhas_desde)))
+    bloqueada = False
+    if credencial is not None:
+        usuarios = User.__table__
+        do_usuario = usuarios.c.id == credencial.user_id
+        db.session.execute(update(usuarios).where(do_usuario)
+                           .values(falhas_pin_quiosque=usuarios.c.falhas_pin_quiosque + 1))
+        bloqueada = db.session.execute(
+            update(usuarios).where(do_usuario, usuarios.c.falhas_pin_quiosque >= FALHAS_MAXIMAS)
+            .values(falhas_pin_quiosque=0, pin_bloqueado_ate=agora + timedelta(seconds=BLOQUEIO_SEGUNDOS))
+        ).rowcount > 0
+    db.session.commit()
+    if bloqueada:
+        # Só depois do commit: os workers recarregam o mapa de credenciais já com o bloqueio
+        incrementar_versao(NOME_VERSAO_USUARIOS)
+        logger.warning(f"Quiosque: matrícula do user {credencial.user_id} bloqueada após {FALHAS_MAXIMAS} PINs errados.")
+
+
+def autenticar_pin(matricula, pin, terminal_id):
+    """
+    Credencial do servidor se a matrícula e o PIN conferem; None caso contrário
+    (o erro é registrado no banco, com commit; o acerto zera os erros, também com commit). Levanta TerminalBloqueado ou
+    MatriculaBloqueada quando os limites de tentativas erradas foram atingidos.
+    """
+    agora = datetime.utcnow()
+    _conferir_terminal(terminal_id, agora)
+    credencial = _credenciais().get((matricula or '').strip())
+    if credencial is not None and credencial.bloqueado_ate and credencial.bloqueado_ate > agora:
+        raise MatriculaBloqueada('Muitas tentativas erradas. Aguarde alguns minutos e tente novamente.')
+
+    pin_confere = verificar_hash_pin(credencial.pin_hash if credencial else _HASH_FICTICIO, pin or '')
+    if credencial is None or not pin_confere:
+        _registrar_falha(terminal_id, credencial, agora)
+        return None
+    # Acerto zera a sequência de erros (só grava se havia erros). Commit próprio: vale
+    # mesmo que a batida seguinte seja recusada e desfeita
+    usuarios = User.__table__
+    if db.session.execute(update(usuarios).where(usuarios.c.id == credencial.user_id,
+                                                 usuarios.c.falhas_pin_quiosque > 0)
+                          .values(falhas_pin_quiosque=0)).rowcount:
+        db.session.commit()
+    return credencial
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Recálculo em lote de `pontos.minutos_trabalhados` (mudança na regra do almoço,
+correção de importações).
+
+Em vez de chamar `calcular_minutos` linha a linha, os quatro horários de cada
+bloco de registros (já gravados em minutos desde a meia-noite) viram vetores
+NumPy e as regras são aplicadas de uma vez:
+
+- saída antes da entrada: a saída é no dia seguinte (+24h);
+- retorno do almoço antes da saída para o almoço: retorno no dia seguinte;
+- o almoço só é descontado se estiver dentro da jornada e durar pelo menos 1h;
+- sem entrada ou sem saída: minutos indefinidos (None).
+
+Os registros com valor diferente do gravado são atualizados em UPDATEs em lote
+(executemany) e os resumos mensais dos meses afetados são recalculados.
+"""
+import logging
+from collections import namedtuple
+import numpy as np
+from sqlalchemy import select, update, bindparam, type_coerce, Integer
+from app import db
+from app.models.ponto import Ponto
+from app.models.tipos import MINUTOS_DIA, horas_de_minutos
+from app.utils.resumo_mensal import sincronizar_resumos
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_BLOCO = 20000 # Registros lidos por vez
+TAMANHO_LOTE_UPDATE = 1000 # Linhas por UPDATE executemany
+ALMOCO_MINIMO = 60 # Minutos
+_SEM_HORARIO = -1
+
+AlteracaoHoras = namedtuple('AlteracaoHoras', 'ponto_id user_id data anterior novo')
+
+
+def calcular_minutos_vetorizado(entrada, saida_almoco, retorno_almoco, saida):
+    """
+    Versão vetorizada de `calcular_minutos`. Recebe vetores de minutos desde a
+    meia-noite (-1 = sem horário) e devolve os minutos trabalhados
+    (-1 onde falta entrada ou saída).
+    """
+    entrada, saida_almoco, retorno_almoco, saida = (
+        np.asarray(v, dtype=np.int32) for v in (entrada, saida_almoco, retorno_almoco, saida))
+    incompleto = (entrada == _SEM_HORARIO) | (saida == _SEM_HORARIO)
+    saida = np.where(saida < entrada, saida + MINUTOS_DIA, saida)
+    total = saida - entrada
+
+    com_almoco = (saida_almoco != _SEM_HORARIO) & (retorno_almoco != _SEM_HORARIO)
+    retorno_almoco = np.where(retorno_almoco < saida_almoco, retorno_almoco + MINUTOS_DIA, retorno_almoco)
+    almoco = retorno_almoco - saida_almoco
+    desconta = (com_almoco & (saida_almoco >= entrada) & (retorno_almoco <= saida)
+                & (almoco >= ALMOCO_MINIMO))
+    total = np.where(desconta, total - almoco, total)
+    return np.where(incompleto, _SEM_HORARIO, total)
+
+
+def _vetor(valores):
+    """Coluna de minutos (int ou None) -> vetor NumPy com -1 no lugar de None."""
+    return np.fromiter((_SEM_HORARIO if v is None else v for v in valores), dtype=np.int32, count=len(valores))
+
+
+def _recalcular_bloco(linhas):
+    """Minutos recalculados (lista de int/None) para um bloco de linhas do SELECT."""
+    colunas = list(zip(*linhas))
+    minutos = calcular_minutos_vetorizado(*(_vetor(colunas[i]) for i in range(3, 7)))
+    return [None if m == _SEM_HORARIO else int(m) for m in minutos]
+
+
+def recalcular_horas_lote(user_id=None, data_inicio=None, data_fim=None, aplicar=True,
+                          tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Recalcula minutos_trabalhados dos registros (não afastamento) filtrados e
+    grava as diferenças quando `aplicar` for verdadeiro. Não faz commit.
+    Retorna a lista de AlteracaoHoras (registros cujo valor mudou, em horas).
+    """
+    tabela = Ponto.__table__
+    # Horários lidos como os inteiros gravados, sem conversão para datetime.time
+    horarios = [type_coerce(tabela.c[nome], Integer)
+                for nome in ('entrada', 'saida_almoco', 'retorno_almoco', 'saida')]
+    consulta = select(tabela.c.id, tabela.c.user_id, tabela.c.data, *horarios, tabela.c.minutos_trabalhados)\
+        .where(tabela.c.afastamento == False)
+    if user_id is not None:
+        consulta = consulta.where(tabela.c.user_id == user_id)
+    if data_inicio is not None:
+        consulta = consulta.where(tabela.c.data >= data_inicio)
+    if data_fim is not None:
+        consulta = consulta.where(tabela.c.data <= data_fim)
+
+    conn = db.session.connection()
+    alteracoes = []
+    ultimo_id, lidos = 0, 0
+    while True:
+        # Paginação por id (keyset): memória limitada ao tamanho do bloco
+        linhas = conn.execute(consulta.where(tabela.c.id > ultimo_id)
+                              .order_by(tabela.c.id).limit(tamanho_bloco)).all()
+        if not linhas:
+            break
+        lidos += len(linhas)
+        ultimo_id = linhas[-1][0]
+        for linha, novo in zip(linhas, _recalcular_bloco(linhas)):
+            if linha[7] != novo:
+                alteracoes.append(AlteracaoHoras(linha[0], linha[1], linha[2], linha[7], novo))
+
+    if aplicar and alteracoes:
+        instrucao = update(tabela).where(tabela.c.id == bindparam('b_id'))\
+            .values(minutos_trabalhados=bindparam('b_minutos'))
+        for inicio in range(0, len(alteracoes), TAMANHO_LOTE_UPDATE):
+            lote = alteracoes[inicio:inicio + TAMANHO_LOTE_UPDATE]
+            conn.execute(instrucao, [{'b_id': a.ponto_id, 'b_minutos': a.novo} for a in lote])
+        # UPDATE direto não passa pelos eventos da sessão: atualiza os resumos dos meses afetados
+        datas_por_usuario = {}
+        for alteracao in alteracoes:
+            datas_por_usuario.setdefault(alteracao.user_id, set()).add(alteracao.data)
+        for uid, datas in datas_por_usuario.items():
+            sincronizar_resumos(uid, datas)
+
+    logger.info(f"Recálculo de horas: {lidos} registro(s) lido(s), {len(alteracoes)} alterado(s)"
+                f"{'' if aplicar else ' (simulação)'}.")
+    return [a._replace(anterior=horas_de_minutos(a.anterior), novo=horas_de_minutos(a.novo)) for a in alteracoes]
@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+"""
+Manutenção da tabela materializada `resumos_mensais`.
+
+Toda gravação de Ponto (inclusão, edição ou exclusão) ou de Feriado passa pela
+sessão do SQLAlchemy; os eventos abaixo anotam quais meses foram afetados antes
+do flush e recalculam apenas esses resumos logo após o flush, na mesma transação.
+Assim as telas de leitura (dashboard, calendário, relatórios) leem uma única
+linha em vez de percorrer o mês inteiro.
+
+Cada resumo também guarda `saldo_acumulado`, a soma dos saldos do usuário até
+aquele mês (banco de horas). Quando o saldo de um mês muda, a diferença é
+somada aos meses seguintes em um único UPDATE; o saldo de qualquer período sai
+da diferença entre duas somas acumuladas.
+
+A coluna `versao` é incrementada em todo recálculo (inclusive quando só uma
+atividade ou a autoavaliação do mês mudou) e valida os caches das telas do mês
+(app/utils/cache_paginas.py).
+
+Os mesmos eventos mantêm `users.ultimo_ponto` (data do registro mais recente),
+exibida na lista de usuários do admin sem subconsultas por linha.
+"""
+import logging
+from datetime import date, datetime
+from calendar import monthrange
+from itertools import chain
+from sqlalchemy import event, inspect, select, update, insert, and_, or_, bindparam, func
+from app import db
+from app.models.user import User
+from app.models.ponto import Ponto, Atividade
+from app.models.relatorio_completo import RelatorioMensalCompleto
+from app.models.feriado import Feriado
+from app.models.resumo_mensal import ResumoMensal
+from app.utils.feriados_cache import calendario_feriados
+
+logger = logging.getLogger(__name__)
+
+# Chaves usadas em session.info para acumular o que precisa ser recalculado
+_MESES_PENDENTES = 'resumo_mensal_pendentes'
+_MESES_FERIADO = 'resumo_mensal_feriados'
+_USUARIOS_EXCLUIDOS = 'resumo_mensal_usuarios_excluidos'
+
+JORNADA_DIARIA = 8.0
+
+
+def calcular_estatisticas_mes(ano, mes, registros, feriados_datas, ate=None):
+    """
+    Calcula as estatísticas do mês a partir de tuplas (data, afastamento, minutos_trabalhados).
+    Regras idênticas às do relatório mensal: só contam dias úteis (seg-sex, sem feriado).
+    Os minutos são somados como inteiros e convertidos em horas só no fim.
+    Com `ate` (mês em aberto), os dias posteriores não contam e o próprio dia `ate`
+    só conta se já tiver horas fechadas ou afastamento.
+    """
+    ultimo_dia = monthrange(ano, mes)[1]
+    registros_por_data = {r[0]: r for r in registros}
+
+    dias_uteis_potenciais = 0
+    dias_afastamento = 0
+    dias_trabalhados = 0
+    minutos_trabalhados = 0
+
+    for dia_num in range(1, ultimo_dia + 1):
+        data_atual = date(ano, mes, dia_num)
+        if ate is not None and data_atual > ate:
+            break
+        # Considera dia útil se não for fim de semana E não for feriado
+        if data_atual.weekday() < 5 and data_atual not in feriados_datas:
+            registro_dia = registros_por_data.get(data_atual)
+            if data_atual == ate and (registro_dia is None or (not registro_dia[1] and registro_dia[2] is None)):
+                continue # Dia corrente ainda em andamento
+            dias_uteis_potenciais += 1
+            if registro_dia is None:
+                continue
+            _, afastamento, minutos = registro_dia
+            if afastamento:
+                dias_afastamento += 1
+            elif minutos is not None:
+                dias_trabalhados += 1
+                minutos_trabalhados += minutos
+
+    horas_trabalhadas = minutos_trabalhados / 60
+
+    # Carga horária devida = (Dias úteis potenciais - dias de afastamento nesses dias úteis) * 8h
+    carga_horaria_devida = (dias_uteis_potenciais - dias_afastamento) * JORNADA_DIARIA
+    return {
+        'dias_uteis': dias_uteis_potenciais,
+        'dias_trabalhados': dias_trabalhados,
+        'dias_afastamento': dias_afastamento,
+        'horas_trabalhadas': horas_trabalhadas,
+        'carga_horaria_devida': carga_horaria_devida,
+        'saldo_horas': horas_trabalhadas - carga_horaria_devida,
+    }
+
+
+def _limites_mes(ano, mes):
+    return date(ano, mes, 1), date(ano, mes, monthrange(ano, mes)[1])
+
+
+def _feriados_do_mes(conn, ano, mes):
+    # Consulta direta: dentro do flush o calendário em memória pode não refletir
+    # feriados ainda não commitados.
+    primeiro_dia, ultimo_dia = _limites_mes(ano, mes)
+    resultado = conn.execute(
+        select(Feriado.data).where(Feriado.data >= primeiro_dia, Feriado.data <= ultimo_dia)
+    )
+    return {row[0] for row in resultado}
+
+
+def _calcular_resumo(conn, user_id, ano, mes, feriados_datas=None):
+    """Calcula as estatísticas de um usuário/mês lendo apenas as colunas necessárias de `pontos`."""
+    primeiro_dia, ultimo_dia = _limites_mes(ano, mes)
+    if feriados_datas is None:
+        feriados_datas = _feriados_do_mes(conn, ano, mes)
+    registros = conn.execute(
+        select(Ponto.data, Ponto.afastamento, Ponto.minutos_trabalhados).where(
+            Ponto.user_id == user_id, Ponto.data >= primeiro_dia, Ponto.data <= ultimo_dia
+        )
+    ).all()
+    return calcular_estatisticas_mes(ano, mes, registros, feriados_datas)
+
+
+def _contribuicao_banco(dias_trabalhados, dias_afastamento, saldo_horas):
+    """Saldo que o mês soma ao banco de horas (meses sem registro em dia útil não contam)."""
+    return saldo_horas if (dias_trabalhados or dias_afastamento) else 0.0
+
+
+def _antes_de(tabela, ano, mes):
+    return or_(tabela.c.ano < ano, and_(tabela.c.ano == ano, tabela.c.mes < mes))
+
+
+def _depois_de(tabela, ano, mes):
+    return or_(tabela.c.ano > ano, and_(tabela.c.ano == ano, tabela.c.mes > mes))
+
+
+def _gravar_resumo(conn, user_id, ano, mes, feriados_datas=None):
+    """
+    Recalcula e grava (update ou insert) o resumo de um usuário/mês na conexão
+    informada, propagando a variação do saldo para o acumulado dos meses seguintes.
+    """
+    valores = _calcular_resumo(conn, user_id, ano, mes, feriados_datas)
+    valores['atualizado_em'] = datetime.utcnow()
+    contribuicao = _contribuicao_banco(valores['dias_trabalhados'], valores['dias_afastamento'], valores['saldo_horas'])
+
+    tabela = ResumoMensal.__table__
+    do_usuario = tabela.c.user_id == user_id
+    anterior = conn.execute(
+        select(tabela.c.dias_trabalhados, tabela.c.dias_afastamento, tabela.c.saldo_horas, tabela.c.saldo_acumulado)
+        .where(do_usuario, tabela.c.ano == ano, tabela.c.mes == mes)
+    ).first()
+    if anterior is not None:
+        variacao = contribuicao - _contribuicao_banco(*anterior[:3])
+        conn.execute(
+            update(tabela)
+            .where(do_usuario, tabela.c.ano == ano, tabela.c.mes == mes)
+            .values(saldo_acumulado=anterior[3] + variacao, versao=tabela.c.versao + 1, **valores)
+        )
+    else:
+        # Primeiro resumo do mês: parte do acumulado do último mês anterior já materializado
+        base = conn.execute(
+            select(tabela.c.saldo_acumulado).where(do_usuario, _antes_de(tabela, ano, mes))
+            .order_by(tabela.c.ano.desc(), tabela.c.mes.desc()).limit(1)
+        ).scalar()
+        variacao = contribuicao
+        conn.execute(insert(tabela).values(user_id=user_id, ano=ano, mes=mes, versao=1,
+                                           saldo_acumulado=(base or 0.0) + contribuicao, **valores))
+    if variacao:
+        conn.execute(
+            update(tabela).where(do_usuario, _depois_de(tabela, ano, mes))
+            .values(saldo_acumulado=tabela.c.saldo_acumulado + variacao, versao=tabela.c.versao + 1,
+                    atualizado_em=valores['atualizado_em'])
+        )
+    return valores
+
+
+def _atualizar_ultimo_ponto(conn, user_id):
+    """Atualiza users.ultimo_ponto com a data do registro mais recente (usa ix_ponto_user_data)."""
+    tabela = User.__table__
+    ultima_data = select(func.max(Ponto.data)).where(Ponto.user_id == user_id).scalar_subquery()
+    conn.execute(update(tabela).where(tabela.c.id == user_id).values(ultimo_ponto=ultima_data))
+
+
+def _meses_ponto(obj):
+    """Retorna as chaves (user_id, ano, mes) atuais e anteriores (se editadas) de um Ponto."""
+    estado = inspect(obj)
+    user_ids = {obj.user_id}
+    user_ids.update(estado.attrs.user_id.history.deleted or ())
+    datas = {obj.data}
+    datas.update(estado.attrs.data.history.deleted or ())
+    return {(uid, d.year, d.month) for uid in user_ids for d in datas if uid is not None and d is not None}
+
+
+def _meses_atividade(session, obj):
+    """Retorna o (user_id, ano, mes) do registro de ponto da atividade (para invalidar as telas do mês)."""
+    with session.no_autoflush:
+        ponto = obj.ponto or (session.get(Ponto, obj.ponto_id) if obj.ponto_id else None)
+    if ponto is None or ponto.user_id is None or ponto.data is None:
+        return set()
+    return {(ponto.user_id, ponto.data.year, ponto.data.month)}
+
+
+def _meses_feriado(obj):
+    """Retorna os pares (ano, mes) atuais e anteriores (se editados) de um Feriado."""
+    datas = {obj.data}
+    datas.update(inspect(obj).attrs.data.history.deleted or ())
+    return {(d.year, d.month) for d in datas if d is not None}
+
+
+@event.listens_for(Ponto.data, 'set', active_history=True)
+@event.listens_for(Ponto.user_id, 'set', active_history=True)
+@event.listens_for(Feriado.data, 'set', active_history=True)
+def _carregar_valor_anterior(target, value, oldvalue, initiator):
+    """Força o carregamento do valor anterior para que o mês antigo também seja recalculado."""
+
+
+@event.listens_for(db.session, 'before_flush')
+def _anotar_meses_afetados(session, flush_context, instances):
+    """Anota os meses cujos resumos precisam ser recalculados após o flush."""
+    pendentes = session.info.setdefault(_MESES_PENDENTES, set())
+    meses_feriado = session.info.setdefault(_MESES_FERIADO, set())
+    excluidos = session.info.setdefault(_USUARIOS_EXCLUIDOS, set())
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Ponto):
+            pendentes.update(_meses_ponto(obj))
+        elif isinstance(obj, Atividade):
+            pendentes.update(_meses_atividade(session, obj))
+        elif isinstance(obj, RelatorioMensalCompleto) and obj.user_id and obj.ano and obj.mes:
+            pendentes.add((obj.user_id, obj.ano, obj.mes))
+        elif isinstance(obj, Feriado):
+            meses_feriado.update(_meses_feriado(obj))
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            excluidos.add(obj.id)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _atualizar_resumos(session, flush_context):
+    """Recalcula, na mesma transação, os resumos dos meses anotados no before_flush."""
+    pendentes = session.info.pop(_MESES_PENDENTES, set())
+    meses_feriado = session.info.pop(_MESES_FERIADO, set())
+    excluidos = session.info.pop(_USUARIOS_EXCLUIDOS, set())
+    if not pendentes and not meses_feriado:
+        return
+
+    conn = session.connection()
+    usuarios_registros = {user_id for user_id, _, _ in pendentes} - excluidos
+    if meses_feriado:
+        # Feriado alterado: todos os resumos já materializados daquele mês mudam
+        tabela = ResumoMensal.__table__
+        filtro = or_(*[and_(tabela.c.ano == a, tabela.c.mes == m) for a, m in meses_feriado])
+        for user_id, ano, mes in conn.execute(select(tabela.c.user_id, tabela.c.ano, tabela.c.mes).where(filtro)):
+            pendentes.add((user_id, ano, mes))
+
+    feriados_cache = {}
+    for user_id, ano, mes in sorted(pendentes):
+        if user_id in excluidos:
+            continue
+        if (ano, mes) not in feriados_cache:
+            feriados_cache[(ano, mes)] = _feriados_do_mes(conn, ano, mes)
+        _gravar_resumo(conn, user_id, ano, mes, feriados_cache[(ano, mes)])
+    for user_id in usuarios_registros:
+        _atualizar_ultimo_ponto(conn, user_id)
+    logger.debug(f"Resumos mensais recalculados: {len(pendentes)}")
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _descartar_anotacoes(session, previous_transaction):
+    """Descarta anotações de um flush que falhou (a transação foi desfeita)."""
+    for chave in (_MESES_PENDENTES, _MESES_FERIADO, _USUARIOS_EXCLUIDOS):
+        session.info.pop(chave, None)
+
+
+def sincronizar_resumos(user_id, datas):
+    """
+    Recalcula os resumos dos meses que contêm as datas informadas.
+    Deve ser chamada por gravações em lote (insert/update/delete direto em `pontos`)
+    que não passam pelos eventos de flush da sessão.
+    """
+    conn = db.session.connection()
+    calendario = calendario_feriados()
+    for ano, mes in sorted({(d.year, d.month) for d in datas}):
+        _gravar_resumo(conn, user_id, ano, mes, set(calendario.feriados_do_mes(ano, mes)))
+    _atualizar_ultimo_ponto(conn, user_id)
+
+
+def incrementar_versao_resumo(user_id, data):
+    """
+    Só invalida o cache das telas do mês (nova versão do resumo), sem recalcular:
+    para gravações diretas que não mudam os totais (ex.: um horário num dia ainda incompleto).
+    """
+    tabela = ResumoMensal.__table__
+    db.session.execute(update(tabela).where(tabela.c.user_id == user_id, tabela.c.ano == data.year,
+                                            tabela.c.mes == data.month).values(versao=tabela.c.versao + 1))
+
+
+def obter_resumo_mensal(user_id, mes, ano):
+    """
+    Retorna o ResumoMensal do usuário/mês, materializando-o na primeira leitura.
+    A gravação usa uma conexão e uma transação próprias: a sessão da requisição
+    (em geral uma tela de leitura) nunca é commitada por aqui.
+    """
+    resumo = ResumoMensal.query.filter_by(user_id=user_id, ano=ano, mes=mes).first()
+    if resumo is not None:
+        return resumo
+    feriados_datas = set(calendario_feriados().feriados_do_mes(ano, mes))
+    try:
+        with db.engine.begin() as conn:
+            _gravar_resumo(conn, user_id, ano, mes, feriados_datas)
+        resumo = ResumoMensal.query.filter_by(user_id=user_id, ano=ano, mes=mes).first()
+    except Exception as e:
+        # Ex.: outra requisição materializou o mesmo mês ao mesmo tempo, ou o banco está ocupado
+        logger.warning(f"Resumo mensal de user {user_id}, {mes}/{ano} não materializado: {e}")
+    if resumo is None:
+        # Devolve um resumo calculado (não persistido)
+        valores = _calcular_resumo(db.session.connection(), user_id, ano, mes, feriados_datas)
+        resumo = ResumoMensal(user_id=user_id, ano=ano, mes=mes, **valores)
+    return resumo
+
+
+def recalcular_banco_horas(user_id=None):
+    """
+    Refaz as somas acumuladas do banco de horas a partir dos saldos mensais já
+    materializados (carga inicial da coluna ou correção). Não faz commit.
+    """
+    tabela = ResumoMensal.__table__
+    consulta = select(tabela.c.id, tabela.c.user_id, tabela.c.dias_trabalhados,
+                      tabela.c.dias_afastamento, tabela.c.saldo_horas)
+    if user_id is not None:
+        consulta = consulta.where(tabela.c.user_id == user_id)
+    conn = db.session.connection()
+    atualizacoes = []
+    usuario_atual, acumulado = None, 0.0
+    for id_resumo, uid, dias_trabalhados, dias_afastamento, saldo in conn.execute(
+            consulta.order_by(tabela.c.user_id, tabela.c.ano, tabela.c.mes)):
+        if uid != usuario_atual:
+            usuario_atual, acumulado = uid, 0.0
+        acumulado += _contribuicao_banco(dias_trabalhados, dias_afastamento, saldo)
+        atualizacoes.append({'b_id': id_resumo, 'b_acumulado': acumulado})
+    if atualizacoes:
+        conn.execute(update(tabela).where(tabela.c.id == bindparam('b_id'))
+                     .values(saldo_acumulado=bindparam('b_acumulado')), atualizacoes)
+    logger.info(f"Banco de horas recalculado: {len(atualizacoes)} resumo(s).")
+    return len(atualizacoes)
+
+
+def saldo_acumulado_ate(user_id, ano, mes):
+    """Saldo do banco de horas do usuário acumulado até o fim do mês informado."""
+    saldo = db.session.query(ResumoMensal.saldo_acumulado).filter(
+        ResumoMensal.user_id == user_id,
+        or_(ResumoMensal.ano < ano, and_(ResumoMensal.ano == ano, ResumoMensal.mes <= mes))
+    ).order_by(ResumoMensal.ano.desc(), ResumoMensal.mes.desc()).limit(1).scalar()
+    return saldo or 0.0
+
+
+def _mes_anterior(ano, mes):
+    return (ano, mes - 1) if mes > 1 else (ano - 1, 12)
+
+
+def _saldo_parcial_mes(user_id, hoje):
+    """Contribuição do mês em aberto ao banco de horas, contando só os dias úteis até hoje."""
+    primeiro_dia = date(hoje.year, hoje.month, 1)
+    registros = db.session.execute(
+        select(Ponto.data, Ponto.afastamento, Ponto.minutos_trabalhados).where(
+            Ponto.user_id == user_id, Ponto.data >= primeiro_dia, Ponto.data <= hoje
+        )
+    ).all()
+    feriados_datas = set(calendario_feriados().feriados_do_mes(hoje.year, hoje.month))
+    estatisticas = calcular_estatisticas_mes(hoje.year, hoje.month, registros, feriados_datas, ate=hoje)
+    return _contribuicao_banco(estatisticas['dias_trabalhados'], estatisticas['dias_afastamento'],
+                               estatisticas['saldo_horas'])
+
+
+def _saldo_banco_ate(user_id, ano, mes, hoje):
+    """
+    Saldo acumulado até o fim do mês, sem cobrar dias que ainda não chegaram: a partir
+    do mês corrente vale o acumulado até o mês anterior mais o parcial do mês corrente.
+    """
+    if (ano, mes) < (hoje.year, hoje.month):
+        return saldo_acumulado_ate(user_id, ano, mes)
+    return saldo_acumulado_ate(user_id, *_mes_anterior(hoje.year, hoje.month)) + _saldo_parcial_mes(user_id, hoje)
+
+
+def saldo_banco_periodo(user_id, ano_inicio, mes_inicio, ano_fim, mes_fim):
+    """Saldo do banco de horas entre dois meses (inclusive), por diferença de somas acumuladas."""
+    hoje = date.today()
+    return (_saldo_banco_ate(user_id, ano_fim, mes_fim, hoje)
+            - _saldo_banco_ate(user_id, *_mes_anterior(ano_inicio, mes_inicio), hoje))
+
+
+def banco_de_horas(user_id, mes, ano):
+    """Saldos do banco de horas até o mês informado: no ano, nos últimos 12 meses e total."""
+    hoje = date.today()
+    total = _saldo_banco_ate(user_id, ano, mes, hoje)
+    return {
+        'saldo_banco_ano': total - _saldo_banco_ate(user_id, ano - 1, 12, hoje),
+        'saldo_banco_12_meses': total - _saldo_banco_ate(user_id, ano - 1, mes, hoje),
+        'saldo_banco_total': total,
+    }
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Fila de exportações (PDF, Excel, HTML SEI e o ZIP do fechamento do mês)
+processada fora do gunicorn.
+
+As rotas apenas gravam uma linha em `tarefas_exportacao` e respondem na hora;
+o processo worker.py reserva as tarefas pendentes (UPDATE condicional, seguro
+com mais de um worker), gera os arquivos em instance/cache/exportacoes e marca
+a tarefa como concluída. A interface consulta o status e baixa o resultado.
+"""
+import os
+import time
+import shutil
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models.tarefa_exportacao import TarefaExportacao
+from app.utils.export import generate_pdf, generate_excel, generate_sei_html, generate_zip_fechamento, contexto_relatorio_completo
+
+logger = logging.getLogger(__name__)
+
+TIPOS_EXPORTACAO = ('pdf', 'excel', 'sei', 'zip')
+MIMETYPES = {
+    'pdf': 'application/pdf',
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'sei': 'text/html',
+    'zip': 'application/zip',
+}
+
+
+def diretorio_exportacoes():
+    diretorio = current_app.config.get('EXPORTACOES_DIR') or os.path.join(current_app.instance_path, 'cache', 'exportacoes')
+    os.makedirs(diretorio, exist_ok=True)
+    return diretorio
+
+
+def enfileirar_exportacao(tipo, user_id, mes, ano, solicitante_id, com_autoavaliacao=True):
+    """
+    Cria a tarefa de exportação (ou reaproveita uma idêntica ainda não finalizada).
+    No tipo 'zip' (fechamento do mês, todos os usuários) `user_id` é o próprio solicitante.
+    Retorna a TarefaExportacao já gravada.
+    """
+    if tipo not in TIPOS_EXPORTACAO:
+        raise ValueError(f"Tipo de exportação inválido: {tipo}")
+    if not (1 <= mes <= 12):
+        raise ValueError("Mês inválido.")
+    tarefa = TarefaExportacao.query.filter(
+        TarefaExportacao.solicitante_id == solicitante_id,
+        TarefaExportacao.user_id == user_id,
+        TarefaExportacao.tipo == tipo,
+        TarefaExportacao.mes == mes,
+        TarefaExportacao.ano == ano,
+        TarefaExportacao.com_autoavaliacao == com_autoavaliacao,
+        TarefaExportacao.status.in_([TarefaExportacao.PENDENTE, TarefaExportacao.PROCESSANDO])
+    ).first()
+    if tarefa:
+        return tarefa
+    tarefa = TarefaExportacao(tipo=tipo, user_id=user_id, mes=mes, ano=ano, solicitante_id=solicitante_id,
+                              com_autoavaliacao=com_autoavaliacao)
+    db.session.add(tarefa)
+    db.session.commit()
+    logger.info(f"Exportação {tipo} enfileirada (tarefa {tarefa.id}) para user {user_id}, {mes}/{ano}.")
+    return tarefa
+
+
+def reservar_proxima_tarefa():
+    """Marca a tarefa pendente mais antiga como 'processando' e a retorna (ou None)."""
+    while True:
+        tarefa_id = db.session.query(TarefaExportacao.id).filter_by(status=TarefaExportacao.PENDENTE)\
+            .order_by(TarefaExportacao.id).limit(1).scalar()
+        if tarefa_id is None:
+            db.session.rollback() # Encerra a transação de leitura
+            return None
+        # Só um worker consegue trocar o status de 'pendente' para 'processando'
+        reservadas = TarefaExportacao.query.filter_by(id=tarefa_id, status=TarefaExportacao.PENDENTE)\
+            .update({'status': TarefaExportacao.PROCESSANDO, 'iniciada_em': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        if reservadas:
+            return db.session.get(TarefaExportacao, tarefa_id)
+
+
+def _gerar_arquivo(tarefa, destino_base):
+    """Gera o arquivo da tarefa. Retorna (caminho, nome para download)."""
+    if tarefa.tipo == 'pdf':
+        resultado = generate_pdf(tarefa.user_id, tarefa.mes, tarefa.ano,
+                                 context_completo=contexto_relatorio_completo(tarefa.user_id, tarefa.mes, tarefa.ano))
+        if not resultado:
+            raise RuntimeError("Erro ao gerar o relatório PDF.")
+        caminho_cache, filename = resultado
+        # Copia do cache de PDFs: o arquivo em cache pode ser removido pela política LRU
+        destino = f"{destino_base}.pdf"
+        shutil.copyfile(caminho_cache, destino)
+        return destino, filename
+    if tarefa.tipo == 'excel':
+        resultado = generate_excel(tarefa.user_id, tarefa.mes, tarefa.ano)
+        if not resultado:
+            raise RuntimeError("Erro ao gerar o relatório Excel.")
+        buffer, filename = resultado
+        destino = f"{destino_base}.xlsx"
+        with open(destino, 'wb') as arquivo:
+            arquivo.write(buffer.getvalue())
+        return destino, filename
+    if tarefa.tipo == 'zip':
+        destino = f"{destino_base}.zip"
+        total, _ = generate_zip_fechamento(tarefa.mes, tarefa.ano, destino, com_autoavaliacao=tarefa.com_autoavaliacao,
+                                           processos=current_app.config.get('PDF_PROCESSOS'))
+        if not total:
+            raise RuntimeError("Nenhum PDF foi gerado para o período.")
+        sufixo = '_completo' if tarefa.com_autoavaliacao else ''
+        return destino, f"fechamento{sufixo}_{tarefa.mes:02d}_{tarefa.ano}.zip"
+    html = generate_sei_html(tarefa.user_id, tarefa.mes, tarefa.ano)
+    if html is None:
+        raise RuntimeError("Relatório completo não encontrado para este período. Salve-o primeiro.")
+    destino = f"{destino_base}.html"
+    with open(destino, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(html)
+    return destino, f"relatorio_sei_{tarefa.mes}_{tarefa.ano}.html"
+
+
+def executar_tarefa(tarefa):
+    """Gera o arquivo de uma tarefa já reservada e grava o resultado (concluída ou erro)."""
+    tarefa_id = tarefa.id
+    try:
+        caminho, filename = _gerar_arquivo(tarefa, os.path.join(diretorio_exportacoes(), str(tarefa_id)))
+        tarefa = db.session.get(TarefaExportacao, tarefa_id) # Recarrega: a geração pode ter feito commit
+        tarefa.arquivo = caminho
+        tarefa.nome_arquivo = filename
+        tarefa.status = TarefaExportacao.CONCLUIDA
+        logger.info(f"Tarefa de exportação {tarefa_id} concluída: {filename}")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erro na tarefa de exportação {tarefa_id}: {e}", exc_info=True)
+        tarefa = db.session.get(TarefaExportacao, tarefa_id)
+        tarefa.status = TarefaExportacao.ERRO
+        tarefa.mensagem_erro = str(e) if isinstance(e, RuntimeError) else 'Erro inesperado ao gerar o arquivo.'
+    tarefa.concluida_em = datetime.utcnow()
+    db.session.commit()
+    return tarefa
+
+
+def processar_pendentes(limite=None):
+    """Processa as tarefas pendentes até esvaziar a fila (ou atingir o limite). Retorna quantas foram executadas."""
+    executadas = 0
+    while limite is None or executadas < limite:
+        tarefa = reservar_proxima_tarefa()
+        if tarefa is None:
+            break
+        executar_tarefa(tarefa)
+        executadas += 1
+    return executadas
+
+
+def recuperar_tarefas_interrompidas(tempo_limite=timedelta(minutes=10)):
+    """Devolve à fila as tarefas presas em 'processando' (worker reiniciado no meio da geração)."""
+    limite = datetime.utcnow() - tempo_limite
+    recuperadas = TarefaExportacao.query.filter(
+        TarefaExportacao.status == TarefaExportacao.PROCESSANDO,
+        TarefaExportacao.iniciada_em < limite
+    ).update({'status': TarefaExportacao.PENDENTE, 'iniciada_em': None}, synchronize_session=False)
+    db.session.commit()
+    if recuperadas:
+        logger.warning(f"{recuperadas} tarefa(s) de exportação interrompida(s) devolvida(s) à fila.")
+    return recuperadas
+
+
+def remover_tarefas_antigas(idade=timedelta(days=1)):
+    """Apaga as tarefas finalizadas há mais de `idade` e os seus arquivos."""
+    limite = datetime.utcnow() - idade
+    antigas = TarefaExportacao.query.filter(
+        TarefaExportacao.status.in_([TarefaExportacao.CONCLUIDA, TarefaExportacao.ERRO]),
+        TarefaExportacao.concluida_em < limite
+    ).all()
+    for tarefa in antigas:
+        if tarefa.arquivo:
+            try:
+                os.remove(tarefa.arquivo)
+            except FileNotFoundError:
+                pass
+        db.session.delete(tarefa)
+    db.session.commit()
+    return len(antigas)
+
+
+def executar_worker(intervalo=2.0):
+    """Laço principal do worker: processa a fila e dorme quando não há tarefas."""
+    recuperar_tarefas_interrompidas()
+    ultima_limpeza = 0.0
+    logger.info("Worker de exportações iniciado.")
+    while True:
+        try:
+            if time.monotonic() - ultima_limpeza > 3600:
+                remover_tarefas_antigas()
+                ultima_limpeza = time.monotonic()
+            if not processar_pendentes():
+                time.sleep(intervalo)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Erro no laço do worker de exportações: {e}", exc_info=True)
+            time.sleep(intervalo)
+        finally:
+            db.session.remove()
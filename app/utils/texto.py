@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""Normalização de textos para buscas (sem dependências da aplicação, usada também pelos modelos)."""
+import unicodedata
+
+
+def normalizar_texto(texto):
+    """Minúsculas e sem acentos (comparação de buscas)."""
+    return unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode('ascii').lower().strip()
+
+
+def sufixos_de_palavras(texto):
+    """Trechos do texto que começam em cada palavra ('ana maria' -> ['ana maria', 'maria'])."""
+    palavras = texto.split()
+    return [' '.join(palavras[i:]) for i in range(len(palavras))]
@@ -0,0 +1,67 @@
+"""
+Base comum dos testes (test_*.py): app com banco SQLite em memória, carimbos de
+versão num diretório temporário, fábrica de usuários e cliente já logado.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ['DATABASE_URL'] = 'sqlite://'  # Banco em memória para os testes
+os.environ.setdefault('AUTO_MIGRAR', '1') # Cria o esquema pelas migrações no banco novo
+
+from flask import g
+from app import create_app, db
+from app.models.user import User
+
+
+class CasoTesteApp(unittest.TestCase):
+    """
+    Cria a app e as tabelas em setUp e desfaz tudo em tearDown. Com USUARIO_PADRAO,
+    `self.user` já existe (e `self.client` está logado com ele); as subclasses
+    acrescentam seus dados chamando super().setUp() primeiro.
+    """
+    USUARIO_PADRAO = True
+    BANCO_EM_ARQUIVO = False # WAL e o pool do SQLite só se aplicam a um arquivo
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        url = f"sqlite:///{os.path.join(self.cache_dir, 'ponto.db')}" if self.BANCO_EM_ARQUIVO else 'sqlite://'
+        with mock.patch.dict(os.environ, {'DATABASE_URL': url}):
+            self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.app.config['CACHE_VERSAO_DIR'] = self.cache_dir
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        if self.USUARIO_PADRAO:
+            self.user = self.criar_usuario('Ana', matricula='123')
+            self.client = self.cliente(self.user)
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        if self.BANCO_EM_ARQUIVO:
+            db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.cache_dir)
+
+    def criar_usuario(self, name, matricula, email=None, **campos):
+        """Cria (e faz commit de) um usuário com a senha 'senha123'."""
+        usuario = User(name=name, matricula=matricula, email=email or f'{matricula.lower()}@example.com',
+                       vinculo='SENAPPEN', **campos)
+        usuario.set_password('senha123')
+        db.session.add(usuario)
+        db.session.commit()
+        return usuario
+
+    def cliente(self, usuario):
+        """Test client com a sessão de login de `usuario`."""
+        cliente = self.app.test_client()
+        with cliente.session_transaction() as sess:
+            sess['_user_id'] = str(usuario.id)
+        # O contexto da app fica ativo no teste: descarta o current_user da requisição anterior
+        g.pop('_login_user', None)
+        return cliente
@@ -0,0 +1,7 @@
+"""
+Configuração do pytest para os testes da raiz: os bancos criados nos testes
+recebem o esquema pelas migrações na inicialização da app.
+"""
+import os
+
+os.environ.setdefault('AUTO_MIGRAR', '1')
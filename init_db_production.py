@@ -11,6 +11,8 @@ from app import create_app, db
 from app.models.user import User
 from app.models.ponto import Ponto, Atividade
 from app.models.feriado import Feriado
+from app.utils.feriados_cache import invalidar_feriados
+from app.utils.migracoes import aplicar_migracoes, versao_esquema, VERSAO_ESQUEMA
 import calendar
 import logging
 
@@ -47,41 +49,6 @@ FERIADOS_2025 = [
     {'data': date(2025, 12, 25), 'descricao': 'Natal'}
 ]
 
-def ensure_column_exists(app, table_name, column_name, column_definition):
-    """Função genérica para verificar e adicionar uma coluna a uma tabela."""
-    with app.app_context():
-        try:
-            logger.info(f"  - Verificando coluna '{column_name}' na tabela '{table_name}'...")
-            with db.engine.connect() as connection:
-                result_table = connection.execute(db.text(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'"))
-                if not result_table.fetchone():
-                    logger.info(f"  - Tabela '{table_name}' não encontrada. Será criada por db.create_all().")
-                    return
-
-                result_columns = connection.execute(db.text(f"PRAGMA table_info({table_name})"))
-                columns = [column[1] for column in result_columns.fetchall()]
-
-                if column_name not in columns:
-                    logger.info(f"  - Coluna '{column_name}' não encontrada. Adicionando...")
-                    try:
-                        # Usar TEXT para strings em SQLite via ALTER TABLE
-                        # Adicionar DEFAULT '' para contornar limitação do SQLite com NOT NULL em ALTER TABLE
-                        sql_command = f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_definition}"
-                        logger.info(f"  - Executando SQL: {sql_command}")
-                        connection.execute(db.text(sql_command))
-                        # Commit pode ser necessário dependendo do modo de transação do SQLAlchemy/DBAPI
-                        connection.commit()
-                        logger.info(f"  - Coluna '{column_name}' adicionada com sucesso!")
-                    except Exception as alter_err:
-                        logger.error(f"  - ERRO ao executar ALTER TABLE para '{column_name}': {alter_err}", exc_info=True)
-                        # connection.rollback() # Rollback se o commit falhar ou se necessário
-                        raise
-                else:
-                    logger.info(f"  - Coluna '{column_name}' já existe.")
-        except Exception as e:
-            logger.error(f"  - ERRO ao verificar/adicionar coluna '{column_name}' na tabela '{table_name}': {e}", exc_info=True)
-            raise
-
 def init_production_db():
     """Inicializa o banco de dados em ambiente de produção."""
     try:
@@ -89,30 +56,17 @@ def init_production_db():
         print(f"Data e hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"); print(f"Python version: {sys.version}"); print(f"Diretório atual: {os.getcwd()}"); print("-"*80 + "\n")
         print("[1/6] Criando aplicação Flask...")
         logger.info("[1/6] Criando aplicação Flask...")
-        app = create_app()
+        app = create_app(conferir_esquema=False) # As migrações rodam no passo 2; os workers só conferem a versão
         with app.app_context():
             try:
-                print("[2/6] Garantindo que todas as tabelas existam (db.create_all)...")
-                logger.info("[2/6] Garantindo que todas as tabelas existam (db.create_all)...")
-                db.create_all()
-                print("[2/6] db.create_all() concluído.")
-                logger.info("[2/6] db.create_all() concluído.")
+                print("[2/6] Aplicando migrações pendentes do esquema...")
+                logger.info("[2/6] Aplicando migrações pendentes do esquema...")
+                aplicadas = aplicar_migracoes(app)
+                print(f"[2/6] Migrações aplicadas: {aplicadas or 'nenhuma'}.")
+                logger.info(f"[2/6] Migrações aplicadas: {aplicadas or 'nenhuma'}.")
 
-                print("[3/6] Verificando/Adicionando colunas de migração necessárias...")
-                logger.info("[3/6] Verificando/Adicionando colunas de migração necessárias...")
-                # Definições para SQLite com NOT NULL e DEFAULT
-                ensure_column_exists(app, 'users', 'is_active_db', 'BOOLEAN NOT NULL DEFAULT 1')
-                ensure_column_exists(app, 'pontos', 'afastamento', 'BOOLEAN DEFAULT 0')
-                ensure_column_exists(app, 'pontos', 'tipo_afastamento', 'VARCHAR(100)')
-                ensure_column_exists(app, 'pontos', 'observacoes', 'TEXT')
-                ensure_column_exists(app, 'pontos', 'resultados_produtos', 'TEXT')
-                ensure_column_exists(app, 'atividades', 'created_at', 'DATETIME DEFAULT CURRENT_TIMESTAMP')
-                # --- ADICIONANDO NOVAS COLUNAS ---
-                ensure_column_exists(app, 'users', 'unidade_setor', "TEXT NOT NULL DEFAULT ''")
-                ensure_column_exists(app, 'users', 'chefia_imediata', "TEXT NOT NULL DEFAULT ''")
-                # ---------------------------------
-                print("[3/6] Verificação/Adição de colunas concluída.")
-                logger.info("[3/6] Verificação/Adição de colunas concluída.")
+                print(f"[3/6] Esquema do banco na versão {versao_esquema()} (esperada: {VERSAO_ESQUEMA}).")
+                logger.info(f"[3/6] Esquema do banco na versão {versao_esquema()} (esperada: {VERSAO_ESQUEMA}).")
 
                 print("[4/6] Verificando se já existe um usuário administrador...")
                 logger.info("[4/6] Verificando se já existe um usuário administrador...")
@@ -176,6 +130,7 @@ def init_production_db():
                     print("  - Realizando commit das alterações...")
                     logger.info("  - Realizando commit das alterações...")
                     db.session.commit()
+                    invalidar_feriados() # Avisa os workers em execução sobre os novos feriados
                     print("[6/6] Banco de dados de produção inicializado com sucesso!")
                     logger.info("[6/6] Banco de dados de produção inicializado com sucesso!")
                 else:
@@ -192,6 +147,7 @@ def init_production_db():
                             feriados_adicionados += 1
                     if feriados_adicionados > 0:
                         db.session.commit()
+                        invalidar_feriados() # Avisa os workers em execução sobre os novos feriados
                         print(f"  - {feriados_adicionados} feriados adicionados.")
                         logger.info(f"  - {feriados_adicionados} feriados adicionados.")
                     else:
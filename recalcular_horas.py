@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recalcula as horas trabalhadas de todos os registros de ponto (ou de um usuário/período)
+com as regras atuais e grava apenas os valores que mudaram.
+
+Uso:
+    python recalcular_horas.py --simular                  # Só lista o que mudaria
+    python recalcular_horas.py --relatorio alteracoes.csv # Aplica e salva o relatório
+    python recalcular_horas.py --user-id 7 --inicio 2025-01-01 --fim 2025-03-31
+"""
+import argparse
+import csv
+import sys
+from datetime import date
+from dotenv import load_dotenv
+
+# Carrega variáveis de ambiente do arquivo .env
+load_dotenv()
+
+from app import create_app, db
+from app.utils.recalculo_horas import recalcular_horas_lote
+
+
+def _data(valor):
+    return date.fromisoformat(valor)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recálculo em lote das horas trabalhadas.')
+    parser.add_argument('--user-id', type=int, help='Apenas os registros deste usuário')
+    parser.add_argument('--inicio', type=_data, help='Data inicial (AAAA-MM-DD)')
+    parser.add_argument('--fim', type=_data, help='Data final (AAAA-MM-DD)')
+    parser.add_argument('--simular', action='store_true', help='Não grava nada, apenas informa as diferenças')
+    parser.add_argument('--relatorio', help='Arquivo CSV com os registros alterados')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        try:
+            alteracoes = recalcular_horas_lote(user_id=args.user_id, data_inicio=args.inicio, data_fim=args.fim,
+                                               aplicar=not args.simular)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    if args.relatorio:
+        with open(args.relatorio, 'w', newline='', encoding='utf-8') as arquivo:
+            escritor = csv.writer(arquivo, delimiter=';')
+            escritor.writerow(['ponto_id', 'user_id', 'data', 'horas_anteriores', 'horas_recalculadas'])
+            escritor.writerows(alteracoes)
+    else:
+        for alteracao in alteracoes[:50]:
+            print(f"Ponto {alteracao.ponto_id} (user {alteracao.user_id}, {alteracao.data}): "
+                  f"{alteracao.anterior} -> {alteracao.novo}")
+        if len(alteracoes) > 50:
+            print(f"... e mais {len(alteracoes) - 50} registro(s). Use --relatorio para a lista completa.")
+
+    acao = 'seriam alterados' if args.simular else 'alterados'
+    print(f"{len(alteracoes)} registro(s) {acao}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,8 @@
+import os
+
+# Servidor de desenvolvimento: aplica as migrações pendentes na inicialização
+os.environ.setdefault('AUTO_MIGRAR', '1')
+
 from app import create_app
 
 app = create_app()
@@ -0,0 +1,87 @@
+"""
+Testes da API JSON (app/controllers/api.py).
+"""
+import unittest
+from unittest import mock
+from datetime import date, time
+
+from app import db
+from app.models.ponto import Ponto, Atividade
+from base_testes import CasoTesteApp
+
+
+class TestApi(CasoTesteApp):
+    def setUp(self):
+        super().setUp()
+        self.outro = self.criar_usuario('Bruno', matricula='456')
+        for dia in range(3, 8):
+            db.session.add(Ponto(user_id=self.user.id, data=date(2025, 3, dia), entrada=time(8), saida=time(16),
+                                 horas_trabalhadas=8.0))
+        db.session.add(Ponto(user_id=self.outro.id, data=date(2025, 3, 3), horas_trabalhadas=8.0))
+        db.session.commit()
+
+    def test_listagem_paginada_com_etag(self):
+        datas, cursor = [], None
+        while True:
+            resposta = self.client.get('/api/v1/pontos', query_string={'limite': 2, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(resposta.status_code, 200)
+            corpo = resposta.get_json()
+            datas += [item['data'] for item in corpo['itens']]
+            cursor = corpo['proximo']
+            if not cursor:
+                break
+        self.assertEqual(datas, [f'2025-03-0{dia}' for dia in range(3, 8)])  # Só os registros do próprio usuário
+
+        etag = resposta.headers['ETag']
+        repetida = self.client.get('/api/v1/pontos', query_string={'limite': 2, 'cursor': resposta.request.args['cursor']},
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(repetida.status_code, 304)
+
+        self.assertEqual(self.client.get('/api/v1/pontos', query_string={'user_id': self.outro.id}).status_code, 403)
+        self.assertEqual(self.client.get('/api/v1/pontos', query_string={'cursor': '@@'}).status_code, 400)
+
+    def test_crud_e_resumo(self):
+        resposta = self.client.post('/api/v1/pontos', json={
+            'data': '2025-03-10', 'entrada': '08:00', 'saida_almoco': '12:00', 'retorno_almoco': '13:00',
+            'saida': '17:30', 'atividades': ['Análise de processos']})
+        self.assertEqual(resposta.status_code, 201)
+        criado = resposta.get_json()
+        self.assertEqual(criado['horas_trabalhadas'], 8.5)
+        self.assertEqual([a['descricao'] for a in criado['atividades']], ['Análise de processos'])
+        self.assertEqual(self.client.post('/api/v1/pontos', json={'data': '2025-03-10', 'entrada': '08:00'}).status_code, 409)
+        for atividades in ('Análise', ['Análise', 3]):  # Texto solto não vira uma atividade por caractere
+            self.assertEqual(self.client.post('/api/v1/pontos', json={
+                'data': '2025-03-11', 'entrada': '08:00', 'saida': '12:00', 'atividades': atividades}).status_code, 422)
+
+        url = resposta.headers['Location']
+        etag = self.client.get(url).headers['ETag']
+        self.assertEqual(self.client.patch(url, json={'saida': '18:00'}, headers={'If-Match': '"antigo"'}).status_code, 412)
+        resposta = self.client.patch(url, json={'afastamento': True, 'tipo_afastamento': 'Férias'}, headers={'If-Match': etag})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual((resposta.get_json()['horas_trabalhadas'], resposta.get_json()['atividades']), (None, []))
+        self.assertEqual(Atividade.query.count(), 0)
+        self.assertEqual(self.client.patch(url, json={'entrada': '25:00', 'afastamento': False}).status_code, 422)
+
+        resposta = self.client.get('/api/v1/resumos/2025/3')
+        resumo = resposta.get_json()
+        self.assertEqual((resumo['dias_trabalhados'], resumo['dias_afastamento']), (5, 1))
+        self.assertIn('saldo_banco_ano', resumo)
+        self.assertEqual(self.client.get('/api/v1/resumos/0/3').status_code, 400)
+        # A ETag sai da versão do resumo: o 304 não recalcula nada
+        etag_resumo = resposta.headers['ETag']
+        with mock.patch('app.controllers.api.obter_resumo_mensal', side_effect=AssertionError('recalculou')):
+            self.assertEqual(self.client.get('/api/v1/resumos/2025/3', headers={'If-None-Match': etag_resumo}).status_code, 304)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.get('/api/v1/resumos/2025/3', headers={'If-None-Match': etag_resumo}).status_code, 200)
+        self.assertIsNone(Ponto.query.filter_by(data=date(2025, 3, 10)).first())
+
+        ponto_outro = Ponto.query.filter_by(user_id=self.outro.id).one()
+        self.assertEqual(self.client.get(f'/api/v1/pontos/{ponto_outro.id}').status_code, 404)
+
+    def test_exige_autenticacao(self):
+        self.assertEqual(self.app.test_client().get('/api/v1/pontos').status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Testes do banco de horas acumulado (somas acumuladas em resumos_mensais).
+"""
+import unittest
+from datetime import date
+from unittest import mock
+
+from app import db
+from app.models.ponto import Ponto
+from app.models.resumo_mensal import ResumoMensal
+from app.utils.migracoes import _m008_resumos_de_todos_os_meses
+from app.utils.resumo_mensal import (banco_de_horas, saldo_banco_periodo, recalcular_banco_horas,
+                                     obter_resumo_mensal)
+from base_testes import CasoTesteApp
+
+
+class TestBancoHoras(CasoTesteApp):
+    def _saldo_mes(self, ano, mes):
+        return obter_resumo_mensal(self.user.id, mes, ano).saldo_horas
+
+    def _acumulados(self):
+        return [(r.ano, r.mes, round(r.saldo_acumulado, 6)) for r in
+                ResumoMensal.query.filter_by(user_id=self.user.id).order_by(ResumoMensal.ano, ResumoMensal.mes)]
+
+    def test_somas_acumuladas_incrementais(self):
+        # Um registro em dez/2024, mar/2025 e (fora de ordem) jan/2025
+        for data, horas in ((date(2024, 12, 2), 9.0), (date(2025, 3, 3), 10.0), (date(2025, 1, 2), 8.0)):
+            db.session.add(Ponto(user_id=self.user.id, data=data, horas_trabalhadas=horas))
+            db.session.commit()
+        dez, jan, mar = self._saldo_mes(2024, 12), self._saldo_mes(2025, 1), self._saldo_mes(2025, 3)
+
+        # Fevereiro sem registros é materializado pelo dashboard, mas não entra no banco
+        self.assertLess(self._saldo_mes(2025, 2), 0)
+        self.assertEqual(self._acumulados(), [(2024, 12, round(dez, 6)), (2025, 1, round(dez + jan, 6)),
+                                              (2025, 2, round(dez + jan, 6)), (2025, 3, round(dez + jan + mar, 6))])
+
+        banco = banco_de_horas(self.user.id, 3, 2025)
+        self.assertAlmostEqual(banco['saldo_banco_ano'], jan + mar)
+        self.assertAlmostEqual(banco['saldo_banco_12_meses'], dez + jan + mar)
+        self.assertAlmostEqual(banco['saldo_banco_total'], dez + jan + mar)
+        self.assertAlmostEqual(saldo_banco_periodo(self.user.id, 2025, 1, 2025, 2), jan)
+
+        # Edição de um mês antigo propaga a diferença para os meses seguintes
+        ponto = Ponto.query.filter_by(data=date(2024, 12, 2)).one()
+        ponto.horas_trabalhadas = 12.0
+        db.session.commit()
+        self.assertAlmostEqual(banco_de_horas(self.user.id, 3, 2025)['saldo_banco_total'], dez + 3.0 + jan + mar)
+
+        # A recarga completa chega ao mesmo resultado
+        esperado = self._acumulados()
+        db.session.query(ResumoMensal).update({'saldo_acumulado': 0.0})
+        recalcular_banco_horas()
+        db.session.commit()
+        self.assertEqual(self._acumulados(), esperado)
+
+    def test_mes_em_aberto_so_cobra_dias_ate_hoje(self):
+        # Um dia cheio no 1º dia útil do mês corrente: o resto do mês ainda não é devido
+        db.session.add(Ponto(user_id=self.user.id, data=date(2026, 10, 1), horas_trabalhadas=8.0))
+        db.session.commit()
+        with _hoje(date(2026, 10, 1)):
+            banco = banco_de_horas(self.user.id, 10, 2026)
+        self.assertEqual((banco['saldo_banco_total'], banco['saldo_banco_ano']), (0.0, 0.0))
+
+        # Meio do mês com todos os dias úteis trabalhados: o dia corrente ainda sem horas não conta
+        for dia in (3, 4, 5, 6, 7, 10, 11):
+            db.session.add(Ponto(user_id=self.user.id, data=date(2025, 3, dia), horas_trabalhadas=8.0))
+        db.session.add(Ponto(user_id=self.user.id, data=date(2025, 3, 12), entrada=None))
+        db.session.commit()
+        with _hoje(date(2025, 3, 12)):
+            banco = banco_de_horas(self.user.id, 3, 2025)
+            self.assertEqual(banco['saldo_banco_total'], 0.0)
+            self.assertEqual(banco_de_horas(self.user.id, 6, 2025), banco)  # Meses futuros: nada a cobrar
+        with _hoje(date(2025, 3, 13)):  # O dia 12 passou sem horas fechadas
+            self.assertEqual(banco_de_horas(self.user.id, 3, 2025)['saldo_banco_total'], -8.0)
+
+    def test_migracao_materializa_meses_gravados_direto(self):
+        # Registros gravados sem a sessão (ex.: banco anterior aos resumos): nenhum resumo existe
+        db.session.execute(Ponto.__table__.insert(), [
+            {'user_id': self.user.id, 'data': date(2025, 1, 2), 'minutos_trabalhados': 600},
+            {'user_id': self.user.id, 'data': date(2025, 3, 3), 'minutos_trabalhados': 540},
+        ])
+        db.session.commit()
+        self.assertEqual(ResumoMensal.query.count(), 0)
+
+        _m008_resumos_de_todos_os_meses(db.session.connection())
+        db.session.commit()
+        # Janeiro: 23 dias úteis; março: 21 (fevereiro, sem registro, não entra no banco)
+        self.assertEqual([(ano, mes) for ano, mes, _ in self._acumulados()], [(2025, 1), (2025, 3)])
+        self.assertAlmostEqual(banco_de_horas(self.user.id, 3, 2025)['saldo_banco_total'],
+                               (10 - 23 * 8) + (9 - 21 * 8))
+
+
+def _hoje(data):
+    """Fixa date.today() do banco de horas."""
+    class Hoje(date):
+        @classmethod
+        def today(cls):
+            return data
+    return mock.patch('app.utils.resumo_mensal.date', Hoje)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Testes do perfil de produção do SQLite (app/utils/banco_sqlite.py).
+"""
+import os
+import unittest
+from datetime import date
+
+from app import db
+from app.models.ponto import Ponto, Atividade
+from app.utils.banco_sqlite import verificar_sqlite
+from base_testes import CasoTesteApp
+
+
+class TestBancoSqlite(CasoTesteApp):
+    BANCO_EM_ARQUIVO = True # WAL e o pool não se aplicam ao banco em memória
+
+    def setUp(self):
+        os.environ['SQLITE_BUSY_TIMEOUT_MS'] = '2500'
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        del os.environ['SQLITE_BUSY_TIMEOUT_MS']
+
+    def test_pragmas_aplicados_em_toda_conexao(self):
+        efetivo = verificar_sqlite(db.engine, self.app.config['SQLITE_PERFIL'])
+        self.assertEqual(efetivo['journal_mode'], 'WAL')
+        self.assertEqual(efetivo['synchronous'], 'NORMAL')
+        self.assertEqual(efetivo['busy_timeout'], 2500)
+        self.assertTrue(efetivo['foreign_keys'])
+        self.assertEqual(db.engine.pool.size(), 5)
+
+        # Uma segunda conexão do pool recebe os mesmos pragmas
+        with db.engine.connect() as primeira, db.engine.connect() as segunda:
+            for conexao in (primeira, segunda):
+                self.assertEqual(conexao.exec_driver_sql('PRAGMA busy_timeout').scalar(), 2500)
+
+    def test_chaves_estrangeiras_removem_atividades(self):
+        ponto = Ponto(user_id=self.user.id, data=date(2025, 3, 3), horas_trabalhadas=8.0)
+        ponto.atividades = [Atividade(descricao='Análise')]
+        db.session.add(ponto)
+        db.session.commit()
+
+        # Exclusão em massa (sem o ORM): o ON DELETE CASCADE do banco remove as atividades
+        db.session.execute(Ponto.__table__.delete().where(Ponto.id == ponto.id))
+        db.session.commit()
+        self.assertEqual(Atividade.query.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
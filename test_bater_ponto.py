@@ -0,0 +1,75 @@
+"""
+Testes da batida de ponto com um clique (POST /bater-ponto) e das chaves de idempotência.
+"""
+import unittest
+from datetime import date, datetime, time
+from unittest import mock
+
+from app import db
+from app.models.user import User
+from app.models.ponto import Ponto
+from app.models.resumo_mensal import ResumoMensal
+from app.models.chave_idempotencia import ChaveIdempotencia
+from base_testes import CasoTesteApp
+
+
+def _relogio(*horario):
+    """Substitui datetime.now() da batida por um horário fixo de 03/03/2025 (segunda-feira)."""
+    class Relogio(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 3, 3, *horario, 42)
+    return mock.patch('app.utils.batida_ponto.datetime', Relogio)
+
+
+class TestBaterPonto(CasoTesteApp):
+    def _bater(self, horario, chave):
+        with _relogio(*horario):
+            return self.client.post('/bater-ponto', headers={'Idempotency-Key': chave})
+
+    def test_quatro_batidas_completam_o_dia(self):
+        resposta = self._bater((8, 0), 'k1')
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual((resposta.json['campo'], resposta.json['horario'], resposta.json['proximo']),
+                         ('entrada', '08:00', 'saida_almoco'))
+        self.assertEqual(resposta.json['mensagem'], 'Entrada registrada às 08:00.')
+
+        # Retentativa com a mesma chave: mesma resposta, nada gravado de novo
+        repetida = self._bater((8, 1), 'k1')
+        self.assertEqual((repetida.status_code, repetida.json), (201, resposta.json))
+        self.assertEqual(repetida.headers['Idempotent-Replayed'], 'true')
+
+        self.assertEqual(self._bater((12, 0), 'k2').json['campo'], 'saida_almoco')
+        self.assertEqual(self._bater((13, 0), 'k3').json['campo'], 'retorno_almoco')
+        db.session.expire_all()
+        self.assertIsNone(Ponto.query.one().horas_trabalhadas)  # Horas só quando o dia completa
+
+        final = self._bater((17, 30), 'k4')
+        self.assertEqual((final.status_code, final.json['campo'], final.json['proximo'], final.json['horas_trabalhadas']),
+                         (200, 'saida', None, 8.5))
+        db.session.expire_all()
+        ponto = Ponto.query.one()
+        self.assertEqual((ponto.entrada, ponto.saida, ponto.horas_trabalhadas), (time(8), time(17, 30), 8.5))
+        resumo = ResumoMensal.query.filter_by(user_id=self.user.id, ano=2025, mes=3).one()
+        self.assertEqual((resumo.dias_trabalhados, resumo.horas_trabalhadas), (1, 8.5))
+        self.assertEqual(db.session.get(User, self.user.id).ultimo_ponto, date(2025, 3, 3))
+
+        excedente = self._bater((18, 0), 'k5')
+        self.assertEqual(excedente.status_code, 409)
+        self.assertIn('Todos os horários', excedente.json['error'])
+        self.assertEqual(ChaveIdempotencia.query.count(), 5)
+
+    def test_sem_chave_e_em_afastamento(self):
+        with _relogio(9, 0):
+            self.assertEqual(self.client.post('/bater-ponto').status_code, 201)  # Chave é opcional
+        self.assertEqual(ChaveIdempotencia.query.count(), 0)
+
+        Ponto.query.one().afastamento = True
+        db.session.commit()
+        resposta = self._bater((10, 0), 'k1')
+        self.assertEqual(resposta.status_code, 409)
+        self.assertIn('afastamento', resposta.json['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
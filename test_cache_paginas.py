@@ -0,0 +1,70 @@
+"""
+Testes do cache HTTP (ETag/304) e de fragmentos das telas mensais (app/utils/cache_paginas.py).
+"""
+import unittest
+from datetime import date
+
+from app import db
+from app.models.ponto import Ponto, Atividade
+from app.utils.cache_paginas import cache_fragmentos
+from base_testes import CasoTesteApp
+
+
+class TestCachePaginas(CasoTesteApp):
+    def setUp(self):
+        super().setUp()
+        self.ponto = Ponto(user_id=self.user.id, data=date(2025, 3, 3), horas_trabalhadas=8.0)
+        db.session.add(self.ponto)
+        db.session.commit()
+
+    def test_etag_e_invalidacao_por_versao_do_mes(self):
+        url = '/calendario?mes=3&ano=2025'
+        primeira = self.client.get(url)
+        self.assertEqual(primeira.status_code, 200)
+        etag = primeira.headers['ETag']
+        self.assertIsNotNone(primeira.last_modified)
+
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+        # Outro mês tem outra ETag
+        self.assertEqual(self.client.get('/calendario?mes=4&ano=2025', headers={'If-None-Match': etag}).status_code, 200)
+
+        # Alterar só uma atividade do mês também invalida a página
+        db.session.add(Atividade(ponto_id=self.ponto.id, descricao='Reunião de equipe'))
+        db.session.commit()
+        resposta = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta.headers['ETag'], etag)
+
+    def test_etag_acompanha_so_o_cadastro_do_proprio_usuario(self):
+        url = '/calendario?mes=3&ano=2025'
+        etag = self.client.get(url).headers['ETag']
+
+        # Cadastro de outro servidor (ou um novo usuário): a página deste não muda
+        outro = self.criar_usuario('Bruno', matricula='456')
+        outro.cargo = 'Analista'
+        db.session.commit()
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+        self.user.name = 'Ana Maria'
+        db.session.commit()
+        resposta = self.cliente(self.user).get(url, headers={'If-None-Match': etag})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn('Ana Maria', resposta.data.decode())
+
+    def test_fragmentos_reaproveitados_ate_a_proxima_gravacao(self):
+        cache = cache_fragmentos()
+        self.client.get('/calendario?mes=3&ano=2025')
+        misses = cache.misses
+        self.client.get('/calendario?mes=3&ano=2025')  # Sem If-None-Match: renderiza, mas com fragmentos em cache
+        self.assertEqual(cache.misses, misses)
+        self.assertGreaterEqual(cache.hits, 2)
+
+        self.ponto.horas_trabalhadas = 4.0
+        db.session.commit()
+        resposta = self.client.get('/calendario?mes=3&ano=2025')
+        self.assertEqual(cache.misses, misses + 2)  # Nova versão do mês: grade e resumo renderizados de novo
+        self.assertIn(b'4.00h', resposta.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+Testes do diretório de usuários em memória e da busca do seletor (app/utils/diretorio_usuarios.py).
+"""
+import unittest
+
+from app import db
+from app.models.user import User
+from app.utils.diretorio_usuarios import diretorio_usuarios
+from base_testes import CasoTesteApp
+
+
+class TestDiretorioUsuarios(CasoTesteApp):
+    USUARIO_PADRAO = False
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.criar_usuario('Administrador', matricula='ADM', is_admin=True)
+        for i, nome in enumerate(['João Araújo', 'Joana Lima', 'Márcia Souza']):
+            self.criar_usuario(nome, matricula=f'M{i:03d}', unidade_setor='DIRPP', is_active_db=(i != 1))
+        self.client = self.cliente(self.admin)
+
+    def test_busca_sem_acentos_e_invalidacao(self):
+        diretorio = diretorio_usuarios()
+        self.assertEqual([u.name for u in diretorio.buscar('joao araujo')], ['João Araújo'])
+        self.assertEqual([u.name for u in diretorio.buscar('jo')], ['Joana Lima', 'João Araújo'])
+        self.assertEqual([u.name for u in diretorio.buscar('jo', apenas_ativos=True)], ['João Araújo'])
+        self.assertEqual([u.matricula for u in diretorio.buscar('m002')], ['M002'])
+        self.assertIs(diretorio_usuarios(), diretorio)  # Reaproveitado enquanto nada muda
+
+        usuario = User.query.filter_by(matricula='M002').one()
+        usuario.name = 'Marcia Souza Ribeiro'
+        db.session.commit()
+        self.assertEqual([u.name for u in diretorio_usuarios().buscar('ribeiro')], ['Marcia Souza Ribeiro'])
+
+    def test_endpoint_de_busca_e_seletor(self):
+        resposta = self.client.get('/admin/usuarios/busca', query_string={'q': 'márcia'})
+        self.assertEqual(resposta.get_json(), [{'id': 4, 'name': 'Márcia Souza', 'matricula': 'M002',
+                                                'unidade_setor': 'DIRPP', 'ativo': True}])
+
+        # O dashboard do admin não envia mais a lista inteira de usuários
+        pagina = self.client.get('/dashboard').data.decode()
+        self.assertIn('data-busca-usuario', pagina)
+        self.assertNotIn('Joana Lima', pagina)
+
+        self.assertEqual(self.cliente(db.session.get(User, 2)).get('/admin/usuarios/busca?q=jo').status_code, 302)  # Apenas admin
+
+
+if __name__ == '__main__':
+    unittest.main()
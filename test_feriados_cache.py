@@ -0,0 +1,49 @@
+"""
+Testes do calendário de feriados em memória (app/utils/feriados_cache.py).
+"""
+import unittest
+from datetime import date
+
+from app import db
+from app.models.feriado import Feriado
+from app.utils.feriados_cache import calendario_feriados, invalidar_feriados
+from base_testes import CasoTesteApp
+
+
+class TestFeriadosCache(CasoTesteApp):
+    USUARIO_PADRAO = False
+
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([
+            Feriado(data=date(2025, 4, 18), descricao='Sexta-feira Santa'),
+            Feriado(data=date(2025, 4, 21), descricao='Tiradentes'),
+            Feriado(data=date(2025, 5, 1), descricao='Dia do Trabalho'),
+        ])
+        db.session.commit()
+
+    def test_consultas_do_calendario(self):
+        calendario = calendario_feriados()
+        self.assertEqual(calendario.feriados_do_mes(2025, 4), {
+            date(2025, 4, 18): 'Sexta-feira Santa',
+            date(2025, 4, 21): 'Tiradentes',
+        })
+        self.assertTrue(calendario.eh_feriado(date(2025, 5, 1)))
+        self.assertFalse(calendario.eh_dia_util(date(2025, 4, 19)))  # Sábado
+        self.assertEqual(len(calendario.dias_uteis_do_mes(2025, 4)), 20)
+
+    def test_calendario_reutilizado_ate_invalidacao(self):
+        calendario = calendario_feriados()
+        self.assertIs(calendario_feriados(), calendario)
+
+        db.session.add(Feriado(data=date(2025, 6, 19), descricao='Corpus Christi'))
+        db.session.commit()
+        self.assertFalse(calendario_feriados().eh_feriado(date(2025, 6, 19)))
+
+        invalidar_feriados()
+        self.assertIsNot(calendario_feriados(), calendario)
+        self.assertTrue(calendario_feriados().eh_feriado(date(2025, 6, 19)))
+
+
+if __name__ == '__main__':
+    unittest.main()
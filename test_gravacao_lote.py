@@ -0,0 +1,100 @@
+"""
+Testes da gravação em lote de registros de ponto (app/utils/gravacao_lote.py)
+e do registro múltiplo que a utiliza.
+"""
+import unittest
+from datetime import date
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.ponto import Ponto, Atividade
+from app.models.resumo_mensal import ResumoMensal
+from app.models.feriado import Feriado
+from base_testes import CasoTesteApp
+
+
+class TestGravacaoLote(CasoTesteApp):
+    def setUp(self):
+        super().setUp()
+        db.session.add(Ponto(user_id=self.user.id, data=date(2025, 3, 3), horas_trabalhadas=8.0))
+        db.session.commit()
+
+    def test_registro_multiplo_grava_linhas_validas_e_ignora_existentes(self):
+        resposta = self.client.post('/registrar-multiplo-ponto', data={
+            'datas[]': ['2025-03-03', '2025-03-04', '2025-03-05', '2025-03-04'],
+            'entradas[]': ['08:00', '08:00', '25:00', '09:00'],
+            'saidas_almoco[]': ['12:00', '12:00', '', ''],
+            'retornos_almoco[]': ['13:00', '13:00', '', ''],
+            'saidas[]': ['17:00', '17:00', '17:00', '18:00'],
+            'atividades[]': ['', 'Análise de processos', '', ''],
+        })
+        self.assertEqual(resposta.status_code, 200)  # Re-renderiza por causa da linha inválida
+        self.assertIn('Data ou hora inválida na linha 3'.encode(), resposta.data)
+
+        novo = Ponto.query.filter_by(user_id=self.user.id, data=date(2025, 3, 4)).one()
+        self.assertEqual(novo.horas_trabalhadas, 8.0)
+        self.assertEqual([a.descricao for a in Atividade.query.filter_by(ponto_id=novo.id)], ['Análise de processos'])
+        self.assertEqual(Ponto.query.filter_by(user_id=self.user.id).count(), 2)
+
+        resumo = ResumoMensal.query.filter_by(user_id=self.user.id, ano=2025, mes=3).one()
+        self.assertEqual(resumo.dias_trabalhados, 2)
+        self.assertAlmostEqual(resumo.horas_trabalhadas, 16.0)
+
+    def test_registrar_ferias_por_periodo(self):
+        db.session.add(Atividade(ponto_id=Ponto.query.one().id, descricao='Reunião'))
+        db.session.add(Feriado(data=date(2025, 3, 5), descricao='Feriado de teste'))
+        db.session.commit()
+
+        # 01/03 (sábado) a 09/03 (domingo): dias úteis 03, 04, 06 e 07 (05 é feriado)
+        resposta = self.client.post('/registrar-ferias', data={
+            'data_inicio': '2025-03-01', 'data_fim': '2025-03-09', 'tipo_afastamento': 'Férias'})
+        self.assertEqual(resposta.status_code, 302)
+
+        registros = Ponto.query.filter_by(user_id=self.user.id).order_by(Ponto.data).all()
+        self.assertEqual([r.data.day for r in registros], [3, 4, 6, 7])
+        self.assertTrue(all(r.afastamento and r.tipo_afastamento == 'Férias' and r.horas_trabalhadas is None
+                            for r in registros))
+        self.assertEqual(Atividade.query.count(), 0)  # Atividade do dia 03 removida
+
+        resumo = ResumoMensal.query.filter_by(user_id=self.user.id, ano=2025, mes=3).one()
+        self.assertEqual((resumo.dias_afastamento, resumo.dias_trabalhados), (4, 0))
+
+        resposta = self.client.post('/registrar-ferias', data={
+            'data_inicio': '2025-03-10', 'data_fim': '2025-03-07', 'tipo_afastamento': 'Férias'})
+        self.assertIn('data final deve ser igual ou posterior'.encode(), resposta.data)
+
+    def test_registrar_ponto_nao_duplica_o_dia(self):
+        dados = {'data': '2025-03-04', 'entrada': '08:00', 'saida_almoco': '12:00', 'retorno_almoco': '13:00',
+                 'saida': '17:00', 'atividades': 'Atendimento'}
+        self.assertEqual(self.client.post('/registrar-ponto', data=dados).status_code, 302)
+        resposta = self.client.post('/registrar-ponto', data=dict(dados, entrada='09:00'))  # Clique duplo
+        self.assertIn('Já existe um registro para 04/03/2025'.encode(), resposta.data)
+
+        registro = Ponto.query.filter_by(user_id=self.user.id, data=date(2025, 3, 4)).one()
+        self.assertEqual((registro.horas_trabalhadas, [a.descricao for a in registro.atividades]), (8.0, ['Atendimento']))
+        resumo = ResumoMensal.query.filter_by(user_id=self.user.id, ano=2025, mes=3).one()
+        self.assertEqual(resumo.dias_trabalhados, 2)
+
+        with self.assertRaises(IntegrityError):  # O índice único barra inserções fora das rotas
+            db.session.add(Ponto(user_id=self.user.id, data=date(2025, 3, 4)))
+            db.session.commit()
+        db.session.rollback()
+
+    def test_registrar_afastamento_converte_dia_existente(self):
+        ponto_id = Ponto.query.one().id
+        db.session.add(Atividade(ponto_id=ponto_id, descricao='Reunião'))
+        db.session.commit()
+        for _ in range(2):
+            resposta = self.client.post('/registrar-afastamento', data={'data': '2025-03-03', 'tipo_afastamento': 'Licença Médica'})
+            self.assertEqual(resposta.status_code, 302)
+        db.session.expire_all()
+        registro = Ponto.query.one()
+        self.assertEqual((registro.id, registro.afastamento, registro.tipo_afastamento, registro.horas_trabalhadas),
+                         (ponto_id, True, 'Licença Médica', None))
+        self.assertEqual(Atividade.query.count(), 0)
+        resumo = ResumoMensal.query.filter_by(user_id=self.user.id, ano=2025, mes=3).one()
+        self.assertEqual((resumo.dias_afastamento, resumo.dias_trabalhados), (1, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Testes da importação de registros por planilha (app/utils/importacao.py).
+"""
+import io
+import unittest
+from datetime import date, time
+
+from openpyxl import Workbook
+from app import db
+from app.models.ponto import Ponto, Atividade
+from app.utils.importacao import importar_pontos, ler_linhas_csv, ler_linhas_xlsx
+from base_testes import CasoTesteApp
+
+CSV = (
+    "Data;Entrada;Saída Almoço;Retorno Almoço;Saída;Atividades\n"
+    "03/03/2025;08:00;12:00;13:00;17:00;Atendimento\n"
+    "04/03/2025;09:00;;;18:00;\n"
+    "05/03/2025;8h;;;17:00;\n"
+    "06/03/2025;;;;;\n"
+    "03/03/2025;08:00;;;12:00;\n"
+).encode('utf-8')
+
+
+class TestImportacao(CasoTesteApp):
+    def setUp(self):
+        super().setUp()
+        # Registro existente: deve ser atualizado pela importação
+        db.session.add(Ponto(user_id=self.user.id, data=date(2025, 3, 4), entrada=time(10), saida=time(11), horas_trabalhadas=1.0))
+        db.session.commit()
+
+    def test_csv_simulacao_e_importacao(self):
+        simulacao = importar_pontos(ler_linhas_csv(io.BytesIO(CSV)), user_id=self.user.id, simulacao=True, tamanho_lote=1)
+        self.assertEqual((simulacao.linhas_lidas, simulacao.inseridos, simulacao.atualizados, simulacao.ignorados),
+                         (5, 1, 1, 1))
+        self.assertEqual(simulacao.total_erros, 2)
+        self.assertIn('Linha 4', simulacao.erros[0])   # Horário inválido
+        self.assertIn('repetida', simulacao.erros[1])  # Data repetida no arquivo
+        self.assertEqual(Ponto.query.count(), 1)       # Nada gravado na simulação
+
+        relatorio = importar_pontos(ler_linhas_csv(io.BytesIO(CSV)), user_id=self.user.id)
+        self.assertEqual((relatorio.inseridos, relatorio.atualizados), (1, 1))
+        novo = Ponto.query.filter_by(data=date(2025, 3, 3)).one()
+        self.assertEqual(novo.horas_trabalhadas, 8.0)
+        self.assertEqual([a.descricao for a in Atividade.query.filter_by(ponto_id=novo.id)], ['Atendimento'])
+        self.assertEqual(Ponto.query.filter_by(data=date(2025, 3, 4)).one().horas_trabalhadas, 9.0)
+
+    def test_xlsx_admin_por_matricula(self):
+        planilha = Workbook()
+        aba = planilha.active
+        aba.append(['Matrícula', 'Data', 'Entrada', 'Saída', 'Tipo Afastamento'])
+        aba.append(['123', date(2025, 3, 10), time(8), time(16), None])
+        aba.append(['123', '11/03/2025', None, None, 'Férias'])
+        aba.append(['999', '12/03/2025', '08:00', '16:00', None])
+        buffer = io.BytesIO()
+        planilha.save(buffer)
+        buffer.seek(0)
+
+        relatorio = importar_pontos(ler_linhas_xlsx(buffer))
+        self.assertEqual(relatorio.inseridos, 2)
+        self.assertIn("matrícula '999' não encontrada", relatorio.erros[0])
+        ferias = Ponto.query.filter_by(data=date(2025, 3, 11)).one()
+        self.assertTrue(ferias.afastamento)
+        self.assertEqual(ferias.tipo_afastamento, 'Férias')
+
+
+if __name__ == '__main__':
+    unittest.main()
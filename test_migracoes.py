@@ -0,0 +1,133 @@
+"""
+Testes das migrações versionadas do esquema (app/utils/migracoes.py).
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from datetime import date, time
+
+os.environ['DATABASE_URL'] = 'sqlite://'  # Banco em memória para os demais testes
+
+from app import create_app, db
+from app.models.ponto import Ponto
+from app.utils.migracoes import (aplicar_migracoes, verificar_esquema, versao_esquema, VERSAO_ESQUEMA, MIGRACOES,
+                                 EsquemaDesatualizado)
+
+
+class TestMigracoes(unittest.TestCase):
+    def setUp(self):
+        # Banco antigo em arquivo, anterior à tabela schema_version
+        self.diretorio = tempfile.mkdtemp()
+        caminho = os.path.join(self.diretorio, 'ponto.db')
+        conexao = sqlite3.connect(caminho)
+        conexao.executescript("""
+            CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL UNIQUE,
+                                password_hash TEXT NOT NULL, matricula TEXT NOT NULL UNIQUE, vinculo TEXT NOT NULL,
+                                is_admin BOOLEAN DEFAULT 0, cargo TEXT, uf TEXT, telefone TEXT, foto_path TEXT,
+                                data_cadastro DATETIME);
+            CREATE TABLE pontos (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id),
+                                 data DATE NOT NULL, entrada TIME, saida_almoco TIME, retorno_almoco TIME, saida TIME,
+                                 horas_trabalhadas FLOAT);
+            INSERT INTO users (name, email, password_hash, matricula, vinculo) VALUES
+                ('João Araújo', 'joao@example.com', 'hash', 'J001', 'SENAPPEN');
+            INSERT INTO pontos (user_id, data, horas_trabalhadas) VALUES (1, '2025-03-03', 8.0);
+            INSERT INTO pontos (user_id, data, entrada, saida_almoco, retorno_almoco, saida, horas_trabalhadas)
+                VALUES (1, '2025-03-05', '08:10:00.000000', '12:00:00.000000', '13:00:00.000000', '17:00:00.000000', 7.83);
+            INSERT INTO pontos (user_id, data, horas_trabalhadas) VALUES (1, '2025-03-03', 4.0);  -- Repetido
+        """)
+        conexao.close()
+        self.ambiente = mock.patch.dict(os.environ, {'DATABASE_URL': f'sqlite:///{caminho}', 'AUTO_MIGRAR': '0'})
+        self.ambiente.start()
+
+    def tearDown(self):
+        self.ambiente.stop()
+        shutil.rmtree(self.diretorio)
+
+    def test_workers_nao_sobem_com_esquema_desatualizado(self):
+        with self.assertRaises(EsquemaDesatualizado):
+            create_app()
+        del os.environ['AUTO_MIGRAR']  # Desligado também por padrão
+        with self.assertRaises(EsquemaDesatualizado):
+            create_app()
+
+    def test_script_de_implantacao_migra_sem_a_checagem_dos_workers(self):
+        # Como em init_db_production.py: a aplicação sobe sem conferir a versão e o passo 2 migra
+        app = create_app(conferir_esquema=False)
+        app.config['CACHE_VERSAO_DIR'] = self.diretorio
+        with app.app_context():
+            self.assertEqual(versao_esquema(), 0)
+            self.assertEqual(aplicar_migracoes(app), [versao for versao, _, _ in MIGRACOES])
+            self.assertEqual(versao_esquema(), VERSAO_ESQUEMA)
+            db.session.remove()
+            db.engine.dispose()
+
+    def test_migracao_de_banco_antigo(self):
+        os.environ['AUTO_MIGRAR'] = '1'
+        app = create_app()  # Banco na versão 0: aplica todas as migrações na inicialização
+        app.config['CACHE_VERSAO_DIR'] = self.diretorio
+        with app.app_context():
+            self.assertEqual(versao_esquema(), VERSAO_ESQUEMA)
+            usuario = db.session.execute(db.text(
+                "SELECT nome_normalizado, ultimo_ponto, is_active_db, unidade_setor FROM users")).one()
+            self.assertEqual(tuple(usuario), ('joao araujo', '2025-03-05', 1, ''))
+            indices = {linha[1] for linha in db.session.execute(db.text("PRAGMA index_list(users)"))}
+            self.assertIn('ix_users_ativo_nome', indices)
+            sufixos = db.session.execute(db.text("SELECT sufixo FROM sufixos_nome_usuario ORDER BY sufixo")).scalars()
+            self.assertEqual(list(sufixos), ['araujo', 'joao araujo'])
+            indices_pontos = {linha[1]: linha[2] for linha in db.session.execute(db.text("PRAGMA index_list(pontos)"))}
+            self.assertEqual(indices_pontos['ix_ponto_user_data'], 1)  # Único; o registro repetido foi removido
+            # Horários e horas trabalhadas convertidos para minutos inteiros
+            pontos = db.session.execute(db.text(
+                "SELECT entrada, saida_almoco, retorno_almoco, saida, minutos_trabalhados FROM pontos ORDER BY id")).all()
+            self.assertEqual([tuple(p) for p in pontos], [(None, None, None, None, 480), (490, 720, 780, 1020, 470)])
+            colunas = {linha[1] for linha in db.session.execute(db.text("PRAGMA table_info(pontos)"))}
+            self.assertNotIn('horas_trabalhadas', colunas)
+            ponto = Ponto.query.filter_by(data=date(2025, 3, 5)).one()
+            self.assertEqual((ponto.entrada, ponto.horas_trabalhadas), (time(8, 10), 7.83))
+            # Resumo de março materializado e somado ao banco de horas (21 dias úteis, 480 + 470 minutos)
+            resumo = db.session.execute(db.text(
+                "SELECT ano, mes, dias_trabalhados, saldo_acumulado FROM resumos_mensais")).one()
+            self.assertEqual(tuple(resumo[:3]), (2025, 3, 2))
+            self.assertAlmostEqual(resumo[3], 950 / 60 - 21 * 8)
+
+            self.assertEqual(aplicar_migracoes(app), [])  # Nada pendente na segunda execução
+            app.config['AUTO_MIGRAR'] = False
+            self.assertEqual(verificar_esquema(app), VERSAO_ESQUEMA)  # Só confere a versão
+            db.session.remove()
+            db.engine.dispose()
+
+    def test_banco_novo_chega_ao_esquema_dos_modelos(self):
+        # A migração 1 não usa os modelos: as tabelas atuais saem só da sequência de migrações
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(self.diretorio, 'novo.db')}"
+        os.environ['AUTO_MIGRAR'] = '1'
+        app = create_app()
+        app.config['CACHE_VERSAO_DIR'] = self.diretorio
+        with app.app_context():
+            inspetor = db.inspect(db.engine)
+            for tabela in db.metadata.sorted_tables:
+                self.assertEqual({c['name'] for c in inspetor.get_columns(tabela.name)},
+                                 {c.name for c in tabela.columns}, tabela.name)
+                self.assertEqual({i['name'] for i in inspetor.get_indexes(tabela.name)},
+                                 {i.name for i in tabela.indexes}, tabela.name)
+            db.session.remove()
+            db.engine.dispose()
+
+    def test_migracao_cria_tabela_como_era_na_versao(self):
+        # Parado na versão 7, terminais_quiosque não tem as colunas que só a migração 9 acrescenta
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(self.diretorio, 'v7.db')}"
+        os.environ['AUTO_MIGRAR'] = '1'
+        with mock.patch('app.utils.migracoes.MIGRACOES', MIGRACOES[:7]):
+            app = create_app()
+        with app.app_context():
+            colunas = {c['name'] for c in db.inspect(db.engine).get_columns('terminais_quiosque')}
+            self.assertEqual(colunas, {'id', 'nome', 'token_hash', 'ativo', 'criado_por', 'created_at'})
+            self.assertEqual(versao_esquema(), 7)
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
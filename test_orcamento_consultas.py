@@ -0,0 +1,64 @@
+"""
+Testes do orçamento de consultas das telas (app/utils/orcamento_consultas.py) e do carregamento antecipado.
+"""
+import unittest
+from datetime import date, time
+from flask import g
+
+from app import db
+from app.models.ponto import Ponto, Atividade
+from app.utils.orcamento_consultas import orcamento_consultas, contar_consultas, OrcamentoConsultasExcedido
+from base_testes import CasoTesteApp
+
+
+class TestOrcamentoConsultas(CasoTesteApp):
+    def setUp(self):
+        super().setUp()
+        for dia in range(3, 15):
+            ponto = Ponto(user_id=self.user.id, data=date(2025, 3, dia), entrada=time(8), saida=time(17),
+                          horas_trabalhadas=8.0)
+            ponto.atividades = [Atividade(descricao=f'Atividade {dia}.{i}') for i in range(3)]
+            db.session.add(ponto)
+        db.session.commit()
+        self.ponto_id = Ponto.query.filter_by(data=date(2025, 3, 3)).one().id
+
+    def test_orcamento_excedido_falha(self):
+        @orcamento_consultas(2)
+        def view_com_n_mais_1():
+            return str(sum(len(p.atividades) for p in Ponto.query.all()))
+
+        with self.app.test_request_context():
+            db.session.expire_all()
+            with self.assertRaises(OrcamentoConsultasExcedido):
+                view_com_n_mais_1()
+            self.app.config['QUERY_BUDGET_ENFORCE'] = False  # Desligado (produção): a view roda normalmente
+            self.assertEqual(view_com_n_mais_1(), '36')
+
+    def test_telas_dentro_do_orcamento(self):
+        for url in ('/dashboard?mes=3&ano=2025', '/calendario?mes=3&ano=2025', '/relatorio-mensal?mes=3&ano=2025',
+                    f'/visualizar-ponto/{self.ponto_id}', f'/editar-ponto/{self.ponto_id}',
+                    f'/registrar-atividade/{self.ponto_id}'):
+            # Simula uma requisição nova: sessão vazia e usuário logado recarregado pelo flask-login
+            db.session.expunge_all()
+            g.pop('_login_user', None)
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+        pagina = self.client.get(f'/visualizar-ponto/{self.ponto_id}').data.decode()
+        self.assertIn('Atividade 3.2', pagina)
+
+    def test_edicao_usa_atividade_carregada(self):
+        resposta = self.client.post(f'/editar-ponto/{self.ponto_id}', data={
+            'data': '2025-03-03', 'entrada': '08:00', 'saida_almoco': '12:00', 'retorno_almoco': '13:00',
+            'saida': '17:00', 'atividades': 'Nova descrição', 'tipo_afastamento': ''})
+        self.assertEqual(resposta.status_code, 302)
+        ponto = db.session.get(Ponto, self.ponto_id)
+        db.session.refresh(ponto)
+        self.assertEqual([a.descricao for a in ponto.atividades], ['Nova descrição', 'Atividade 3.1', 'Atividade 3.2'])
+
+        with contar_consultas() as consultas:
+            self.client.get(f'/visualizar-ponto/{self.ponto_id}')
+        self.assertLessEqual(len(consultas), 3)  # Usuário logado + registro/dono + atividades
+
+
+if __name__ == '__main__':
+    unittest.main()
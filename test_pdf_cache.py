@@ -0,0 +1,48 @@
+"""
+Testes do cache de PDFs endereçado pelo conteúdo (app/utils/pdf_cache.py).
+"""
+import os
+import unittest
+from datetime import date, time
+
+from app import db
+from app.models.ponto import Ponto
+from app.utils.export import generate_pdf
+from app.utils.pdf_cache import PdfCache, pdf_cache
+from base_testes import CasoTesteApp
+
+
+class TestPdfCache(CasoTesteApp):
+    def setUp(self):
+        super().setUp()
+        self.app.config['PDF_CACHE_DIR'] = os.path.join(self.cache_dir, 'pdf')
+        self.ponto = Ponto(user_id=self.user.id, data=date(2025, 3, 3), entrada=time(8), saida=time(17), horas_trabalhadas=9.0)
+        db.session.add(self.ponto)
+        db.session.commit()
+
+    def test_pdf_reaproveitado_ate_mudar_o_conteudo(self):
+        caminho, filename = generate_pdf(self.user.id, 3, 2025)
+        self.assertEqual(filename, 'relatorio_123_3_2025.pdf')
+        self.assertEqual(generate_pdf(self.user.id, 3, 2025)[0], caminho)
+        self.assertEqual((pdf_cache().hits, pdf_cache().misses), (1, 1))
+
+        self.ponto.observacoes = 'Reunião externa'
+        db.session.commit()
+        self.assertNotEqual(generate_pdf(self.user.id, 3, 2025)[0], caminho)
+        self.assertEqual(pdf_cache().misses, 2)
+
+    def test_remocao_lru_por_tamanho(self):
+        cache = PdfCache(os.path.join(self.cache_dir, 'lru'), max_bytes=250)
+        cache.gravar('a', b'x' * 100)
+        cache.gravar('b', b'x' * 100)
+        os.utime(cache.caminho('a'), ns=(1, 1))  # 'a' passa a ser o menos usado
+        os.utime(cache.caminho('b'), ns=(2, 2))
+        self.assertIsNotNone(cache.obter('a'))  # O acerto torna 'a' o mais recente
+        cache.gravar('c', b'x' * 100)
+        self.assertIsNone(cache.obter('b'))
+        self.assertIsNotNone(cache.obter('a'))
+        self.assertEqual(cache.evictions, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
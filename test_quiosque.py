@@ -0,0 +1,155 @@
+"""
+Testes do modo quiosque: ativação do terminal, PIN do perfil e batidas por matrícula + PIN.
+"""
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from sqlalchemy import event
+from app import db
+from app.models.user import User
+from app.models.ponto import Ponto
+from app.models.terminal_quiosque import TerminalQuiosque
+from app.utils.quiosque import (CHAVE_SESSAO, FALHAS_MAXIMAS, FALHAS_MAXIMAS_TERMINAL, gerar_hash_pin,
+                                verificar_hash_pin)
+from base_testes import CasoTesteApp
+
+
+def _relogio(*horario):
+    """Substitui datetime.now() da batida por um horário fixo de 03/03/2025."""
+    class Relogio(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 3, 3, *horario)
+    return mock.patch('app.utils.batida_ponto.datetime', Relogio)
+
+
+class TestQuiosque(CasoTesteApp):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.criar_usuario('Admin', matricula='900', is_admin=True)
+
+        # O terminal é ativado por um administrador, que sai da sessão em seguida
+        self.terminal = self.cliente(self.admin)
+        resposta = self.terminal.post('/quiosque/terminais', data={'nome': 'Recepção'})
+        self.assertEqual(resposta.status_code, 302)
+        self.assertTrue(resposta.location.endswith('/quiosque/'))
+
+    def _definir_pin(self, pin, senha='senha123'):
+        return self.cliente(self.user).post('/perfil/pin', data={'senha_atual': senha, 'pin': pin, 'pin2': pin})
+
+    def _bater(self, horario, matricula='123', pin='4321'):
+        with _relogio(*horario):
+            return self.terminal.post('/quiosque/bater', json={'matricula': matricula, 'pin': pin})
+
+    def test_hash_do_pin(self):
+        pin_hash = gerar_hash_pin('4321')
+        self.assertTrue(verificar_hash_pin(pin_hash, '4321'))
+        self.assertFalse(verificar_hash_pin(pin_hash, '1234'))
+        self.assertFalse(verificar_hash_pin('lixo', '4321'))
+        self.assertNotEqual(pin_hash, gerar_hash_pin('4321'))  # Sal diferente a cada hash
+
+    def test_terminal_autenticado_como_dispositivo(self):
+        with self.terminal.session_transaction() as sess:
+            self.assertNotIn('_user_id', sess)
+            self.assertEqual(sess[CHAVE_SESSAO][0], TerminalQuiosque.query.one().id)
+        self.assertEqual(self.terminal.get('/quiosque/').status_code, 200)
+        self.assertEqual(self.terminal.get('/dashboard').status_code, 302)  # Não é sessão de usuário
+
+        outro = self.app.test_client()
+        self.assertEqual(outro.get('/quiosque/').status_code, 302)
+        self.assertEqual(outro.post('/quiosque/bater', json={'matricula': '123', 'pin': '4321'}).status_code, 403)
+
+    def test_batidas_por_matricula_e_pin(self):
+        self.assertEqual(self._bater((8, 0)).status_code, 401)  # Ainda sem PIN
+        self.assertEqual(self._definir_pin('4321').status_code, 302)
+        self.assertTrue(verificar_hash_pin(db.session.get(User, self.user.id).pin_quiosque_hash, '4321'))
+
+        resposta = self._bater((8, 0))
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual((resposta.json['nome'], resposta.json['campo'], resposta.json['mensagem']),
+                         ('Ana', 'entrada', 'Entrada registrada às 08:00.'))
+
+        # Duplo toque (ou a mesma pessoa de novo na fila): recusado
+        repetida = self._bater((8, 1))
+        self.assertEqual(repetida.status_code, 409)
+        self.assertIn('aguarde', repetida.json['error'])
+
+        # Batidas seguintes: matrícula e PIN saem da memória, sem consultar a tabela users
+        consultas_users = []
+        def _anotar(conn, cursor, statement, parameters, context, executemany):
+            if 'FROM users' in statement:
+                consultas_users.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', _anotar)
+        try:
+            self.assertEqual(self._bater((12, 0)).json['campo'], 'saida_almoco')
+            self.assertEqual(self._bater((13, 0)).json['campo'], 'retorno_almoco')
+            final = self._bater((17, 0))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', _anotar)
+        self.assertEqual(consultas_users, [])
+        self.assertEqual((final.status_code, final.json['campo']), (200, 'saida'))
+        db.session.expire_all()
+        self.assertEqual(Ponto.query.one().horas_trabalhadas, 8.0)
+
+    def test_senha_errada_nao_troca_pin(self):
+        self._definir_pin('4321', senha='errada')
+        self.assertIsNone(db.session.get(User, self.user.id).pin_quiosque_hash)
+        self._definir_pin('12a')  # Formato inválido
+        self.assertIsNone(db.session.get(User, self.user.id).pin_quiosque_hash)
+
+    def test_pin_errado_bloqueia_matricula(self):
+        self._definir_pin('4321')
+        for _ in range(FALHAS_MAXIMAS):
+            self.assertEqual(self._bater((8, 0), pin='0000').status_code, 401)
+        bloqueada = self._bater((8, 0))  # Nem o PIN certo passa durante o bloqueio
+        self.assertEqual(bloqueada.status_code, 429)
+        self.assertEqual(Ponto.query.count(), 0)
+
+        # O bloqueio fica no banco: um worker novo (mapas em memória vazios) também recusa
+        self.assertIsNotNone(db.session.get(User, self.user.id).pin_bloqueado_ate)
+        self.app.extensions.pop('quiosque')
+        self.assertEqual(self._bater((8, 0)).status_code, 429)
+
+        # Trocar o PIN desfaz o bloqueio
+        self._definir_pin('5678')
+        self.assertEqual(self._bater((8, 0), pin='5678').status_code, 201)
+
+    def test_acerto_zera_erros_mesmo_com_batida_recusada(self):
+        self._definir_pin('4321')
+        self.assertEqual(self._bater((8, 0)).status_code, 201)
+        for _ in range(FALHAS_MAXIMAS - 1):
+            self.assertEqual(self._bater((8, 1), pin='0000').status_code, 401)
+        self.assertEqual(self._bater((8, 1)).status_code, 409)  # PIN certo, batida recusada pelo intervalo
+        self.assertEqual(db.session.get(User, self.user.id).falhas_pin_quiosque, 0)
+        self.assertEqual(self._bater((8, 2), pin='0000').status_code, 401)  # Um erro a mais não bloqueia
+
+    def test_limite_de_erros_por_terminal(self):
+        self._definir_pin('4321')
+        # Matrículas diferentes (nenhuma chega ao bloqueio individual) esgotam o limite do terminal
+        for i in range(FALHAS_MAXIMAS_TERMINAL):
+            self.assertEqual(self._bater((8, 0), matricula=f'X{i}', pin='0000').status_code, 401)
+        self.assertEqual(self._bater((8, 0)).status_code, 429)
+        self.assertEqual(Ponto.query.count(), 0)
+
+    def test_matricula_desconhecida_tambem_calcula_hash(self):
+        with mock.patch('app.utils.quiosque.verificar_hash_pin', wraps=verificar_hash_pin) as verificacao:
+            self.assertEqual(self._bater((8, 0), matricula='999').status_code, 401)
+        verificacao.assert_called_once()
+
+    def test_usuario_inativo_e_terminal_revogado(self):
+        self._definir_pin('4321')
+        self.assertEqual(self._bater((8, 0)).status_code, 201)
+        usuario = db.session.get(User, self.user.id)
+        usuario.is_active_db = False
+        db.session.commit()
+        self.assertEqual(self._bater((12, 0)).status_code, 401)  # Mapa recarregado após o commit de User
+
+        admin = self.cliente(self.admin)
+        terminal = TerminalQuiosque.query.one()
+        self.assertEqual(admin.post(f'/quiosque/terminais/{terminal.id}/revogar').status_code, 302)
+        self.assertEqual(self._bater((12, 0)).status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
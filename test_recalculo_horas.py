@@ -0,0 +1,57 @@
+"""
+Testes do recálculo vetorizado de horas trabalhadas (app/utils/recalculo_horas.py).
+"""
+import random
+import unittest
+from datetime import date, time
+
+from app import db
+from app.models.ponto import Ponto
+from app.models.resumo_mensal import ResumoMensal
+from app.utils.helpers import calcular_minutos
+from app.utils.recalculo_horas import calcular_minutos_vetorizado, recalcular_horas_lote
+from base_testes import CasoTesteApp
+
+
+def _minutos(horario):
+    return horario.hour * 60 + horario.minute if horario else -1
+
+
+class TestRecalculoHoras(CasoTesteApp):
+    def test_mesmo_resultado_que_calcular_minutos(self):
+        aleatorio = random.Random(42)
+        def horario():
+            return None if aleatorio.random() < 0.1 else time(aleatorio.randrange(24), aleatorio.randrange(60))
+        casos = [(horario(), horario(), horario(), horario()) for _ in range(5000)]
+        casos += [(time(8), time(12), time(13), time(17)), (time(22), time(2), time(3), time(6)),
+                  (time(8), time(12), time(12, 30), time(17)), (time(8), None, None, time(8))]
+        vetor = calcular_minutos_vetorizado(*([_minutos(caso[i]) for caso in casos] for i in range(4)))
+        for (entrada, saida_almoco, retorno_almoco, saida), minutos in zip(casos, vetor):
+            esperado = calcular_minutos(date(2025, 3, 3), entrada, saida, saida_almoco, retorno_almoco)
+            self.assertEqual(None if minutos == -1 else minutos, esperado, (entrada, saida_almoco, retorno_almoco, saida))
+
+    def test_recalculo_grava_so_o_que_mudou(self):
+        db.session.add_all([
+            Ponto(user_id=self.user.id, data=date(2025, 3, 3), entrada=time(8), saida_almoco=time(12),
+                  retorno_almoco=time(13), saida=time(17), horas_trabalhadas=9.0),  # Almoço não descontado
+            Ponto(user_id=self.user.id, data=date(2025, 3, 4), entrada=time(8), saida_almoco=time(12),
+                  retorno_almoco=time(13), saida=time(17), horas_trabalhadas=8.0),  # Já correto
+            Ponto(user_id=self.user.id, data=date(2025, 3, 5), afastamento=True, tipo_afastamento='Férias'),
+        ])
+        db.session.commit()
+        self.assertEqual(db.session.get(ResumoMensal, 1).horas_trabalhadas, 17.0)
+
+        simulacao = recalcular_horas_lote(aplicar=False, tamanho_bloco=2)
+        self.assertEqual([(a.data, a.anterior, a.novo) for a in simulacao], [(date(2025, 3, 3), 9.0, 8.0)])
+        self.assertEqual(Ponto.query.filter_by(data=date(2025, 3, 3)).one().horas_trabalhadas, 9.0)
+
+        self.assertEqual(len(recalcular_horas_lote(tamanho_bloco=2)), 1)
+        db.session.commit()
+        db.session.expire_all()
+        self.assertEqual(Ponto.query.filter_by(data=date(2025, 3, 3)).one().horas_trabalhadas, 8.0)
+        self.assertEqual(ResumoMensal.query.one().horas_trabalhadas, 16.0)  # Resumo do mês acompanhou
+        self.assertEqual(recalcular_horas_lote(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
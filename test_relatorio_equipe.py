@@ -0,0 +1,62 @@
+"""
+Testes do relatório consolidado da equipe (gerar_relatorio_equipe).
+Os totais devem coincidir com os do relatório individual de cada usuário.
+"""
+import unittest
+from datetime import date
+
+from app import db
+from app.models.ponto import Ponto
+from app.models.feriado import Feriado
+from app.utils.helpers import gerar_relatorio_equipe, gerar_relatorio_mensal, gerar_relatorios_mensais_lote
+from base_testes import CasoTesteApp
+
+
+class TestRelatorioEquipe(CasoTesteApp):
+    USUARIO_PADRAO = False
+
+    def setUp(self):
+        super().setUp()
+        self.usuarios = [self.criar_usuario(f'Usuário {i}', matricula=f'M{i}', email=f'u{i}@example.com',
+                                            unidade_setor=setor, chefia_imediata='Chefe')
+                         for i, setor in enumerate(['DIRPP', 'DIRPP', 'CGTI'])]
+        db.session.add(Feriado(data=date(2025, 3, 4), descricao='Carnaval'))
+        db.session.commit()
+
+        u0, u1, _ = self.usuarios
+        db.session.add_all([
+            Ponto(user_id=u0.id, data=date(2025, 3, 3), horas_trabalhadas=9.0),
+            Ponto(user_id=u0.id, data=date(2025, 3, 4), horas_trabalhadas=4.0),  # Feriado: não conta
+            Ponto(user_id=u0.id, data=date(2025, 3, 8), horas_trabalhadas=5.0),  # Sábado: não conta
+            Ponto(user_id=u1.id, data=date(2025, 3, 5), afastamento=True, tipo_afastamento='Férias'),
+        ])
+        db.session.commit()
+
+    def test_totais_iguais_ao_relatorio_individual(self):
+        linhas = {l['user_id']: l for l in gerar_relatorio_equipe(3, 2025)}
+        self.assertEqual(len(linhas), 3)
+        for user in self.usuarios:
+            individual = gerar_relatorio_mensal(user.id, 3, 2025)
+            linha = linhas[user.id]
+            self.assertEqual(linha['dias_uteis'], individual.dias_uteis)
+            self.assertEqual(linha['dias_trabalhados'], individual.dias_trabalhados)
+            self.assertEqual(linha['dias_afastamento'], individual.dias_afastamento)
+            self.assertAlmostEqual(linha['horas_trabalhadas'], individual.horas_trabalhadas)
+            self.assertAlmostEqual(linha['saldo_horas'], individual.saldo_horas)
+
+    def test_filtro_por_unidade(self):
+        linhas = gerar_relatorio_equipe(3, 2025, unidade_setor='CGTI')
+        self.assertEqual([l['matricula'] for l in linhas], ['M2'])
+
+    def test_lote_igual_ao_relatorio_individual(self):
+        lote = gerar_relatorios_mensais_lote(self.usuarios, 3, 2025)
+        for user in self.usuarios:
+            individual = gerar_relatorio_mensal(user.id, 3, 2025)
+            self.assertEqual([r.id for r in lote[user.id].registros], [r.id for r in individual.registros])
+            self.assertEqual(lote[user.id].dias_uteis, individual.dias_uteis)
+            self.assertAlmostEqual(lote[user.id].saldo_horas, individual.saldo_horas)
+            self.assertAlmostEqual(lote[user.id].media_diaria, individual.media_diaria)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Testes da memoização do relatório mensal por requisição (app/utils/helpers.py).
+"""
+import unittest
+from datetime import date
+from unittest import mock
+
+from app import db
+from app.models.ponto import Ponto
+from app.models.relatorio_completo import RelatorioMensalCompleto
+from app.utils import helpers
+from base_testes import CasoTesteApp
+
+
+class TestRelatorioRequisicao(CasoTesteApp):
+    def setUp(self):
+        super().setUp()
+        self.app.config['PDF_CACHE_DIR'] = self.cache_dir
+        for dia in (3, 4, 5):
+            db.session.add(Ponto(user_id=self.user.id, data=date(2025, 3, dia), horas_trabalhadas=8.0))
+        db.session.add(RelatorioMensalCompleto(user_id=self.user.id, ano=2025, mes=3, autoavaliacao='Bom mês', dificuldades='Nenhuma', sugestoes='Nenhuma',
+                                               declaracao_marcada=True))
+        db.session.commit()
+
+    def test_mes_carregado_uma_vez_por_requisicao(self):
+        with self.app.test_request_context():
+            desc = helpers._get_relatorio_mensal_data(self.user.id, 3, 2025)
+            with mock.patch.object(helpers, 'gerar_relatorio_mensal') as gerar:
+                de_novo = helpers._get_relatorio_mensal_data(self.user.id, 3, 2025)
+                asc = helpers._get_relatorio_mensal_data(self.user.id, 3, 2025, order_desc=False)
+                gerar.assert_not_called()
+            self.assertIsNot(de_novo, desc)  # Cada consumidor recebe o próprio dicionário
+            self.assertEqual([r.data.day for r in asc['registros']], [3, 4, 5])
+            self.assertEqual([r.data.day for r in desc['registros']], [5, 4, 3])
+
+            # Uma gravação na sessão descarta a memória
+            db.session.add(Ponto(user_id=self.user.id, data=date(2025, 3, 6), horas_trabalhadas=8.0))
+            db.session.commit()
+            self.assertEqual(helpers._get_relatorio_mensal_data(self.user.id, 3, 2025)['dias_trabalhados'], 4)
+
+    def test_rotas_de_exportacao_consultam_o_mes_uma_vez(self):
+        for url in ('/visualizar-relatorio-completo?user_id=1&mes=3&ano=2025',
+                    '/gerar-html-sei?user_id=1&mes=3&ano=2025'):
+            with mock.patch.object(helpers, 'gerar_relatorio_mensal', wraps=helpers.gerar_relatorio_mensal) as gerar:
+                resposta = self.client.get(url)
+                self.assertEqual(resposta.status_code, 200, url)
+                self.assertEqual(gerar.call_count, 1, url)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Testes da tabela materializada de resumos mensais (resumos_mensais).
+Verifica se o resumo acompanha inclusões, edições e exclusões de Ponto e Feriado.
+"""
+import unittest
+from datetime import date, time
+from unittest import mock
+
+from app import db
+from app.models.ponto import Ponto
+from app.models.feriado import Feriado
+from app.models.resumo_mensal import ResumoMensal
+from app.utils.resumo_mensal import obter_resumo_mensal, calcular_estatisticas_mes
+from app.utils.helpers import _get_relatorio_mensal_data
+from base_testes import CasoTesteApp
+
+
+class TestResumoMensal(CasoTesteApp):
+    def _resumo(self, ano=2025, mes=3):
+        return ResumoMensal.query.filter_by(user_id=self.user.id, ano=ano, mes=mes).first()
+
+    def test_calculo_puro(self):
+        """Março/2025 tem 21 dias úteis; um dia de 8h e um afastamento."""
+        registros = [(date(2025, 3, 3), False, 480), (date(2025, 3, 4), True, None)]
+        stats = calcular_estatisticas_mes(2025, 3, registros, set())
+        self.assertEqual(stats['dias_uteis'], 21)
+        self.assertEqual(stats['dias_trabalhados'], 1)
+        self.assertEqual(stats['dias_afastamento'], 1)
+        self.assertEqual(stats['carga_horaria_devida'], 160.0)
+        self.assertEqual(stats['saldo_horas'], -152.0)
+
+    def test_insercao_edicao_exclusao_ponto(self):
+        ponto = Ponto(user_id=self.user.id, data=date(2025, 3, 3), entrada=time(8), saida=time(17), horas_trabalhadas=9.0)
+        db.session.add(ponto)
+        db.session.commit()
+        self.assertEqual(self._resumo().horas_trabalhadas, 9.0)
+        self.assertEqual(self._resumo().dias_trabalhados, 1)
+
+        # Edição movendo o registro para outro mês atualiza os dois resumos
+        ponto.data = date(2025, 4, 1)
+        db.session.commit()
+        self.assertEqual(self._resumo().dias_trabalhados, 0)
+        self.assertEqual(self._resumo(mes=4).horas_trabalhadas, 9.0)
+
+        db.session.delete(ponto)
+        db.session.commit()
+        self.assertEqual(self._resumo(mes=4).horas_trabalhadas, 0.0)
+
+    def test_feriado_recalcula_resumos_existentes(self):
+        db.session.add(Ponto(user_id=self.user.id, data=date(2025, 3, 3), horas_trabalhadas=8.0))
+        db.session.commit()
+        self.assertEqual(self._resumo().dias_uteis, 21)
+
+        feriado = Feriado(data=date(2025, 3, 3), descricao='Feriado de Teste')
+        db.session.add(feriado)
+        db.session.commit()
+        self.assertEqual(self._resumo().dias_uteis, 20)
+        self.assertEqual(self._resumo().dias_trabalhados, 0)
+
+        db.session.delete(feriado)
+        db.session.commit()
+        self.assertEqual(self._resumo().dias_uteis, 21)
+
+    def test_leitura_materializa_resumo(self):
+        self.assertIsNone(self._resumo(ano=2025, mes=2))
+        # A gravação tem transação própria: a sessão da leitura não é commitada
+        with mock.patch.object(db.session, 'commit', side_effect=AssertionError('commit na leitura')):
+            resumo = obter_resumo_mensal(self.user.id, 2, 2025)
+        self.assertEqual(resumo.dias_uteis, 20)
+        self.assertIsNotNone(self._resumo(ano=2025, mes=2))
+
+        dados = _get_relatorio_mensal_data(self.user.id, 2, 2025)
+        self.assertEqual(dados['dias_uteis'], 20)
+        self.assertEqual(dados['saldo_horas'], -160.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Testes da fila de exportações processada pelo worker (app/utils/tarefas.py).
+"""
+import os
+import unittest
+import zipfile
+from datetime import date
+
+from app import db
+from app.models.ponto import Ponto
+from app.models.tarefa_exportacao import TarefaExportacao
+from app.utils.tarefas import enfileirar_exportacao, reservar_proxima_tarefa, processar_pendentes
+from base_testes import CasoTesteApp
+
+
+class TestTarefasExportacao(CasoTesteApp):
+    def setUp(self):
+        super().setUp()
+        self.app.config['PDF_CACHE_DIR'] = os.path.join(self.cache_dir, 'pdf')
+        self.app.config['EXPORTACOES_DIR'] = os.path.join(self.cache_dir, 'exportacoes')
+        db.session.add(Ponto(user_id=self.user.id, data=date(2025, 3, 3), horas_trabalhadas=8.0))
+        db.session.commit()
+
+    def test_rotas_enfileiram_e_worker_gera_arquivo(self):
+        resposta = self.client.post('/exportacoes', data={'tipo': 'excel', 'mes': 3, 'ano': 2025})
+        self.assertEqual(resposta.status_code, 202)
+        tarefa = resposta.get_json()
+        self.assertEqual(tarefa['status'], 'pendente')
+        self.assertNotIn('download_url', self.client.get(tarefa['status_url']).get_json())
+
+        self.assertEqual(processar_pendentes(), 1)
+        status = self.client.get(tarefa['status_url']).get_json()
+        self.assertEqual(status['status'], 'concluida')
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(download.data.startswith(b'PK'))  # Arquivo .xlsx (zip)
+
+    def test_links_sem_javascript_enfileiram_em_vez_de_gerar(self):
+        resposta = self.client.get('/relatorio-pdf?mes=3&ano=2025')
+        self.assertEqual(resposta.status_code, 302)
+        tarefa = TarefaExportacao.query.one()
+        self.assertEqual((tarefa.tipo, tarefa.status), ('pdf', TarefaExportacao.PENDENTE))
+        self.assertTrue(resposta.location.endswith(f'/exportacoes/{tarefa.id}/acompanhar'))
+        self.assertIn('atualizada automaticamente', self.client.get(resposta.location).get_data(as_text=True))
+
+        processar_pendentes()
+        pagina = self.client.get(resposta.location).get_data(as_text=True)
+        self.assertIn(f'/exportacoes/{tarefa.id}/download', pagina)
+        self.assertNotIn('http-equiv="refresh"', pagina)
+
+        outro = self.criar_usuario('Bruno', matricula='456')
+        resposta = self.client.get(f'/relatorio-excel?user_id={outro.id}&mes=3&ano=2025')
+        self.assertTrue(resposta.location.endswith('/dashboard'))  # Relatório de outro usuário: só admin
+        self.assertEqual(TarefaExportacao.query.count(), 1)
+
+    def test_tarefa_repetida_reaproveitada_e_erro_registrado(self):
+        primeira = enfileirar_exportacao('sei', self.user.id, 3, 2025, solicitante_id=self.user.id)
+        self.assertEqual(enfileirar_exportacao('sei', self.user.id, 3, 2025, solicitante_id=self.user.id).id, primeira.id)
+
+        reservada = reservar_proxima_tarefa()
+        self.assertEqual((reservada.id, reservada.status), (primeira.id, TarefaExportacao.PROCESSANDO))
+        self.assertIsNone(reservar_proxima_tarefa())
+
+        db.session.query(TarefaExportacao).filter_by(id=primeira.id).update({'status': TarefaExportacao.PENDENTE})
+        db.session.commit()
+        processar_pendentes()
+        tarefa = db.session.get(TarefaExportacao, primeira.id)
+        self.assertEqual(tarefa.status, TarefaExportacao.ERRO)  # Sem relatório completo salvo
+        self.assertIn('Salve-o primeiro', tarefa.mensagem_erro)
+
+    def test_fechamento_do_mes_gera_zip_com_todos_os_usuarios(self):
+        self.criar_usuario('Bruno', matricula='456', is_active_db=False)
+        self.criar_usuario('Carla', matricula='789')
+
+        tarefa = enfileirar_exportacao('zip', self.user.id, 3, 2025, solicitante_id=self.user.id, com_autoavaliacao=False)
+        processar_pendentes()
+        tarefa = db.session.get(TarefaExportacao, tarefa.id)
+        self.assertEqual(tarefa.status, TarefaExportacao.CONCLUIDA)
+        self.assertEqual(tarefa.nome_arquivo, 'fechamento_03_2025.zip')
+        with zipfile.ZipFile(tarefa.arquivo) as arquivo_zip:
+            self.assertEqual(sorted(arquivo_zip.namelist()), ['relatorio_123_3_2025.pdf', 'relatorio_789_3_2025.pdf'])
+            self.assertTrue(arquivo_zip.read('relatorio_123_3_2025.pdf').startswith(b'%PDF'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Testes da lista paginada de usuários do admin e da coluna ultimo_ponto.
+"""
+import unittest
+from datetime import date
+
+from app import db
+from app.controllers.admin import _consulta_usuarios
+from app.models.ponto import Ponto
+from app.utils.orcamento_consultas import contar_consultas
+from base_testes import CasoTesteApp
+
+
+class TestUsuariosAdmin(CasoTesteApp):
+    USUARIO_PADRAO = False
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.criar_usuario('Administrador', matricula='ADM', is_admin=True)
+        for i in range(60):
+            self.criar_usuario(f'Servidor {i:02d}', matricula=f'S{i:03d}', uf='DF' if i % 2 else 'SP',
+                               is_active_db=(i != 5))
+        self.joao = self.criar_usuario('João Araújo', matricula='J001', uf='RJ')
+        self.client = self.cliente(self.admin)
+
+    def test_paginacao_filtros_e_busca_sem_acentos(self):
+        self.assertEqual(self.joao.nome_normalizado, 'joao araujo')
+        primeira = self.client.get('/admin/usuarios').data.decode()
+        self.assertIn('(62 encontrado(s))', primeira)
+        self.assertIn('Servidor 47', primeira)
+        self.assertNotIn('Servidor 48', primeira)  # 50 por página, ordenados pelo nome
+        self.assertIn('Servidor 48', self.client.get('/admin/usuarios?pagina=2').data.decode())
+
+        self.assertIn('João Araújo', self.client.get('/admin/usuarios?q=araujo').data.decode())
+        self.assertIn('(1 encontrado(s))', self.client.get('/admin/usuarios?q=Joao').data.decode())
+        self.assertIn('(1 encontrado(s))', self.client.get('/admin/usuarios?q=S012').data.decode())
+        for curinga in ('%', '_', 'a%o'):  # Curingas do LIKE digitados na busca não casam com tudo
+            self.assertIn('(0 encontrado(s))', self.client.get('/admin/usuarios', query_string={'q': curinga}).data.decode())
+        self.assertIn('(30 encontrado(s))', self.client.get('/admin/usuarios?uf=DF').data.decode())
+        self.assertIn('(1 encontrado(s))', self.client.get('/admin/usuarios?status=inativos').data.decode())
+
+        decrescente = self.client.get('/admin/usuarios?ordenar=matricula&direcao=desc').data.decode()
+        self.assertLess(decrescente.index('S059'), decrescente.index('S058'))
+
+    def test_busca_por_sobrenome_usa_indice(self):
+        filtros = {'q': 'araujo', 'uf': '', 'unidade_setor': '', 'status': '', 'ordenar': 'nome', 'direcao': 'asc'}
+        consulta = _consulta_usuarios(filtros)
+        self.assertEqual(consulta.all(), [self.joao])
+        sql = str(consulta.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        plano = ' '.join(linha[-1] for linha in db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + sql))
+        self.assertIn('SEARCH sufixos_nome_usuario', plano)
+        self.assertNotIn('SCAN users', plano)
+
+        self.joao.name = 'Pedro Araújo Lima'  # Renomear refaz os sufixos
+        db.session.commit()
+        self.assertEqual(sorted(s.sufixo for s in self.joao.sufixos_nome), ['araujo lima', 'lima', 'pedro araujo lima'])
+        self.assertIn('(1 encontrado(s))', self.client.get('/admin/usuarios?q=araujo li').data.decode())
+        self.assertIn('(0 encontrado(s))', self.client.get('/admin/usuarios?q=joao').data.decode())
+
+    def test_ultimo_ponto_mantido_nas_gravacoes(self):
+        db.session.add_all([Ponto(user_id=self.joao.id, data=date(2025, 3, 3), horas_trabalhadas=8.0),
+                            Ponto(user_id=self.joao.id, data=date(2025, 3, 5), horas_trabalhadas=8.0)])
+        db.session.commit()
+        db.session.refresh(self.joao)
+        self.assertEqual(self.joao.ultimo_ponto, date(2025, 3, 5))
+
+        db.session.delete(Ponto.query.filter_by(data=date(2025, 3, 5)).one())
+        db.session.commit()
+        db.session.refresh(self.joao)
+        self.assertEqual(self.joao.ultimo_ponto, date(2025, 3, 3))
+        self.assertIn('03/03/2025', self.client.get('/admin/usuarios?ordenar=ultimo_ponto&direcao=desc').data.decode())
+
+        # Ficha do usuário: últimos registros pelo índice (user_id, data), dentro do orçamento de consultas
+        with contar_consultas() as consultas:
+            pagina = self.client.get(f'/admin/usuarios/visualizar/{self.joao.id}').data.decode()
+        self.assertIn('03/03/2025', pagina)
+        plano = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + consultas[-1], (self.joao.id, 10, 0)).all()
+        self.assertNotIn('TEMP B-TREE', ' '.join(linha[-1] for linha in plano))
+        with contar_consultas() as consultas:
+            self.client.get(f'/admin/usuarios/visualizar/{self.admin.id}')  # Sem registros: não lê `pontos`
+        self.assertFalse([sql for sql in consultas if 'FROM pontos' in sql])
+
+
+if __name__ == '__main__':
+    unittest.main()
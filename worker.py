@@ -0,0 +1,16 @@
+import os
+from dotenv import load_dotenv
+
+# Carrega variáveis de ambiente do arquivo .env
+load_dotenv()
+
+from app import create_app
+from app.utils.tarefas import executar_worker
+
+# Processo separado que gera as exportações (PDF, Excel, HTML SEI) enfileiradas pela aplicação web
+app = create_app()
+
+if __name__ == '__main__':
+    intervalo = float(os.environ.get('EXPORT_WORKER_INTERVAL', 2))
+    with app.app_context():
+        executar_worker(intervalo=intervalo)